@@ -0,0 +1,129 @@
+import asyncio
+import Query_Generation as qg
+import Pipeline_Metrics as metrics
+
+DEFAULT_CONCURRENCY = 16
+
+
+async def agenerate_hana_query(question, schema_name, relationship_manager, query_cache=None, pipeline=None):
+    """
+    Async variant of generate_hana_query using the async LLM client
+    """
+    pipeline = qg.get_pipeline(pipeline)
+    with metrics.stage("prompt_build"):
+        prompt_inputs = qg.build_query_inputs(question, schema_name, relationship_manager)
+    query_cache, fingerprint, cached_query = qg.lookup_generated_query(prompt_inputs, query_cache, pipeline)
+    if cached_query is not None:
+        metrics.count("sql_cache_hits")
+        with metrics.stage("sql_validation"):
+            return qg.validate_generated_query(cached_query, relationship_manager)
+
+    with metrics.llm_stage("query_llm"):
+        result = await pipeline.query_chain.arun(prompt_inputs)
+    return qg.finalize_generated_query(result, prompt_inputs, relationship_manager, query_cache, fingerprint)
+
+
+async def aexecute_hana_query(query, hana_db, **kwargs):
+    """
+    Runs execute_hana_query on a worker thread so the event loop stays free.
+    Use a pooled HanaDbConnector so concurrent calls get their own connections.
+    """
+    return await asyncio.to_thread(qg.execute_hana_query, query, hana_db, **kwargs)
+
+
+async def asummarize_results(question, query, results, pipeline=None):
+    """
+    Async variant of summarize_results
+    """
+    with metrics.stage("summary_prompt"):
+        summary_inputs = qg.build_summary_inputs(question, query, results)
+    with metrics.llm_stage("summary_llm"):
+        summary = await qg.get_pipeline(pipeline).summary_chain.arun(summary_inputs)
+    return summary.strip()
+
+
+async def aprocess_query_with_summary(question, schema_name, hana_db, relationship_manager, pipeline=None,
+                                      result_format=None, repair_attempts=None, repair_budget=None):
+    """
+    Async variant of process_query_with_summary: the event loop is released
+    during both LLM round trips and while HANA executes the query
+    """
+    # Every asyncio task runs in its own copy of the context, so concurrent
+    # questions each get their own trace
+    with metrics.trace() as pipeline_trace:
+        result = await _aprocess_query_with_summary(question, schema_name, hana_db, relationship_manager, pipeline,
+                                                    result_format, repair_attempts, repair_budget)
+    result["metrics"] = pipeline_trace.as_dict()
+    return result
+
+
+async def _aprocess_query_with_summary(question, schema_name, hana_db, relationship_manager, pipeline,
+                                       result_format=None, repair_attempts=None, repair_budget=None):
+    try:
+        failure = None
+        try:
+            generated_query = await agenerate_hana_query(question, schema_name, relationship_manager, pipeline=pipeline)
+        except qg.QueryExecutionError as e:
+            # HANA rejected the EXPLAIN PLAN, so the query goes straight to the repair
+            generated_query, failure = e.query, e
+        result_cache = qg.get_pipeline(pipeline).result_cache
+        # Rejected SQL is repaired on the worker thread too (the repair LLM call is synchronous)
+        generated_query, results = await asyncio.to_thread(
+            qg.execute_with_repair, question, schema_name, generated_query,
+            lambda query: qg.fetch_results(query, hana_db, relationship_manager, result_format, result_cache),
+            relationship_manager, hana_db, pipeline, repair_attempts, repair_budget, failure=failure
+        )
+
+        summary = qg.get_cached_summary(question, generated_query, result_cache)
+        if summary is None:
+            summary = await asummarize_results(question, generated_query, results, pipeline)
+            qg.cache_summary(question, generated_query, summary, result_cache)
+
+        return {
+            "query": generated_query,
+            "raw_results": results,
+            "summary": summary
+        }
+    except Exception as e:
+        return {
+            "error": str(e)
+        }
+
+
+async def aprocess_questions(questions, schema_name, hana_db, relationship_manager,
+                             concurrency=DEFAULT_CONCURRENCY, pipeline=None):
+    """
+    Async generator that runs many questions through the pipeline with at
+    most `concurrency` in flight and yields (question, result) pairs in
+    completion order
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(question):
+        async with semaphore:
+            result = await aprocess_query_with_summary(question, schema_name, hana_db, relationship_manager, pipeline)
+            return question, result
+
+    tasks = [asyncio.ensure_future(run(question)) for question in questions]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Stop outstanding work if the consumer stops iterating early
+        for task in tasks:
+            task.cancel()
+
+
+def process_questions(questions, schema_name, hana_db, relationship_manager,
+                      concurrency=DEFAULT_CONCURRENCY, pipeline=None):
+    """
+    Blocking helper that runs aprocess_questions and returns the results in input order
+    """
+    async def collect():
+        results = {}
+        async for question, result in aprocess_questions(
+                questions, schema_name, hana_db, relationship_manager, concurrency, pipeline):
+            results[question] = result
+        return [results[question] for question in questions]
+
+    return asyncio.run(collect())
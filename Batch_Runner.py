@@ -0,0 +1,259 @@
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import Query_Generation as qg
+import Pipeline_Metrics as metrics
+from Query_Cache import normalize_question
+from Hana_Db_Operations import HanaDbConnector
+
+DEFAULT_BATCH_CONCURRENCY = 8
+# Retries of an LLM call that was rate limited, with exponential backoff
+MAX_RATE_LIMIT_RETRIES = 6
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+# Rows written per question to the JSONL output (the row count is always written)
+DEFAULT_OUTPUT_ROWS = 100
+
+
+def read_questions(path):
+    """
+    Reads one question per line, skipping blank lines and # comments, and
+    drops duplicates (compared case and whitespace insensitively) keeping
+    the first occurrence
+    """
+    questions = []
+    seen = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            question = line.strip()
+            if not question or question.startswith('#'):
+                continue
+            key = normalize_question(question)
+            if key in seen:
+                continue
+            seen.add(key)
+            questions.append(question)
+    return questions
+
+
+def is_rate_limit_error(error):
+    """Azure OpenAI throttling surfaces as a RateLimitError / HTTP 429"""
+    if type(error).__name__ == 'RateLimitError' or getattr(error, 'status_code', None) == 429:
+        return True
+    text = str(error).lower()
+    return '429' in text or 'rate limit' in text
+
+
+class RateLimitBackoff:
+    """
+    Shared backoff for all batch workers: once one LLM call is throttled,
+    every worker waits out the same cooldown instead of hammering the
+    endpoint with retries
+    """
+    def __init__(self, base_seconds=BACKOFF_BASE_SECONDS, max_seconds=BACKOFF_MAX_SECONDS,
+                 max_retries=MAX_RATE_LIMIT_RETRIES):
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self.max_retries = max_retries
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def wait(self):
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def call(self, func, *args):
+        """Calls func(*args), retrying rate limited calls with jittered exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            self.wait()
+            try:
+                return func(*args)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                delay = min(self.max_seconds, self.base_seconds * 2 ** attempt)
+                delay *= 0.5 + random.random() / 2
+                with self._lock:
+                    self.throttled += 1
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+
+class JsonlWriter:
+    """Appends one JSON record per line, flushed as soon as it is written"""
+    def __init__(self, path):
+        self._file = open(path, 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def run_question(question, schema_name, shared_inputs, hana_db, relationship_manager, backoff,
+                 summarize=True, output_rows=DEFAULT_OUTPUT_ROWS, pipeline=None, batch_metrics=None):
+    """
+    Runs one question through generation, execution and (optionally)
+    summarization and returns its output record. The question's trace is
+    also added to batch_metrics (a Pipeline_Metrics.SessionMetrics) if given.
+    """
+    with metrics.trace() as pipeline_trace:
+        record = _run_question(question, schema_name, shared_inputs, hana_db, relationship_manager,
+                               backoff, summarize, output_rows, qg.get_pipeline(pipeline))
+    if batch_metrics is not None:
+        batch_metrics.record(pipeline_trace)
+    record["metrics"] = pipeline_trace.as_dict()
+    return record
+
+
+def _run_question(question, schema_name, shared_inputs, hana_db, relationship_manager, backoff,
+                  summarize, output_rows, pipeline):
+    started = time.perf_counter()
+    record = {"question": question}
+    try:
+        with metrics.stage("prompt_build"):
+            if shared_inputs is None:
+                prompt_inputs = qg.build_query_inputs(question, schema_name, relationship_manager)
+            else:
+                prompt_inputs = dict(shared_inputs, question=qg.preprocess_question(question, relationship_manager))
+        query_cache, fingerprint, query = qg.lookup_generated_query(prompt_inputs, pipeline=pipeline)
+        failure = None
+        try:
+            if query is not None:
+                metrics.count("sql_cache_hits")
+                with metrics.stage("sql_validation"):
+                    query = qg.validate_generated_query(query, relationship_manager)
+            else:
+                with metrics.llm_stage("query_llm"):
+                    result = backoff.call(pipeline.query_chain.run, prompt_inputs)
+                query = qg.finalize_generated_query(result, prompt_inputs, relationship_manager, query_cache,
+                                                    fingerprint)
+        except qg.QueryExecutionError as e:
+            # HANA rejected the EXPLAIN PLAN, so the query goes to the repair below
+            query, failure = e.query, e
+        record["query"] = query
+
+        query, results = qg.execute_with_repair(
+            question, schema_name, query,
+            lambda candidate: qg.execute_hana_query(candidate, hana_db, result_cache=pipeline.result_cache),
+            relationship_manager, hana_db, pipeline, prompt_inputs=prompt_inputs, call_llm=backoff.call,
+            failure=failure
+        )
+        record["query"] = query
+        record["columns"] = list(results.columns)
+        record["row_count"] = len(results)
+        record["truncated"] = results.truncated
+        record["rows"] = results.rows[:output_rows]
+
+        if summarize:
+            summary = qg.get_cached_summary(question, query, pipeline.result_cache)
+            if summary is None:
+                summary = backoff.call(qg.summarize_results, question, query, results, pipeline)
+                qg.cache_summary(question, query, summary, pipeline.result_cache)
+            record["summary"] = summary
+    except Exception as e:
+        record["error"] = str(e)
+    record["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_batch(questions, schema_name, hana_db, relationship_manager, output_path,
+              concurrency=DEFAULT_BATCH_CONCURRENCY, summarize=True, prune_schema=False,
+              output_rows=DEFAULT_OUTPUT_ROWS, pipeline=None):
+    """
+    Runs questions with at most `concurrency` in flight and writes one JSONL
+    record per question as soon as it finishes (in completion order).
+
+    Unless prune_schema is set, every question shares the same full-schema
+    prompt prefix, built once up front. Use a pooled HanaDbConnector with
+    at least `concurrency` connections so queries execute in parallel.
+    Returns a dict of batch statistics; stage_latency covers only this
+    batch's questions.
+    """
+    shared_inputs = None
+    if not prune_schema:
+        shared_inputs = qg.build_shared_query_inputs(schema_name, relationship_manager)
+
+    backoff = RateLimitBackoff()
+    batch_metrics = metrics.SessionMetrics()
+    writer = JsonlWriter(output_path)
+    started = time.perf_counter()
+    errors = 0
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as executor:
+            futures = [
+                executor.submit(run_question, question, schema_name, shared_inputs, hana_db, relationship_manager,
+                                backoff, summarize, output_rows, pipeline, batch_metrics)
+                for question in questions
+            ]
+            for future in as_completed(futures):
+                record = future.result()
+                if "error" in record:
+                    errors += 1
+                writer.write(record)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "questions": len(questions),
+        "errors": errors,
+        "rate_limited": backoff.throttled,
+        "elapsed_seconds": round(elapsed, 3),
+        "questions_per_second": round(len(questions) / elapsed, 3) if elapsed else None,
+        "stage_latency": batch_metrics.summary()["stages"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a file of questions through the SAP HANA query pipeline")
+    parser.add_argument("questions_file", help="Text file with one question per line")
+    parser.add_argument("--schema", required=True, help="HANA schema to query")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file to write results to")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_BATCH_CONCURRENCY,
+                        help="Questions processed in parallel")
+    parser.add_argument("--pool-size", type=int, help="HANA connections (default: concurrency)")
+    parser.add_argument("--no-summary", action="store_true", help="Skip the summarization LLM call")
+    parser.add_argument("--prune-schema", action="store_true",
+                        help="Send each question only its relevant tables instead of a shared full-schema prefix")
+    parser.add_argument("--output-rows", type=int, default=DEFAULT_OUTPUT_ROWS,
+                        help="Rows written per question")
+    args = parser.parse_args()
+
+    questions = read_questions(args.questions_file)
+    print(f"Loaded {len(questions)} unique questions")
+
+    hana_db = HanaDbConnector(pool_size=args.pool_size or args.concurrency)
+    try:
+        success, error = hana_db.select_schema(args.schema)
+        if error:
+            print(f"Error selecting schema: {error}")
+            return
+        relationship_manager = qg.TableRelationshipManager(hana_db, cache_path=qg.SCHEMA_CACHE_PATH)
+
+        stats = run_batch(
+            questions, args.schema, hana_db, relationship_manager, args.output,
+            concurrency=args.concurrency,
+            summarize=not args.no_summary,
+            prune_schema=args.prune_schema,
+            output_rows=args.output_rows,
+        )
+        print(f"\nWrote {stats['questions']} results to {args.output} "
+              f"({stats['errors']} errors, {stats['rate_limited']} rate limited calls) "
+              f"in {stats['elapsed_seconds']}s, {stats['questions_per_second']} questions/s")
+    finally:
+        hana_db.close_conn()
+
+
+if __name__ == "__main__":
+    main()
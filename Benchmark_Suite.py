@@ -0,0 +1,492 @@
+"""
+Offline performance benchmarks for the query pipeline.
+
+HANA is replaced by a SQLite stand-in behind the real HanaDbConnector and
+connection pool (synthetic tables with DATS columns, configurable width
+and row counts), and the LLM by a deterministic fake with configurable
+latency, so no Azure OpenAI or HANA access is needed. Results are written
+as JSON; pass --baseline to fail when a scenario regressed.
+
+    python Benchmark_Suite.py --tables 200 --rows 200000 --output bench.json
+    python Benchmark_Suite.py --baseline bench.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import Hana_Db_Operations as hdb
+import Query_Generation as qg
+import Batch_Runner
+from Result_Compaction import compact_results
+
+DEFAULT_TABLES = 100
+DEFAULT_COLUMNS = 30
+DEFAULT_DATE_COLUMNS = 3
+DEFAULT_ROWS = 100000
+DEFAULT_SMALL_TABLE_ROWS = 100
+DEFAULT_LLM_LATENCY = 0.05
+DEFAULT_BATCH_QUESTIONS = 64
+DEFAULT_CONCURRENCY_LEVELS = (1, 4, 16)
+DEFAULT_REPEAT = 3
+DEFAULT_SEED = 42
+SCHEMA_NAME = "BENCH"
+
+# Metrics where a higher value is better; everything else is a duration
+THROUGHPUT_SUFFIXES = ("_per_second",)
+
+_TOP_PATTERN = re.compile(r"^\s*SELECT\s+(DISTINCT\s+)?TOP\s+(\d+)\s+(.*)$", re.IGNORECASE | re.DOTALL)
+_standin_ids = itertools.count()
+
+
+class StandInCursor:
+    """DB-API cursor over SQLite that understands the HANA dialect the pipeline emits"""
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection.db.cursor()
+        self.description = None
+        self.rowcount = -1
+
+    def execute(self, sql, params=None):
+        statement = sql.strip()
+        if statement.upper().startswith("SET SCHEMA"):
+            self.description = None
+            return
+        statement = statement.replace(" FROM DUMMY", "")
+        match = _TOP_PATTERN.match(statement)
+        if match:
+            statement = f"SELECT {match.group(1) or ''}{match.group(3)} LIMIT {match.group(2)}"
+        self._cursor.execute(statement, params or ())
+        self.description = self._cursor.description
+        self.rowcount = self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandInConnection:
+    def __init__(self, uri, sys_uri):
+        self.db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self.db.execute(f"ATTACH DATABASE '{sys_uri}' AS SYS")
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    def isconnected(self):
+        return True
+
+    def close(self):
+        self.db.close()
+
+
+class HanaStandIn:
+    """
+    Shared in-memory SQLite database seeded with synthetic SAP-like tables
+    and the HANA catalog views the connector reads (TABLES, TABLE_COLUMNS,
+    SYS.CONSTRAINTS). connect() opens a new connection to it, for use as
+    the connect function of a HanaConnectionPool.
+    """
+    def __init__(self, tables=DEFAULT_TABLES, columns=DEFAULT_COLUMNS, date_columns=DEFAULT_DATE_COLUMNS,
+                 rows=DEFAULT_ROWS, small_table_rows=DEFAULT_SMALL_TABLE_ROWS, seed=DEFAULT_SEED):
+        name = f"hana_standin_{os.getpid()}_{next(_standin_ids)}"
+        self.uri = f"file:{name}?mode=memory&cache=shared"
+        self.sys_uri = f"file:{name}_sys?mode=memory&cache=shared"
+        # Keeps the shared in-memory databases alive
+        self._keeper = StandInConnection(self.uri, self.sys_uri)
+        self.table_names = [f"T{index:04d}" for index in range(tables)]
+        self.columns = {}
+        self.date_columns = {}
+        self._seed(columns, date_columns, rows, small_table_rows, random.Random(seed))
+
+    def connect(self):
+        return StandInConnection(self.uri, self.sys_uri)
+
+    def connector(self, pool_size):
+        pool = hdb.HanaConnectionPool(max_size=pool_size, connect=self.connect)
+        hana_db = hdb.HanaDbConnector(pool=pool)
+        hana_db.select_schema(SCHEMA_NAME)
+        return hana_db
+
+    def close(self):
+        self._keeper.close()
+
+    def _seed(self, width, date_width, rows, small_table_rows, rng):
+        db = self._keeper.db
+        db.execute("CREATE TABLE TABLES (SCHEMA_NAME, TABLE_NAME, CREATE_TIME)")
+        db.execute("CREATE TABLE TABLE_COLUMNS "
+                   "(SCHEMA_NAME, TABLE_NAME, COLUMN_NAME, DATA_TYPE_NAME, LENGTH, IS_NULLABLE, POSITION)")
+        db.execute("CREATE TABLE SYS.CONSTRAINTS "
+                   "(SCHEMA_NAME, TABLE_NAME, COLUMN_NAME, IS_PRIMARY_KEY, POSITION)")
+
+        for index, table in enumerate(self.table_names):
+            # Every table joins to the previous one through its ID column
+            columns = [('MANDT', 'NVARCHAR', 3), (f"ID{index:04d}", 'NVARCHAR', 10)]
+            if index:
+                columns.append((f"ID{index - 1:04d}", 'NVARCHAR', 10))
+            dates = ['ERDAT', 'AEDAT'] + [f"DT{index:04d}_{k}" for k in range(max(0, date_width - 2))]
+            columns += [(name, 'DATS', 8) for name in dates[:date_width]]
+            filler = 0
+            while len(columns) < width:
+                kind = ('NVARCHAR', 20) if filler % 3 else ('DECIMAL', 15)
+                columns.append((f"C{index:04d}_{filler}", *kind))
+                filler += 1
+            self.columns[table] = [name for name, _, _ in columns]
+            self.date_columns[table] = dates[:date_width]
+
+            db.execute("INSERT INTO TABLES VALUES (?, ?, ?)", (SCHEMA_NAME, table, "2024-01-01 00:00:00"))
+            db.executemany(
+                "INSERT INTO TABLE_COLUMNS VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(SCHEMA_NAME, table, name, kind, length, 'TRUE', position + 1)
+                 for position, (name, kind, length) in enumerate(columns)]
+            )
+            db.execute("INSERT INTO SYS.CONSTRAINTS VALUES (?, ?, ?, 'TRUE', 1)",
+                       (SCHEMA_NAME, table, f"ID{index:04d}"))
+            db.execute(f"CREATE TABLE {table} ({', '.join(name for name, _, _ in columns)})")
+            count = rows if index == 0 else small_table_rows
+            db.executemany(
+                f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})",
+                (self._row(columns, row, rng) for row in range(count))
+            )
+        db.commit()
+
+    @staticmethod
+    def _row(columns, row, rng):
+        start = date(2020, 1, 1)
+        values = []
+        for name, kind, _ in columns:
+            if kind == 'DATS':
+                values.append((start + timedelta(days=rng.randrange(2000))).strftime('%Y%m%d'))
+            elif kind == 'DECIMAL':
+                values.append(round(rng.uniform(0, 100000), 2))
+            elif name == 'MANDT':
+                values.append('100')
+            elif name.startswith('ID'):
+                values.append(f"{row:010d}")
+            else:
+                values.append(f"V{rng.randrange(1000)}")
+        return tuple(values)
+
+
+class FakeLLM:
+    """
+    Deterministic stand-in for the LLM and both chains: run/arun/stream
+    sleep for `latency` seconds and answer from the prompt inputs only
+    """
+    def __init__(self, standin, latency=DEFAULT_LLM_LATENCY, mode="query"):
+        self.standin = standin
+        self.latency = latency
+        self.mode = mode
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _answer(self, inputs):
+        with self._lock:
+            self.calls += 1
+        if self.mode == "summary":
+            return f"The query returned results for: {inputs['question']}"
+        tables = [table.strip() for table in inputs['allowed_tables'].split(',') if table.strip()]
+        table = tables[sum(map(ord, inputs['question'])) % len(tables)]
+        id_column = self.standin.columns[table][1]
+        date_column = self.standin.date_columns[table][0]
+        return (f"SELECT {id_column}, {date_column} FROM {table} "
+                f"WHERE {date_column} >= '2023-01-01' ORDER BY {date_column} DESC")
+
+    def run(self, inputs):
+        time.sleep(self.latency)
+        return self._answer(inputs)
+
+    async def arun(self, inputs):
+        await asyncio.sleep(self.latency)
+        return self._answer(inputs)
+
+    def stream(self, prompt_text):
+        time.sleep(self.latency)
+
+        class Chunk:
+            content = "Summary of the results."
+        yield Chunk()
+
+
+def install_fakes(standin, latency):
+    """Point the default pipeline at the fake LLM and the stand-in's tables"""
+    qg.set_pipeline(qg.QueryPipeline(
+        llm=FakeLLM(standin, latency, "summary"),
+        query_chain=FakeLLM(standin, latency, "query"),
+        summary_chain=FakeLLM(standin, latency, "summary"),
+        repair_chain=FakeLLM(standin, latency, "query"),
+    ))
+    qg.ALLOWED_TABLES[:] = standin.table_names
+
+
+def clear_caches():
+    if qg.generated_query_cache is not None:
+        qg.generated_query_cache.clear()
+    if qg.query_result_cache is not None:
+        qg.query_result_cache.clear()
+
+
+def timed(func, repeat):
+    """Median wall time of func() over repeat runs, plus the last return value"""
+    times = []
+    value = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = func()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), value
+
+
+def build_manager(hana_db, cache_path=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return qg.TableRelationshipManager(hana_db, cache_path=cache_path)
+
+
+def sample_questions(standin, count, seed=DEFAULT_SEED):
+    rng = random.Random(seed)
+    templates = [
+        "show {col} for {table} created in the last 30 days",
+        "total {col} per month in {table} since last year",
+        "which {table} records changed in the past 2 weeks",
+        "list the latest {col} values from {table}",
+    ]
+    questions = []
+    for index in range(count):
+        table = rng.choice(standin.table_names)
+        column = rng.choice(standin.columns[table][3:] or standin.columns[table])
+        questions.append(f"{rng.choice(templates).format(col=column, table=table)} #{index}")
+    return questions
+
+
+def bench_startup(standin, hana_db, repeat):
+    """Relationship manager construction: cold (catalog reads) and warm (metadata cache)"""
+    cold, manager = timed(lambda: build_manager(hana_db), repeat)
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, "schema_cache.json")
+        build_manager(hana_db, cache_path)
+        warm, _ = timed(lambda: build_manager(hana_db, cache_path), repeat)
+    return {
+        "tables": len(standin.table_names),
+        "relationships": len(manager.common_columns),
+        "cold_seconds": cold,
+        "warm_seconds": warm,
+    }, manager
+
+
+def bench_prompt_assembly(standin, manager, repeat):
+    """build_query_inputs per question (date rewrite, mappings, pruning, prompt fragments)"""
+    questions = sample_questions(standin, 200)
+    seconds, inputs = timed(
+        lambda: [qg.build_query_inputs(question, SCHEMA_NAME, manager) for question in questions], repeat
+    )
+    prompt_chars = statistics.mean(len(qg.query_prompt_template.format(**entry)) for entry in inputs)
+    return {
+        "questions": len(questions),
+        "seconds_per_question": seconds / len(questions),
+        "questions_per_second": len(questions) / seconds,
+        "mean_prompt_chars": round(prompt_chars),
+    }
+
+
+def bench_date_rewriting(standin, manager, repeat):
+    """Question and SQL date rewriting throughput"""
+    questions = sample_questions(standin, 1000)
+    queries = []
+    for index, table in enumerate(itertools.islice(itertools.cycle(standin.table_names), 1000)):
+        dates = standin.date_columns[table]
+        queries.append(
+            f"SELECT * FROM {table} WHERE {dates[0]} >= '2023-0{index % 9 + 1}-15' "
+            f"AND {dates[-1]} BETWEEN '01/02/2023' AND '2023/12/31' AND C = 'ERDAT = ''2023-01-01'''"
+        )
+    rewriter = manager.date_rewriter
+    question_seconds, _ = timed(lambda: [rewriter.rewrite_question(q) for q in questions], repeat)
+    query_seconds, _ = timed(lambda: qg.process_date_conditions_batch(queries, manager), repeat)
+    return {
+        "questions_per_second": len(questions) / question_seconds,
+        "queries_per_second": len(queries) / query_seconds,
+    }
+
+
+def bench_large_fetch(standin, hana_db, repeat):
+    """Streaming a large result out of the stand-in and compacting it for the summary prompt"""
+    table = standin.table_names[0]
+    query = f"SELECT * FROM {table}"
+
+    def fetch():
+        clear_caches()
+        return qg.execute_hana_query(query, hana_db)
+
+    seconds, results = timed(fetch, repeat)
+    compact_seconds, _ = timed(lambda: compact_results(results, token_budget=qg.SUMMARY_TOKEN_BUDGET), repeat)
+    scenario = {
+        "rows": len(results),
+        "columns": len(results.columns),
+        "truncated": results.truncated,
+        "fetch_seconds": seconds,
+        "rows_per_second": len(results) / seconds,
+        "compact_seconds": compact_seconds,
+    }
+    for result_format in ("arrow", "numpy"):
+        try:
+            columnar_seconds, columnar = timed(
+                lambda: qg.execute_hana_query_columnar(query, hana_db, result_format, standin.date_columns[table]),
+                repeat
+            )
+        except ImportError:
+            continue
+        scenario[f"{result_format}_fetch_seconds"] = columnar_seconds
+        scenario[f"{result_format}_rows_per_second"] = len(columnar) / columnar_seconds
+    return scenario
+
+
+def bench_batch_throughput(standin, hana_db, manager, questions_count, concurrency_levels):
+    """End-to-end Batch_Runner throughput at several concurrency levels"""
+    questions = sample_questions(standin, questions_count)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for concurrency in concurrency_levels:
+            clear_caches()
+            stats = Batch_Runner.run_batch(
+                questions, SCHEMA_NAME, hana_db, manager, os.path.join(directory, "batch.jsonl"),
+                concurrency=concurrency,
+            )
+            results[f"concurrency_{concurrency}"] = {
+                "questions_per_second": stats["questions_per_second"],
+                "errors": stats["errors"],
+                "elapsed_seconds": stats["elapsed_seconds"],
+            }
+    return results
+
+
+def run_suite(args):
+    concurrency_levels = [int(level) for level in args.concurrency.split(',')]
+    started = time.perf_counter()
+    standin = HanaStandIn(args.tables, args.columns, args.date_columns, args.rows, seed=args.seed)
+    seed_seconds = time.perf_counter() - started
+    hana_db = standin.connector(pool_size=max(concurrency_levels))
+    install_fakes(standin, args.llm_latency)
+    try:
+        scenarios = {}
+        scenarios["startup"], manager = bench_startup(standin, hana_db, args.repeat)
+        scenarios["prompt_assembly"] = bench_prompt_assembly(standin, manager, args.repeat)
+        scenarios["date_rewriting"] = bench_date_rewriting(standin, manager, args.repeat)
+        scenarios["large_fetch"] = bench_large_fetch(standin, hana_db, args.repeat)
+        scenarios["batch_throughput"] = bench_batch_throughput(
+            standin, hana_db, manager, args.batch_questions, concurrency_levels
+        )
+    finally:
+        hana_db.close_conn()
+        standin.close()
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "tables": args.tables,
+            "columns": args.columns,
+            "date_columns": args.date_columns,
+            "rows": args.rows,
+            "llm_latency": args.llm_latency,
+            "batch_questions": args.batch_questions,
+            "concurrency": concurrency_levels,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "seed_seconds": seed_seconds,
+        "scenarios": scenarios,
+    }
+
+
+def _flatten(values, prefix=""):
+    flat = {}
+    for key, value in values.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare_to_baseline(report, baseline, max_regression):
+    """
+    Returns the metrics that got worse than the baseline by more than
+    max_regression (a fraction): durations that grew or throughputs that fell
+    """
+    current = _flatten(report["scenarios"])
+    previous = _flatten(baseline.get("scenarios", {}))
+    regressions = []
+    for name, value in current.items():
+        old = previous.get(name)
+        if not old or not (name.endswith("seconds") or name.endswith(THROUGHPUT_SUFFIXES)):
+            continue
+        if name.endswith(THROUGHPUT_SUFFIXES):
+            change = (old - value) / old
+        else:
+            change = (value - old) / old
+        if change > max_regression:
+            regressions.append({"metric": name, "baseline": old, "current": value, "regression": round(change, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks with a local HANA stand-in and a fake LLM")
+    parser.add_argument("--tables", type=int, default=DEFAULT_TABLES)
+    parser.add_argument("--columns", type=int, default=DEFAULT_COLUMNS, help="Columns per table")
+    parser.add_argument("--date-columns", type=int, default=DEFAULT_DATE_COLUMNS, help="DATS columns per table")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Rows in the large fetch table")
+    parser.add_argument("--llm-latency", type=float, default=DEFAULT_LLM_LATENCY, help="Fake LLM seconds per call")
+    parser.add_argument("--batch-questions", type=int, default=DEFAULT_BATCH_QUESTIONS)
+    parser.add_argument("--concurrency", default=",".join(map(str, DEFAULT_CONCURRENCY_LEVELS)),
+                        help="Comma separated batch concurrency levels")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per timing (median is reported)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed fractional slowdown per metric before failing")
+    args = parser.parse_args()
+
+    report = run_suite(args)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report["regressions"] = compare_to_baseline(report, json.load(f), args.max_regression)
+
+    payload = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+    if report.get("regressions"):
+        print(f"{len(report['regressions'])} metrics regressed beyond {args.max_regression:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
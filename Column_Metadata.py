@@ -0,0 +1,190 @@
+"""
+Compact table metadata shared by every TableRelationshipManager in the process.
+
+Column records are interned: a column with the same name, type, length and
+nullability (MANDT, ERDAT, ...) is one object however many tables or
+tenants have it, and its strings are interned too. Alias tables are shared
+between tables with the same columns.
+"""
+import sys
+import threading
+import weakref
+from collections.abc import Mapping, Sequence
+
+COLUMN_FIELDS = ('name', 'type', 'length', 'nullable')
+
+_records = weakref.WeakValueDictionary()
+_alias_tables = weakref.WeakValueDictionary()
+_intern_lock = threading.Lock()
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class ColumnInfo:
+    """
+    One column: name, type, length and nullability. Supports col['name']
+    style access so code written against the old dict records keeps working.
+    Create records with column_info() to share identical ones.
+    """
+    __slots__ = COLUMN_FIELDS + ('__weakref__',)
+
+    def __init__(self, name, type, length=None, nullable=None):
+        self.name = _intern(name)
+        self.type = _intern(type)
+        self.length = length
+        self.nullable = _intern(nullable)
+
+    def __getitem__(self, key):
+        if key not in COLUMN_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in COLUMN_FIELDS else default
+
+    def keys(self):
+        return COLUMN_FIELDS
+
+    def __iter__(self):
+        return iter(COLUMN_FIELDS)
+
+    def as_tuple(self):
+        return (self.name, self.type, self.length, self.nullable)
+
+    def as_dict(self):
+        return dict(zip(COLUMN_FIELDS, self.as_tuple()))
+
+    def __eq__(self, other):
+        if isinstance(other, ColumnInfo):
+            return self.as_tuple() == other.as_tuple()
+        if isinstance(other, dict):
+            return self.as_dict() == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.as_tuple())
+
+    def __repr__(self):
+        return f"ColumnInfo(name={self.name!r}, type={self.type!r}, length={self.length!r}, nullable={self.nullable!r})"
+
+
+def column_info(name, type, length=None, nullable=None):
+    """The shared ColumnInfo for these values"""
+    key = (name, type, length, nullable)
+    with _intern_lock:
+        record = _records.get(key)
+        if record is None:
+            record = ColumnInfo(name, type, length, nullable)
+            _records[key] = record
+        return record
+
+
+class TableColumns(Sequence):
+    """
+    The columns of one table in catalog order, backed by a tuple of shared
+    ColumnInfo records. Behaves like the old list of column dicts.
+    """
+    __slots__ = ('records', '__weakref__')
+
+    def __init__(self, records=()):
+        self.records = tuple(records)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """From (name, type, length, nullable) rows or column dicts"""
+        return cls(
+            column_info(row['name'], row['type'], row.get('length'), row.get('nullable'))
+            if hasattr(row, 'keys') else column_info(*row)
+            for row in rows
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TableColumns(self.records[index])
+        return self.records[index]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    @property
+    def names(self):
+        return tuple(record.name for record in self.records)
+
+    def rows(self):
+        """Plain (name, type, length, nullable) rows, e.g. for serialization"""
+        return [record.as_tuple() for record in self.records]
+
+    def __eq__(self, other):
+        if isinstance(other, TableColumns):
+            return self.records == other.records
+        if isinstance(other, list):
+            return list(self.records) == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.records)
+
+    def __repr__(self):
+        return f"TableColumns({list(self.names)})"
+
+
+def as_table_columns(columns):
+    """columns as TableColumns (converting a list of column dicts or rows)"""
+    return columns if isinstance(columns, TableColumns) else TableColumns.from_rows(columns)
+
+
+class AliasTable(Mapping):
+    """
+    Read-only lowercase alias -> column name mapping of a table. Tables
+    with the same columns (and alias variations) share one instance.
+    """
+    __slots__ = ('_aliases', '__weakref__')
+
+    def __init__(self, aliases):
+        self._aliases = {_intern(alias): _intern(name) for alias, name in aliases.items()}
+
+    def __getitem__(self, alias):
+        return self._aliases[alias]
+
+    def get(self, alias, default=None):
+        return self._aliases.get(alias, default)
+
+    def __contains__(self, alias):
+        return alias in self._aliases
+
+    def __iter__(self):
+        return iter(self._aliases)
+
+    def __len__(self):
+        return len(self._aliases)
+
+    def __repr__(self):
+        return f"AliasTable({self._aliases!r})"
+
+
+def alias_table(names, variations=None):
+    """
+    The shared AliasTable for columns `names`: every name under its
+    lowercase form plus the extra aliases variations (column name ->
+    aliases) gives for them
+    """
+    variations = variations or {}
+    extras = tuple((name, tuple(variations[name])) for name in names if name in variations)
+    key = (tuple(names), extras)
+    with _intern_lock:
+        table = _alias_tables.get(key)
+        if table is None:
+            aliases = {}
+            # Same insertion order as before, so colliding aliases resolve the same way
+            for name in names:
+                aliases[name.lower()] = name
+                for alias in variations.get(name, ()):
+                    aliases[alias] = name
+            table = AliasTable(aliases)
+            _alias_tables[key] = table
+        return table
@@ -0,0 +1,320 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+RESULT_FORMATS = ("rows", "arrow", "numpy")
+COLUMNAR_FORMATS = ("arrow", "numpy")
+DATS_LENGTH = 8
+
+# numpy / pyarrow are optional and only imported when a columnar result is built
+_numpy = None
+_pyarrow = None
+
+
+def _require_numpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("Columnar results require the numpy package")
+        _numpy = numpy
+    return _numpy
+
+
+def _require_pyarrow():
+    global _pyarrow
+    if _pyarrow is None:
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError("The arrow result format requires the pyarrow package")
+        _pyarrow = pyarrow
+    return _pyarrow
+
+
+def check_result_format(result_format):
+    """
+    Raises ValueError for an unknown columnar format and ImportError when
+    the packages it needs are missing
+    """
+    if result_format not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown columnar result format: {result_format}")
+    if result_format == "arrow":
+        _require_pyarrow()
+    _require_numpy()
+
+
+def decode_dats(values):
+    """
+    Vectorized decode of DATS strings (YYYYMMDD) to a datetime64[D] array.
+    None, blanks, SAP's '00000000' and anything that is not a valid
+    calendar date become NaT.
+    """
+    np = _require_numpy()
+    text = np.asarray(values, dtype=f'U{DATS_LENGTH}')
+    # One code point per character; short strings are padded with 0
+    digits = text.view(np.uint32).reshape(-1, DATS_LENGTH).astype(np.int64) - ord('0')
+    valid = ((digits >= 0) & (digits <= 9)).all(axis=1)
+    digits = np.where(valid[:, None], digits, 0)
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 4] * 10 + digits[:, 5]
+    day = digits[:, 6] * 10 + digits[:, 7]
+    valid &= (year > 0) & (month >= 1) & (month <= 12) & (day >= 1)
+
+    months = np.where(valid, (year - 1970) * 12 + month - 1, 0).astype('datetime64[M]')
+    days = months.astype('datetime64[D]') + np.where(valid, day - 1, 0)
+    # Days past the end of the month (e.g. 20240231) roll into the next one
+    valid &= days.astype('datetime64[M]') == months
+    days[~valid] = np.datetime64('NaT')
+    return days
+
+
+def _first_value(values):
+    for value in values:
+        if value is not None:
+            return value
+    return None
+
+
+def _is_dats(sample):
+    return isinstance(sample, str)
+
+
+def _numpy_chunk(values, dats):
+    """Typed array for one column of one fetched batch, or None when it holds only NULLs"""
+    np = _require_numpy()
+    sample = _first_value(values)
+    if sample is None:
+        return None
+    if dats and _is_dats(sample):
+        return decode_dats(values)
+    has_nulls = None in values
+    try:
+        if isinstance(sample, bool):
+            if not has_nulls:
+                return np.array(values, dtype=np.bool_)
+        elif isinstance(sample, int):
+            # A float column would turn the values into floats, so integers with NULLs stay objects
+            if not has_nulls:
+                return np.array(values, dtype=np.int64)
+        elif isinstance(sample, (float, Decimal)):
+            return np.array(values, dtype=np.float64)
+        elif isinstance(sample, datetime):
+            return np.array(values, dtype='datetime64[us]')
+        elif isinstance(sample, date):
+            return np.array(values, dtype='datetime64[D]')
+    except (TypeError, ValueError, OverflowError):
+        pass
+    chunk = np.empty(len(values), dtype=object)
+    chunk[:] = values
+    return chunk
+
+
+def _numpy_values(array):
+    """Python values of a NumPy column, with NaN / NaT as None"""
+    values = array.tolist()
+    if array.dtype.kind == 'f':
+        return [None if value != value else value for value in values]
+    return values
+
+
+def _numpy_column(chunks, lengths):
+    np = _require_numpy()
+    typed = [chunk for chunk in chunks if chunk is not None]
+    if not typed:
+        column = np.empty(sum(lengths), dtype=object)
+        column[:] = None
+        return column
+    dtype = np.result_type(*typed)
+    if len(typed) < len(chunks) and dtype.kind in 'biu':
+        dtype = np.dtype(object)
+    if dtype.kind == 'f':
+        missing = np.nan
+    elif dtype.kind == 'M':
+        missing = np.datetime64('NaT')
+    else:
+        missing = None
+    parts = [
+        chunk.astype(dtype, copy=False) if chunk is not None else np.full(length, missing, dtype=dtype)
+        for chunk, length in zip(chunks, lengths)
+    ]
+    return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+
+def _arrow_chunk(values, dats):
+    pa = _require_pyarrow()
+    if dats and _is_dats(_first_value(values)):
+        np = _require_numpy()
+        days = decode_dats(values)
+        return pa.array(days, mask=np.isnat(days), type=pa.date32())
+    return pa.array(values)
+
+
+def _arrow_common_type(types):
+    """Type a column's batches are cast to when they were inferred differently"""
+    pa = _require_pyarrow()
+    types = list(dict.fromkeys(types))
+    if len(types) == 1:
+        return types[0]
+    if all(pa.types.is_decimal(t) for t in types):
+        scale = max(t.scale for t in types)
+        integer_digits = max(t.precision - t.scale for t in types)
+        return pa.decimal128(min(38, integer_digits + scale), scale)
+    if all(pa.types.is_integer(t) for t in types):
+        return pa.int64()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_decimal(t) for t in types):
+        return pa.float64()
+    return pa.string()
+
+
+def _arrow_column(chunks):
+    pa = _require_pyarrow()
+    types = [chunk.type for chunk in chunks if not pa.types.is_null(chunk.type)]
+    column_type = _arrow_common_type(types) if types else pa.null()
+    return pa.chunked_array(
+        [chunk if chunk.type == column_type else chunk.cast(column_type) for chunk in chunks],
+        type=column_type
+    )
+
+
+class ColumnarBuilder:
+    """
+    Builds one typed array per column from fetchmany batches, without a
+    per-row dict (or tuple) stage. Columns named in date_columns holding
+    DATS strings are decoded to native dates.
+    """
+    def __init__(self, columns, result_format="arrow", date_columns=()):
+        check_result_format(result_format)
+        self.columns = tuple(columns)
+        self.result_format = result_format
+        date_columns = {name.upper() for name in date_columns}
+        self._dats = [name.upper() in date_columns for name in self.columns]
+        self._chunks = [[] for _ in self.columns]
+        self._lengths = []
+        self.nbytes = 0
+
+    def __len__(self):
+        return sum(self._lengths)
+
+    def append(self, rows):
+        """Adds a batch of row sequences; returns the bytes held by its arrays"""
+        if not rows:
+            return 0
+        convert = _arrow_chunk if self.result_format == "arrow" else _numpy_chunk
+        batch_bytes = 0
+        for index, values in enumerate(zip(*rows)):
+            chunk = convert(list(values), self._dats[index])
+            self._chunks[index].append(chunk)
+            if chunk is not None:
+                batch_bytes += chunk.nbytes
+        self._lengths.append(len(rows))
+        self.nbytes += batch_bytes
+        return batch_bytes
+
+    def finish(self, truncated=False):
+        if self.result_format == "arrow":
+            pa = _require_pyarrow()
+            if self._lengths:
+                arrays = [_arrow_column(chunks) for chunks in self._chunks]
+            else:
+                arrays = [pa.chunked_array([], type=pa.null()) for _ in self.columns]
+        else:
+            arrays = [_numpy_column(chunks, self._lengths) for chunks in self._chunks]
+        return ColumnarResult(self.columns, arrays, self.result_format, truncated=truncated)
+
+
+class ColumnarResult:
+    """
+    Column-oriented query result: one typed array per column (pyarrow
+    ChunkedArrays for the "arrow" format, NumPy arrays for "numpy"). In
+    the numpy format, integer and boolean columns holding NULLs are object
+    arrays of Python values and None; float columns use NaN.
+
+    to_arrow/to_pandas hand the column buffers over without copying where
+    the types allow it, and write_parquet/write_feather stream them to
+    disk. `rows` materializes row tuples on access, for code such as
+    summary compaction that works row by row.
+    """
+    affected_rows = None
+
+    def __init__(self, columns, arrays, result_format, truncated=False):
+        self.columns = tuple(columns)
+        self.arrays = list(arrays)
+        self.result_format = result_format
+        self.truncated = truncated
+
+    def __len__(self):
+        return len(self.arrays[0]) if self.arrays else 0
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def column(self, name):
+        return self.arrays[self.columns.index(name)]
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays)
+
+    @property
+    def rows(self):
+        if self.result_format == "arrow":
+            values = [array.to_pylist() for array in self.arrays]
+        else:
+            values = [_numpy_values(array) for array in self.arrays]
+        return list(zip(*values))
+
+    def to_arrow(self):
+        """pyarrow Table over the column buffers (zero-copy for the arrow format)"""
+        pa = _require_pyarrow()
+        if self.result_format == "arrow":
+            arrays = self.arrays
+        else:
+            # from_pandas maps NaN/NaT to nulls; numeric arrays without them are wrapped, not copied
+            arrays = [pa.array(array, from_pandas=True) for array in self.arrays]
+        return pa.Table.from_arrays(arrays, names=list(self.columns))
+
+    def to_pandas(self):
+        """pandas DataFrame sharing the column buffers where possible"""
+        if self.result_format == "arrow":
+            return self.to_arrow().to_pandas(split_blocks=True, date_as_object=False)
+        import pandas
+        frame = pandas.DataFrame(dict(enumerate(self.arrays)), copy=False)
+        frame.columns = list(self.columns)
+        return frame
+
+    def write_parquet(self, path, **kwargs):
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(self.to_arrow(), path, **kwargs)
+
+    def write_feather(self, path, **kwargs):
+        import pyarrow.feather
+        pyarrow.feather.write_feather(self.to_arrow(), path, **kwargs)
+
+    def to_text(self, max_rows=None, delimiter=' | '):
+        rows = self.rows if max_rows is None else self[:max_rows].rows
+        lines = [delimiter.join(self.columns)]
+        lines.extend(delimiter.join('' if value is None else str(value) for value in row) for row in rows)
+        omitted = len(self) - len(rows)
+        if omitted > 0:
+            lines.append(f"... {omitted} more rows")
+        if self.truncated:
+            lines.append("... result truncated at fetch limit")
+        return "\n".join(lines)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ColumnarResult(self.columns, [array[index] for array in self.arrays], self.result_format,
+                                  truncated=self.truncated)
+        if self.result_format == "arrow":
+            values = [array[index].as_py() for array in self.arrays]
+        else:
+            values = [_numpy_values(array[[index]])[0] for array in self.arrays]
+        return dict(zip(self.columns, values))
+
+    def __str__(self):
+        return self.to_text()
+
+    def __repr__(self):
+        return (f"ColumnarResult(format={self.result_format!r}, columns={list(self.columns)}, "
+                f"rows={len(self)}, truncated={self.truncated})")
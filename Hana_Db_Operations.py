@@ -1,60 +1,609 @@
+import sys
+import threading
+import re
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from hdbcli import dbapi
 from config import Config
+from Columnar_Results import ColumnarBuilder, check_result_format
+from Column_Metadata import TableColumns, column_info
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_CHECKOUT_TIMEOUT = 30
+DEFAULT_MAX_IDLE_SECONDS = 300
+DEFAULT_HEALTH_CHECK_INTERVAL = 30
+DEFAULT_FETCH_BATCH_SIZE = 1000
+DEFAULT_MAX_RESULT_ROWS = 100000
+DEFAULT_MAX_RESULT_BYTES = 64 * 1024 * 1024
+# Table names per catalog query when introspecting many tables at once
+DEFAULT_INTROSPECTION_CHUNK_SIZE = 500
+# Prepared statements kept open per connection
+DEFAULT_STATEMENT_CACHE_SIZE = 64
+# IN lists are padded to a power of two placeholders (at least this many)
+# so catalog queries only ever use a handful of distinct statement texts
+MIN_IN_LIST_PLACEHOLDERS = 16
+
+_SIMPLE_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_$#]*$')
+
+
+def connect_hana():
+    """
+    Open a new connection to the HANA database using the configured credentials.
+    """
+    return dbapi.connect(
+        address=Config.hanadb_address,
+        port=Config.hanadb_port,
+        user=Config.hanadb_user,
+        password=Config.hanadb_pass,
+    )
+
+
+def schema_identifier(schema_name):
+    """
+    SQL identifier for a schema name: plain names stay unquoted (and so keep
+    HANA's case folding), anything else is quoted with embedded quotes escaped
+    """
+    if _SIMPLE_IDENTIFIER.match(schema_name):
+        return schema_name
+    return '"' + schema_name.replace('"', '""') + '"'
+
+
+def in_list_params(values, chunk_size):
+    """
+    Returns (placeholders, params) for an IN list. The list is padded with
+    NULLs, which never match, to a power of two placeholders so the same
+    prepared statement serves chunks of similar size.
+    """
+    size = MIN_IN_LIST_PLACEHOLDERS
+    while size < len(values):
+        size *= 2
+    size = max(min(size, chunk_size), len(values))
+    params = list(values) + [None] * (size - len(values))
+    return ", ".join("?" * size), params
+
+
+def estimate_row_bytes(row):
+    """
+    Rough in-memory size of a result row, used to enforce byte caps
+    """
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+
+
+class QueryResult:
+    """
+    Compact query result: a single column header plus tuple rows.
+
+    Iterating (or indexing) yields one dict per row on demand, so callers
+    written against the old list-of-dicts format keep working without
+    the result ever holding a dict per row.
+    """
+    def __init__(self, columns, rows=None, truncated=False, affected_rows=None):
+        self.columns = tuple(columns)
+        self.rows = rows if rows is not None else []
+        self.truncated = truncated
+        self.affected_rows = affected_rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        columns = self.columns
+        for row in self.rows:
+            yield dict(zip(columns, row))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return QueryResult(self.columns, self.rows[index], truncated=self.truncated)
+        return dict(zip(self.columns, self.rows[index]))
+
+    def __bool__(self):
+        return bool(self.rows) or self.affected_rows is not None
+
+    def as_dicts(self):
+        """Materialize the old list-of-dicts format"""
+        return list(self)
+
+    def to_text(self, max_rows=None, delimiter=' | '):
+        """
+        Header line followed by one delimited line per row, optionally
+        limited to the first max_rows rows
+        """
+        if self.affected_rows is not None and not self.columns:
+            return f"{self.affected_rows} rows affected"
+        rows = self.rows if max_rows is None else self.rows[:max_rows]
+        lines = [delimiter.join(self.columns)]
+        lines.extend(delimiter.join('' if value is None else str(value) for value in row) for row in rows)
+        omitted = len(self.rows) - len(rows)
+        if omitted > 0:
+            lines.append(f"... {omitted} more rows")
+        if self.truncated:
+            lines.append("... result truncated at fetch limit")
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.to_text()
+
+    def __repr__(self):
+        return f"QueryResult(columns={list(self.columns)}, rows={len(self.rows)}, truncated={self.truncated})"
+
+
+class PreparedStatementCache:
+    """
+    Prepared statements of one connection, keyed by SQL text.
+
+    Every statement gets its own cursor, prepared once with hdbcli's
+    cursor.prepare() and re-run with executeprepared(), so repeated
+    statements skip parsing and compilation. Drivers without prepare()
+    fall back to execute() with bound parameters. The least recently used
+    statements are closed once max_size is exceeded.
+
+    Statements are keyed on the connection's current schema (kept in
+    schema by whoever switches it) as well as the SQL text, since HANA
+    resolves unqualified table names when the statement is prepared.
+    """
+    def __init__(self, conn, max_size=DEFAULT_STATEMENT_CACHE_SIZE):
+        self.conn = conn
+        self.max_size = max_size
+        self.schema = None
+        self._cursors = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def prepare(self, sql):
+        """
+        Prepares sql without executing it, so HANA compiles it and reports
+        errors; the cursor is kept for execute(). Returns False when the
+        driver cannot prepare statements.
+        """
+        return hasattr(self._cursor(sql), 'prepare')
+
+    def execute(self, sql, params=None):
+        """Executes sql with params on its prepared cursor and returns the cursor"""
+        cursor = self._cursor(sql)
+        if hasattr(cursor, 'executeprepared'):
+            cursor.executeprepared(list(params or ()))
+        else:
+            cursor.execute(sql, list(params or ()))
+        return cursor
+
+    def __len__(self):
+        return len(self._cursors)
+
+    def _cursor(self, sql):
+        key = (self.schema, sql)
+        cursor = self._cursors.get(key)
+        if cursor is not None:
+            self._cursors.move_to_end(key)
+            self.hits += 1
+            return cursor
+        self.misses += 1
+        cursor = self.conn.cursor()
+        if hasattr(cursor, 'prepare'):
+            try:
+                cursor.prepare(sql)
+            except Exception:
+                self._close_cursor(cursor)
+                raise
+        self._cursors[key] = cursor
+        while len(self._cursors) > self.max_size:
+            _, evicted = self._cursors.popitem(last=False)
+            self._close_cursor(evicted)
+        return cursor
+
+    def close(self):
+        for cursor in self._cursors.values():
+            self._close_cursor(cursor)
+        self._cursors.clear()
+
+    @staticmethod
+    def _close_cursor(cursor):
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+
+class PooledConnection:
+    """
+    A pooled HANA connection together with the bookkeeping the pool needs
+    """
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = PreparedStatementCache(conn)
+        self.schema = None
+        self.last_used = time.monotonic()
+        self.last_checked = self.last_used
+
+    def is_alive(self):
+        """
+        Returns False when the underlying socket is known to be broken
+        """
+        try:
+            return bool(self.conn.isconnected())
+        except Exception:
+            return False
+
+    def ping(self):
+        """
+        Round-trip a trivial statement to verify the connection is usable
+        """
+        try:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("SELECT 1 FROM DUMMY")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            self.last_checked = time.monotonic()
+            return True
+        except Exception:
+            return False
+
+    def set_schema(self, schema_name):
+        """
+        Switch the connection to the given schema if it is not already on it
+        """
+        if schema_name and self.schema != schema_name:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(f"SET SCHEMA {schema_identifier(schema_name)}")
+            finally:
+                cursor.close()
+            self.schema = schema_name
+            self.statements.schema = schema_name
+
+    def close(self):
+        self.statements.close()
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+class HanaConnectionPool:
+    """
+    Bounded, thread-safe pool of HANA connections.
+
+    Connections are created on demand up to max_size, health checked on
+    checkout, evicted after max_idle_seconds of inactivity and replaced
+    when their socket is found to be broken.
+    """
+    def __init__(self, max_size=DEFAULT_POOL_SIZE, min_idle=0,
+                 checkout_timeout=DEFAULT_CHECKOUT_TIMEOUT,
+                 max_idle_seconds=DEFAULT_MAX_IDLE_SECONDS,
+                 health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL,
+                 connect=connect_hana):
+        if max_size < 1:
+            raise ValueError("Pool max_size must be at least 1")
+        self.max_size = max_size
+        self.min_idle = min_idle
+        self.checkout_timeout = checkout_timeout
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_interval = health_check_interval
+        self._connect = connect
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'max_wait_time': 0.0,
+            'created': 0,
+            'discarded': 0,
+            'evicted': 0,
+            'timeouts': 0,
+        }
+
+    def checkout(self, schema_name=None, timeout=None):
+        """
+        Borrow a connection, waiting up to timeout seconds for one to free up
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        waited = False
+        pooled = None
+        expired = []
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                expired.extend(self._evict_idle_locked())
+                if self._idle:
+                    # LIFO keeps the most recently used connections warm
+                    pooled = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    self._record_wait_locked(started)
+                    raise TimeoutError(
+                        f"Timed out after {timeout}s waiting for a HANA connection "
+                        f"({self.max_size} in use)"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._stats['checkouts'] += 1
+            if waited:
+                self._record_wait_locked(started)
+
+        for stale in expired:
+            stale.close()
+
+        try:
+            if pooled is not None and not self._is_healthy(pooled):
+                pooled.close()
+                self._count('discarded')
+                pooled = None
+            if pooled is None:
+                pooled = PooledConnection(self._connect())
+                self._count('created')
+            pooled.set_schema(schema_name)
+        except Exception:
+            if pooled is not None:
+                pooled.close()
+            self._release_slot()
+            raise
+        return pooled
+
+    def checkin(self, pooled, discard=False):
+        """
+        Return a borrowed connection; broken connections are closed instead
+        """
+        if discard or self._closed:
+            pooled.close()
+            if discard:
+                self._count('discarded')
+            self._release_slot()
+            return
+        pooled.last_used = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, schema_name=None, timeout=None):
+        """
+        Context manager that checks a connection out and always checks it back in
+        """
+        pooled = self.checkout(schema_name, timeout)
+        broken = False
+        try:
+            yield pooled
+        except dbapi.Error:
+            broken = not pooled.is_alive()
+            raise
+        finally:
+            self.checkin(pooled, discard=broken)
+
+    def stats(self):
+        """
+        Snapshot of pool usage, useful for sizing max_size
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self._size,
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+            })
+        stats['avg_wait_time'] = stats['wait_time'] / stats['waits'] if stats['waits'] else 0.0
+        return stats
+
+    def close(self):
+        """
+        Close all idle connections; connections still in use are closed on checkin
+        """
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            pooled.close()
+
+    def _is_healthy(self, pooled):
+        if not pooled.is_alive():
+            return False
+        if time.monotonic() - pooled.last_checked >= self.health_check_interval:
+            return pooled.ping()
+        return True
+
+    def _record_wait_locked(self, started):
+        """Count a checkout that had to wait, whether or not it got a connection (lock held)"""
+        wait_time = time.monotonic() - started
+        self._stats['waits'] += 1
+        self._stats['wait_time'] += wait_time
+        self._stats['max_wait_time'] = max(self._stats['max_wait_time'], wait_time)
+
+    def _evict_idle_locked(self):
+        """Remove connections idle for longer than max_idle_seconds (lock held)"""
+        if not self.max_idle_seconds:
+            return []
+        now = time.monotonic()
+        expired = []
+        # The deque is ordered oldest-first, so stop at the first fresh entry
+        while len(self._idle) > self.min_idle and now - self._idle[0].last_used > self.max_idle_seconds:
+            expired.append(self._idle.popleft())
+        self._size -= len(expired)
+        self._stats['evicted'] += len(expired)
+        return expired
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._in_use -= 1
+            self._cond.notify()
+
+    def _count(self, name):
+        with self._cond:
+            self._stats[name] += 1
+
 
 class HanaDbConnector:
-    def __init__(self):
+    def __init__(self, pool_size=None, pool=None):
+        """
+        Without arguments a single shared connection is used. Pass pool_size
+        (or an existing HanaConnectionPool) to give every call its own
+        pooled connection so the connector can be used from many threads.
+        """
         self.conn = None
         self.cursor = None
+        self.statements = None
         self.current_schema = None
+        if pool is None and pool_size:
+            pool = HanaConnectionPool(max_size=pool_size)
+        self.pool = pool
 
     def establish_conn(self):
         """
         Establish a connection to the HANA database if not already connected.
         """
         if not self.conn:
-            self.conn = dbapi.connect(
-                address=Config.hanadb_address,
-                port=Config.hanadb_port,
-                user=Config.hanadb_user,
-                password=Config.hanadb_pass,
-            )
+            self.conn = connect_hana()
             self.cursor = self.conn.cursor()
+            self.statements = PreparedStatementCache(self.conn)
 
     def close_conn(self):
         """
         Close the connection to the HANA database.
         """
+        if self.pool:
+            self.pool.close()
+        if self.statements:
+            self.statements.close()
         if self.cursor:
             self.cursor.close()
         if self.conn:
             self.conn.close()
         self.conn = None
         self.cursor = None
+        self.statements = None
+
+    def pool_stats(self):
+        """
+        Returns connection pool usage statistics, or None when not pooled
+        """
+        return self.pool.stats() if self.pool else None
+
+    @contextmanager
+    def borrow_cursor(self):
+        """
+        Yields a cursor for a single operation. In pooled mode the cursor
+        belongs to a connection checked out for this caller only.
+        """
+        if self.pool is None:
+            self.establish_conn()
+            yield self.cursor
+            return
+        with self.pool.connection(self.current_schema) as pooled:
+            cursor = pooled.conn.cursor()
+            try:
+                yield cursor
+            finally:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+    @contextmanager
+    def borrow_statements(self):
+        """
+        Yields the PreparedStatementCache of a connection for a single
+        operation. In pooled mode the connection is checked out for this
+        caller only.
+        """
+        if self.pool is None:
+            self.establish_conn()
+            yield self.statements
+            return
+        with self.pool.connection(self.current_schema) as pooled:
+            yield pooled.statements
+
+    def _run(self, operation, prepared=False):
+        """
+        Runs operation(cursor) on a borrowed cursor, or with prepared=True
+        operation(statements) on the connection's PreparedStatementCache.
+        A pooled call that fails because its socket broke is retried once
+        on a fresh connection.
+        """
+        if self.pool is None:
+            self.establish_conn()
+            return operation(self.statements if prepared else self.cursor)
+        for attempt in range(2):
+            pooled = self.pool.checkout(self.current_schema)
+            cursor = None
+            broken = False
+            try:
+                if prepared:
+                    return operation(pooled.statements)
+                cursor = pooled.conn.cursor()
+                return operation(cursor)
+            except dbapi.Error:
+                broken = not pooled.is_alive()
+                if not broken or attempt:
+                    raise
+            finally:
+                if cursor is not None:
+                    try:
+                        cursor.close()
+                    except Exception:
+                        pass
+                self.pool.checkin(pooled, discard=broken)
 
     def list_schemas(self):
         """
         Lists all non-system schemas in HANA DB
         """
-        try:
-            self.establish_conn()
-            self.cursor.execute("""
+        def operation(cursor):
+            cursor.execute("""
                 SELECT SCHEMA_NAME 
                 FROM SYS.SCHEMAS 
                 WHERE SCHEMA_NAME NOT LIKE '_SYS%'
                 ORDER BY SCHEMA_NAME
             """)
-            schemas = [row[0] for row in self.cursor.fetchall()]
-            return schemas, None
+            return [row[0] for row in cursor.fetchall()]
+
+        try:
+            return self._run(operation), None
         except Exception as e:
             return None, str(e)
 
     def select_schema(self, schema_name):
         """
-        Sets the current schema
+        Sets the current schema. Like _run, a pooled switch that fails
+        because its socket broke is retried once on a fresh connection.
         """
         try:
-            self.establish_conn()
-            self.cursor.execute(f"SET SCHEMA {schema_name}")
+            if self.pool is None:
+                self.establish_conn()
+                self.cursor.execute(f"SET SCHEMA {schema_identifier(schema_name)}")
+                self.statements.schema = schema_name
+            else:
+                # Validate the schema once; every later checkout switches to it
+                for attempt in range(2):
+                    pooled = self.pool.checkout()
+                    broken = False
+                    try:
+                        pooled.set_schema(schema_name)
+                        break
+                    except dbapi.Error:
+                        broken = not pooled.is_alive()
+                        if not broken or attempt:
+                            raise
+                    finally:
+                        self.pool.checkin(pooled, discard=broken)
             self.current_schema = schema_name
             return True, None
         except Exception as e:
@@ -64,52 +613,160 @@ class HanaDbConnector:
         """
         Lists all tables in the current schema
         """
-        try:
-            if not self.current_schema:
-                return None, "No schema selected. Please select a schema first."
-            
-            self.establish_conn()
-            self.cursor.execute(f"""
+        def operation(statements):
+            cursor = statements.execute("""
                 SELECT TABLE_NAME 
                 FROM TABLES 
-                WHERE SCHEMA_NAME = '{self.current_schema}'
+                WHERE SCHEMA_NAME = ?
                 ORDER BY TABLE_NAME
-            """)
-            tables = [row[0] for row in self.cursor.fetchall()]
-            return tables, None
+            """, (self.current_schema,))
+            return [row[0] for row in cursor.fetchall()]
+
+        try:
+            if not self.current_schema:
+                return None, "No schema selected. Please select a schema first."
+            return self._run(operation, prepared=True), None
         except Exception as e:
             return None, str(e)
 
     def list_columns(self, table_name):
         """
-        Lists all columns for a specified table
+        Lists all columns for a specified table as shared ColumnInfo records
+        (col.name / col['name'], type, length, nullable)
         """
-        try:
-            if not self.current_schema:
-                return None, "No schema selected. Please select a schema first."
-            
-            self.establish_conn()
-            self.cursor.execute(f"""
+        def operation(statements):
+            cursor = statements.execute("""
                 SELECT 
                     COLUMN_NAME,
                     DATA_TYPE_NAME,
                     LENGTH,
                     IS_NULLABLE
                 FROM TABLE_COLUMNS 
-                WHERE SCHEMA_NAME = '{self.current_schema}' 
-                AND TABLE_NAME = '{table_name}'
+                WHERE SCHEMA_NAME = ? 
+                AND TABLE_NAME = ?
                 ORDER BY POSITION
-            """)
-            columns = [
-                {
-                    'name': row[0],
-                    'type': row[1],
-                    'length': row[2],
-                    'nullable': row[3]
-                }
-                for row in self.cursor.fetchall()
-            ]
-            return columns, None
+            """, (self.current_schema, table_name))
+            return [column_info(row[0], row[1], row[2], row[3]) for row in cursor.fetchall()]
+
+        try:
+            if not self.current_schema:
+                return None, "No schema selected. Please select a schema first."
+            return self._run(operation, prepared=True), None
+        except Exception as e:
+            return None, str(e)
+
+    def list_columns_bulk(self, table_names, chunk_size=DEFAULT_INTROSPECTION_CHUNK_SIZE):
+        """
+        Lists the columns of many tables with one TABLE_COLUMNS query per
+        chunk of table names instead of one query per table.
+        Returns a dict of table name -> TableColumns of list_columns records.
+        """
+        table_names = list(dict.fromkeys(table_names))
+
+        def operation(statements):
+            records_by_table = {}
+            for start in range(0, len(table_names), chunk_size):
+                chunk = table_names[start:start + chunk_size]
+                placeholders, params = in_list_params(chunk, chunk_size)
+                cursor = statements.execute(f"""
+                    SELECT 
+                        TABLE_NAME,
+                        COLUMN_NAME,
+                        DATA_TYPE_NAME,
+                        LENGTH,
+                        IS_NULLABLE
+                    FROM TABLE_COLUMNS 
+                    WHERE SCHEMA_NAME = ? 
+                    AND TABLE_NAME IN ({placeholders})
+                    ORDER BY TABLE_NAME, POSITION
+                """, [self.current_schema] + params)
+                for row in cursor.fetchall():
+                    records_by_table.setdefault(row[0], []).append(column_info(row[1], row[2], row[3], row[4]))
+            return {table: TableColumns(records) for table, records in records_by_table.items()}
+
+        try:
+            if not self.current_schema:
+                return None, "No schema selected. Please select a schema first."
+            if not table_names:
+                return {}, None
+            return self._run(operation, prepared=True), None
+        except Exception as e:
+            return None, str(e)
+
+    def list_key_columns_bulk(self, table_names, chunk_size=DEFAULT_INTROSPECTION_CHUNK_SIZE):
+        """
+        Returns the primary key columns of many tables as a dict of
+        table name -> list of column names, read from SYS.CONSTRAINTS
+        """
+        table_names = list(dict.fromkeys(table_names))
+
+        def operation(statements):
+            key_columns = {}
+            for start in range(0, len(table_names), chunk_size):
+                chunk = table_names[start:start + chunk_size]
+                placeholders, params = in_list_params(chunk, chunk_size)
+                cursor = statements.execute(f"""
+                    SELECT 
+                        TABLE_NAME,
+                        COLUMN_NAME
+                    FROM SYS.CONSTRAINTS 
+                    WHERE SCHEMA_NAME = ? 
+                    AND TABLE_NAME IN ({placeholders})
+                    AND IS_PRIMARY_KEY = 'TRUE'
+                    ORDER BY TABLE_NAME, POSITION
+                """, [self.current_schema] + params)
+                for row in cursor.fetchall():
+                    key_columns.setdefault(row[0], []).append(row[1])
+            return key_columns
+
+        try:
+            if not self.current_schema:
+                return None, "No schema selected. Please select a schema first."
+            if not table_names:
+                return {}, None
+            return self._run(operation, prepared=True), None
+        except Exception as e:
+            return None, str(e)
+
+    def list_table_markers(self, table_names, chunk_size=DEFAULT_INTROSPECTION_CHUNK_SIZE):
+        """
+        Returns a cheap change marker per table (create time plus column
+        count, last position and total length) used to validate cached
+        metadata without re-reading every column. Tables that do not exist
+        are absent from the result.
+        """
+        table_names = list(dict.fromkeys(table_names))
+
+        def operation(statements):
+            markers = {}
+            for start in range(0, len(table_names), chunk_size):
+                chunk = table_names[start:start + chunk_size]
+                placeholders, params = in_list_params(chunk, chunk_size)
+                cursor = statements.execute(f"""
+                    SELECT 
+                        T.TABLE_NAME,
+                        T.CREATE_TIME,
+                        COUNT(C.COLUMN_NAME),
+                        MAX(C.POSITION),
+                        SUM(C.LENGTH)
+                    FROM TABLES T
+                    LEFT JOIN TABLE_COLUMNS C
+                        ON C.SCHEMA_NAME = T.SCHEMA_NAME
+                        AND C.TABLE_NAME = T.TABLE_NAME
+                    WHERE T.SCHEMA_NAME = ? 
+                    AND T.TABLE_NAME IN ({placeholders})
+                    GROUP BY T.TABLE_NAME, T.CREATE_TIME
+                """, [self.current_schema] + params)
+                for row in cursor.fetchall():
+                    markers[row[0]] = "|".join(str(value) for value in row[1:])
+            return markers
+
+        try:
+            if not self.current_schema:
+                return None, "No schema selected. Please select a schema first."
+            if not table_names:
+                return {}, None
+            return self._run(operation, prepared=True), None
         except Exception as e:
             return None, str(e)
 
@@ -117,24 +774,206 @@ class HanaDbConnector:
         """
         Executes a query and returns the results
         """
-        try:
-            self.establish_conn()
-            self.cursor.execute(query)
-            
+        def operation(cursor):
+            cursor.execute(query)
+
             # Check if the query returns results
-            if self.cursor.description:
-                columns = [desc[0] for desc in self.cursor.description]
-                rows = [dict(zip(columns, row)) for row in self.cursor.fetchall()]
-                return rows, None
-            else:
-                # For queries that don't return results (INSERT, UPDATE, etc.)
-                affected_rows = self.cursor.rowcount
-                return {'affected_rows': affected_rows}, None
+            if cursor.description:
+                columns = [desc[0] for desc in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            # For queries that don't return results (INSERT, UPDATE, etc.)
+            return {'affected_rows': cursor.rowcount}
+
+        try:
+            return self._run(operation), None
+        except Exception as e:
+            return None, str(e)
+
+    def explain_cost(self, query):
+        """
+        Estimates the cost of a query with EXPLAIN PLAN without executing it.
+        Returns (cost, error); cost is the root operator's SUBTREE_COST.
+        """
+        statement_name = f"COST_{uuid.uuid4().hex}"
+
+        def operation(cursor):
+            cursor.execute(f"EXPLAIN PLAN SET STATEMENT_NAME = '{statement_name}' FOR {query}")
+            try:
+                cursor.execute(
+                    "SELECT MAX(SUBTREE_COST) FROM EXPLAIN_PLAN_TABLE WHERE STATEMENT_NAME = ?",
+                    (statement_name,)
+                )
+                row = cursor.fetchone()
+            finally:
+                cursor.execute("DELETE FROM EXPLAIN_PLAN_TABLE WHERE STATEMENT_NAME = ?", (statement_name,))
+            return float(row[0]) if row and row[0] is not None else None
+
+        try:
+            return self._run(operation), None
+        except Exception as e:
+            return None, str(e)
+
+    def execute_prepared(self, sql, params=None):
+        """
+        Executes a parameterized statement ("?" placeholders) through the
+        connection's prepared statement cache, so repeated statements that
+        only differ in their parameters reuse HANA's compiled plan.
+        Returns the results like execute_query.
+        """
+        def operation(statements):
+            cursor = statements.execute(sql, params)
+            if cursor.description:
+                columns = [desc[0] for desc in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return {'affected_rows': cursor.rowcount}
+
+        try:
+            return self._run(operation, prepared=True), None
+        except Exception as e:
+            return None, str(e)
+
+    def prepare_query(self, query):
+        """
+        Compiles a statement on HANA without executing it (cursor.prepare),
+        which reports syntax errors and unknown tables or columns without
+        running the query. The prepared statement is kept in the connection's
+        statement cache. Returns (prepared, error); prepared is False when
+        the driver cannot prepare statements.
+        """
+        try:
+            return self._run(lambda statements: statements.prepare(query), prepared=True), None
+        except Exception as e:
+            return False, str(e)
+
+    def stream_query(self, query, batch_size=DEFAULT_FETCH_BATCH_SIZE, max_rows=None, max_bytes=None,
+                     params=None):
+        """
+        Generator over the results of a query in fetchmany batches.
+
+        Each batch is a QueryResult sharing the same column header. Fetching
+        stops as soon as max_rows or max_bytes is reached, in which case the
+        final batch is flagged as truncated. The cursor (and, in pooled mode,
+        its connection) is held until the generator is exhausted or closed.
+        With params the query runs as a cached prepared statement.
+        """
+        if params is None:
+            with self.borrow_cursor() as cursor:
+                cursor.execute(query)
+                yield from self._fetch_batches(cursor, batch_size, max_rows, max_bytes)
+        else:
+            with self.borrow_statements() as statements:
+                cursor = statements.execute(query, params)
+                yield from self._fetch_batches(cursor, batch_size, max_rows, max_bytes)
+
+    @staticmethod
+    def _fetch_batches(cursor, batch_size, max_rows, max_bytes):
+        if not cursor.description:
+            yield QueryResult((), affected_rows=cursor.rowcount)
+            return
+
+        columns = tuple(desc[0] for desc in cursor.description)
+        rows_seen = 0
+        bytes_seen = 0
+        yielded = False
+        while True:
+            size = batch_size
+            if max_rows is not None:
+                # Fetch one row past the cap so truncation is reported accurately
+                size = min(batch_size, max_rows - rows_seen + 1)
+            fetched = cursor.fetchmany(size)
+            if not fetched:
+                if not yielded:
+                    # Empty result sets still report their column header
+                    yield QueryResult(columns)
+                return
+
+            batch = []
+            truncated = False
+            for row in fetched:
+                if max_rows is not None and rows_seen >= max_rows:
+                    truncated = True
+                    break
+                row = tuple(row)
+                if max_bytes is not None:
+                    bytes_seen += estimate_row_bytes(row)
+                    if bytes_seen > max_bytes:
+                        truncated = True
+                        break
+                batch.append(row)
+                rows_seen += 1
+
+            if batch or truncated:
+                yield QueryResult(columns, batch, truncated=truncated)
+                yielded = True
+            if truncated:
+                return
+
+    def fetch_result(self, query, batch_size=DEFAULT_FETCH_BATCH_SIZE,
+                     max_rows=DEFAULT_MAX_RESULT_ROWS, max_bytes=DEFAULT_MAX_RESULT_BYTES, params=None):
+        """
+        Executes a query and returns a bounded QueryResult built from
+        stream_query batches
+        """
+        try:
+            result = None
+            for batch in self.stream_query(query, batch_size, max_rows, max_bytes, params):
+                if result is None:
+                    result = batch
+                else:
+                    result.rows.extend(batch.rows)
+                    result.truncated = batch.truncated
+            return result, None
+        except Exception as e:
+            return None, str(e)
+
+    def fetch_columnar(self, query, result_format="arrow", date_columns=(), batch_size=DEFAULT_FETCH_BATCH_SIZE,
+                       max_rows=DEFAULT_MAX_RESULT_ROWS, max_bytes=DEFAULT_MAX_RESULT_BYTES, params=None):
+        """
+        Executes a query and builds a ColumnarResult straight from its
+        fetchmany batches: pyarrow arrays (result_format="arrow") or NumPy
+        arrays ("numpy"), with DATS strings in date_columns decoded to
+        dates. max_rows / max_bytes cap the result like fetch_result, with
+        bytes counted on the built arrays; pass None to fetch everything.
+        Returns (result, error) for database errors. Raises ImportError when
+        numpy / pyarrow is missing and ValueError for an unknown format or a
+        statement that returns no rows.
+        """
+        check_result_format(result_format)
+
+        def operation(cursor):
+            if not cursor.description:
+                raise ValueError("Query does not return rows")
+            builder = ColumnarBuilder((desc[0] for desc in cursor.description), result_format, date_columns)
+            truncated = False
+            while not truncated:
+                size = batch_size
+                if max_rows is not None:
+                    size = min(batch_size, max_rows - len(builder) + 1)
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                if max_rows is not None and len(builder) + len(rows) > max_rows:
+                    rows = rows[:max_rows - len(builder)]
+                    truncated = True
+                builder.append(rows)
+                if max_bytes is not None and builder.nbytes > max_bytes:
+                    truncated = True
+            return builder.finish(truncated)
+
+        try:
+            if params is None:
+                with self.borrow_cursor() as cursor:
+                    cursor.execute(query)
+                    return operation(cursor), None
+            with self.borrow_statements() as statements:
+                return operation(statements.execute(query, params)), None
+        except (ImportError, ValueError):
+            raise
         except Exception as e:
             return None, str(e)
 
 if __name__ == "__main__":
-    hana_connector = HanaDbConnector()
+    hana_connector = HanaDbConnector(pool_size=4)
     success, error = hana_connector.select_schema('your schema')
     if error:
         print(f"Error selecting schema: {error}")
@@ -157,4 +996,5 @@ if __name__ == "__main__":
             for row in results:
                 print(row)
 
+    print("\nConnection pool stats:", hana_connector.pool_stats())
     hana_connector.close_conn()
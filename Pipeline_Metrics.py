@@ -0,0 +1,288 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Samples kept per stage for the session percentiles
+HISTOGRAM_MAX_SAMPLES = 10000
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_PREFIX = "hana_pipeline"
+
+_current_trace = contextvars.ContextVar("pipeline_trace", default=None)
+# Resolved on first use so importing this module stays cheap
+_openai_callback = None
+
+
+class PipelineTrace:
+    """
+    Timings and counters of one question going through the pipeline.
+
+    Stage durations add up when a stage runs more than once (e.g. row
+    fetching across batches); spans keeps every individual timing.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.stages = {}
+        self.counters = {}
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage, start_ns, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+            self.spans.append((stage, start_ns, start_ns + int(seconds * 1e9)))
+
+    def add_count(self, counter, value):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def as_dict(self):
+        """Plain dict attached to pipeline results as result["metrics"]"""
+        with self._lock:
+            return {
+                "total_seconds": round(self.duration, 6) if self.duration is not None else None,
+                "stages": {stage: round(seconds, 6) for stage, seconds in self.stages.items()},
+                "counters": dict(self.counters),
+            }
+
+
+class StageHistogram:
+    """Recent samples of one stage with count/sum over the whole session"""
+    def __init__(self, max_samples=HISTOGRAM_MAX_SAMPLES):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self, quantiles=QUANTILES):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: None for q in quantiles}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in quantiles}
+
+
+class SessionMetrics:
+    """Per-stage latency histograms and counter totals across all traces of the process"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.traces = 0
+
+    def record(self, trace):
+        with self._lock:
+            self.traces += 1
+            stages = dict(trace.stages, total=trace.duration)
+            for stage, seconds in stages.items():
+                self.histograms.setdefault(stage, StageHistogram()).add(seconds)
+            for counter, value in trace.counters.items():
+                self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def summary(self):
+        """{stage: {count, sum, p50, p95, p99}} plus the counter totals"""
+        with self._lock:
+            stages = {}
+            for stage, histogram in self.histograms.items():
+                entry = {"count": histogram.count, "sum": round(histogram.total, 6)}
+                for q, value in histogram.quantiles().items():
+                    entry[f"p{int(q * 100)}"] = round(value, 6) if value is not None else None
+                stages[stage] = entry
+            return {"traces": self.traces, "stages": stages, "counters": dict(self.counters)}
+
+    def render_prometheus(self):
+        """Prometheus text exposition format of the session metrics"""
+        summary = self.summary()
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_seconds Latency of each pipeline stage",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds summary",
+        ]
+        for stage, entry in sorted(summary["stages"].items()):
+            for q in QUANTILES:
+                value = entry[f"p{int(q * 100)}"]
+                if value is not None:
+                    lines.append(f'{METRIC_PREFIX}_stage_seconds{{stage="{stage}",quantile="{q}"}} {value}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {entry["sum"]}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {entry["count"]}')
+        for counter, value in sorted(summary["counters"].items()):
+            lines.append(f"# TYPE {METRIC_PREFIX}_{counter}_total counter")
+            lines.append(f"{METRIC_PREFIX}_{counter}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.traces = 0
+
+
+session_metrics = SessionMetrics()
+_sinks = []
+
+
+class LoggingSink:
+    """Logs one line per finished trace"""
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger("hana_pipeline.metrics")
+        self.level = level
+
+    def emit(self, trace):
+        stages = " ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in trace.stages.items())
+        counters = " ".join(f"{counter}={value}" for counter, value in trace.counters.items())
+        self.logger.log(self.level, "%s total=%.1fms %s %s", trace.name, trace.duration * 1000, stages, counters)
+
+
+class OpenTelemetrySink:
+    """
+    Exports every trace as an OpenTelemetry span with one child span per
+    stage timing. Requires the opentelemetry-api package and a configured
+    tracer provider.
+    """
+    def __init__(self, tracer=None):
+        try:
+            from opentelemetry import trace as otel_trace
+        except ImportError:
+            raise ImportError("OpenTelemetrySink requires the opentelemetry-api package")
+        self._otel_trace = otel_trace
+        self.tracer = tracer or otel_trace.get_tracer("hana_pipeline")
+
+    def emit(self, trace):
+        end_ns = trace.start_ns + int(trace.duration * 1e9)
+        root = self.tracer.start_span(trace.name, start_time=trace.start_ns)
+        for counter, value in trace.counters.items():
+            root.set_attribute(f"{METRIC_PREFIX}.{counter}", value)
+        context = self._otel_trace.set_span_in_context(root)
+        for stage, start_ns, stage_end_ns in trace.spans:
+            span = self.tracer.start_span(stage, context=context, start_time=start_ns)
+            span.end(end_time=stage_end_ns)
+        root.end(end_time=end_ns)
+
+
+def add_sink(sink):
+    """Register a sink; sink.emit(trace) is called for every finished trace"""
+    _sinks.append(sink)
+
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def trace(name="nl_query"):
+    """
+    Collect the stage timings and counters of everything run inside the
+    block (including code on threads started with a copied context). On
+    exit the trace is added to the session histograms and sent to the sinks.
+    """
+    pipeline_trace = PipelineTrace(name)
+    token = _current_trace.set(pipeline_trace)
+    try:
+        yield pipeline_trace
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # A generator closed from another context (e.g. garbage collected)
+            pass
+        pipeline_trace.finish()
+        session_metrics.record(pipeline_trace)
+        for sink in list(_sinks):
+            try:
+                sink.emit(pipeline_trace)
+            except Exception as e:
+                print(f"Error emitting pipeline metrics: {e}")
+
+
+@contextmanager
+def stage(name):
+    """Time the block as pipeline stage `name` of the current trace (no-op without one)"""
+    pipeline_trace = _current_trace.get()
+    if pipeline_trace is None:
+        yield
+        return
+    start_ns = time.time_ns()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        pipeline_trace.add_stage(name, start_ns, time.perf_counter() - started)
+
+
+def count(name, value=1):
+    """Add value to counter `name` of the current trace (no-op without one)"""
+    pipeline_trace = _current_trace.get()
+    if pipeline_trace is not None:
+        pipeline_trace.add_count(name, value)
+
+
+@contextmanager
+def llm_stage(name):
+    """
+    Stage timer for an LLM call that also counts prompt/completion tokens
+    when langchain's OpenAI usage callback is available
+    """
+    with stage(name):
+        get_openai_callback = _get_openai_callback() if _current_trace.get() is not None else None
+        if get_openai_callback is None:
+            yield
+            return
+        with get_openai_callback() as usage:
+            yield
+        count("tokens_in", usage.prompt_tokens)
+        count("tokens_out", usage.completion_tokens)
+
+
+def _get_openai_callback():
+    global _openai_callback
+    if _openai_callback is None:
+        try:
+            from langchain_community.callbacks.manager import get_openai_callback
+        except ImportError:
+            try:
+                from langchain.callbacks import get_openai_callback
+            except ImportError:
+                get_openai_callback = False
+        _openai_callback = get_openai_callback
+    return _openai_callback or None
+
+
+def serve_prometheus(port=9464, host="0.0.0.0"):
+    """
+    Serve session_metrics in Prometheus text format at /metrics on a daemon
+    thread. Returns the server; call shutdown() to stop it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            body = session_metrics.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,495 @@
+import hashlib
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 6 * 3600
+# Near-duplicate lookups are opt-in (e.g. 0.5, the share of words two phrasings
+# have in common); None only serves exact matches
+DEFAULT_SIMILARITY_THRESHOLD = None
+DEFAULT_RESULT_CACHE_BYTES = 256 * 1024 * 1024
+DEFAULT_RESULT_TTL_SECONDS = 300
+# Rows sampled when estimating the memory footprint of a cached result
+_SIZE_SAMPLE_ROWS = 100
+
+_WORD_PATTERN = re.compile(r"[a-z0-9_]+")
+# Literals and comments are kept; a line comment keeps the line break that ends it
+_SQL_TOKEN_PATTERN = re.compile(
+    r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|/\*.*?\*/|(?P<line_comment>--[^\n]*)(?P<line_end>\n)?\s*|\s+",
+    re.DOTALL
+)
+_TABLE_REF_PATTERN = re.compile(
+    r"\b(?:FROM|JOIN|INTO|UPDATE)\s+((?:\"[^\"]+\"|[\w$#]+)(?:\s*\.\s*(?:\"[^\"]+\"|[\w$#]+))?)",
+    re.IGNORECASE
+)
+# Error positions ("line 1 col 8 (at pos 7)") that differ between otherwise identical failures
+_ERROR_POSITION_PATTERN = re.compile(r"\b(?:line|col|column|pos|position)\s+\d+|\(\s*at\s+pos\s+\d+\s*\)", re.IGNORECASE)
+_ERROR_SEPARATOR_PATTERN = re.compile(r"[\s:,]*\0[\s\0]*")
+# Words that flip or scope the meaning of a question; near-duplicates must agree on them
+_GUARD_WORDS = frozenset([
+    'not', 'no', 'without', 'except', 'excluding', 'exclude', 'never',
+    'top', 'bottom', 'least', 'most', 'min', 'max', 'minimum', 'maximum',
+    'asc', 'ascending', 'desc', 'descending', 'first', 'last', 'before', 'after',
+])
+# Filler words near-duplicate questions may differ in; every other word must match
+_STOPWORDS = frozenset([
+    'a', 'an', 'the', 'me', 'us', 'i', 'we', 'you', 'please', 'can', 'could', 'would', 'do', 'does',
+    'show', 'list', 'give', 'get', 'find', 'display', 'tell', 'see', 'want', 'need',
+    'what', 'which', 'are', 'is', 'was', 'were', 'all', 'of', 'about',
+]) - _GUARD_WORDS
+# Relative dates that generate_hana_query does not rewrite into a concrete
+# DATS value; questions using them are only cached for the current day
+_RELATIVE_DATE_PATTERN = re.compile(
+    r"\b(today|yesterday|tomorrow|now|current|recent|recently|this (day|week|month|quarter|year)|ytd|mtd)\b"
+)
+
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return " ".join(question.lower().split()).rstrip(" ?.!")
+
+
+def schema_fingerprint(*parts):
+    """Stable short hash of the schema-dependent parts of the prompt"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()[:16]
+
+
+def normalize_sql(sql):
+    """
+    Collapse whitespace outside of quoted literals and comments and drop
+    a trailing semicolon so formatting differences map to the same cache
+    key. The line break ending a -- comment is kept, since it decides
+    which SQL the comment covers.
+    """
+    sql = sql.strip().rstrip(';').strip()
+
+    def replace(match):
+        if match.group('line_comment') is not None:
+            return match.group('line_comment').rstrip() + ("\n" if match.group('line_end') else "")
+        token = match.group(0)
+        return token if token[0] in "'\"/" else " "
+
+    return _SQL_TOKEN_PATTERN.sub(replace, sql)
+
+
+def error_signature(error):
+    """
+    Database error text reduced to what identifies the failure: positions,
+    case and whitespace removed, error codes and identifiers kept
+    """
+    text = _ERROR_POSITION_PATTERN.sub("\0", str(error))
+    # Drop the separators the positions were attached to
+    text = _ERROR_SEPARATOR_PATTERN.sub("", text)
+    return " ".join(text.lower().split())
+
+
+def referenced_tables(sql):
+    """
+    Upper-cased names of the tables a statement reads from or writes to,
+    without schema qualifiers or quotes
+    """
+    tables = set()
+    for reference in _TABLE_REF_PATTERN.findall(sql):
+        name = reference.split('.')[-1].strip()
+        if name.startswith('"'):
+            tables.add(name.strip('"'))
+        else:
+            tables.add(name.upper())
+    return tables
+
+
+def estimate_result_bytes(result):
+    """
+    Approximate memory held by a query result, extrapolated from a sample of rows
+    """
+    rows = getattr(result, 'rows', result)
+    if not isinstance(rows, list) or not rows:
+        return sys.getsizeof(result)
+    sample = rows[:_SIZE_SAMPLE_ROWS]
+    sample_bytes = 0
+    for row in sample:
+        values = row.values() if isinstance(row, dict) else row
+        sample_bytes += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in values)
+    return sys.getsizeof(rows) + sample_bytes * len(rows) // len(sample)
+
+
+class GeneratedQueryCache:
+    """
+    Two-tier cache for LLM generated SQL.
+
+    Entries are keyed on the normalized processed question plus a
+    fingerprint of the schema prompt. Lookups try an exact match first and
+    then, if similarity_threshold is set, the most similar cached question
+    with the same fingerprint and exactly the same content words (numbers,
+    entities, guard words): phrasings may only differ in filler words and
+    word order, since one different entity ("France" for "Germany") needs
+    different SQL. Entries expire after
+    ttl_seconds and the least recently used entry is evicted beyond
+    max_entries. With persist_path the cache is backed by a SQLite file and
+    survives restarts.
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 similarity_threshold=DEFAULT_SIMILARITY_THRESHOLD, persist_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._lock = threading.RLock()
+        self.stats = {'exact_hits': 0, 'similar_hits': 0, 'misses': 0}
+        self._db = None
+        if persist_path:
+            self._open_backend(persist_path)
+
+    def get(self, question, fingerprint):
+        """
+        Returns the cached SQL for a question, or None
+        """
+        normalized = self._cache_question(question)
+        key = (fingerprint, normalized)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry):
+                self._entries.move_to_end(key)
+                self.stats['exact_hits'] += 1
+                return entry['sql']
+            if entry is not None:
+                self._remove(key)
+
+            similar = self._find_similar(fingerprint, normalized)
+            if similar is not None:
+                self._entries.move_to_end(similar)
+                self.stats['similar_hits'] += 1
+                return self._entries[similar]['sql']
+
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, question, fingerprint, sql):
+        """
+        Stores generated SQL for a question
+        """
+        normalized = self._cache_question(question)
+        self._store(fingerprint, normalized, sql, time.time())
+        if self._db is not None:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO generated_sql (fingerprint, question, sql, created) VALUES (?, ?, ?, ?)",
+                    (fingerprint, normalized, sql, time.time())
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM generated_sql")
+                self._db.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _cache_question(self, question):
+        normalized = normalize_question(question)
+        if _RELATIVE_DATE_PATTERN.search(normalized):
+            # Pin unresolved relative dates to the day the SQL was generated
+            normalized = f"{normalized} @{datetime.now().strftime('%Y%m%d')}"
+        return normalized
+
+    def _store(self, fingerprint, normalized, sql, created):
+        key = (fingerprint, normalized)
+        tokens = _WORD_PATTERN.findall(normalized)
+        bucket = (fingerprint, self._signature(normalized, tokens))
+        with self._lock:
+            if key in self._entries:
+                # put() replaces the SQLite row itself
+                self._remove(key, drop_row=False)
+            self._entries[key] = {
+                'sql': sql,
+                'created': created,
+                'tokens': frozenset(tokens),
+                'bucket': bucket,
+            }
+            self._buckets.setdefault(bucket, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key, drop_row=True):
+        """Forget an evicted or expired entry, on disk too unless drop_row is False (lock held)"""
+        entry = self._entries.pop(key)
+        keys = self._buckets.get(entry['bucket'])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._buckets[entry['bucket']]
+        if drop_row and self._db is not None:
+            self._db.execute("DELETE FROM generated_sql WHERE fingerprint = ? AND question = ?", key)
+            self._db.commit()
+
+    def _expired(self, entry):
+        return bool(self.ttl_seconds) and time.time() - entry['created'] > self.ttl_seconds
+
+    @staticmethod
+    def _signature(normalized, tokens):
+        """Content words, including numbers (and rewritten DATS dates) and guard words, must match exactly"""
+        return tuple(sorted(set(tokens) - _STOPWORDS))
+
+    def _find_similar(self, fingerprint, normalized):
+        if not self.similarity_threshold:
+            return None
+        tokens = _WORD_PATTERN.findall(normalized)
+        token_set = frozenset(tokens)
+        candidates = self._buckets.get((fingerprint, self._signature(normalized, tokens)))
+        if not candidates or not token_set:
+            return None
+
+        best_key = None
+        best_score = 0.0
+        for key in list(candidates):
+            entry = self._entries[key]
+            if self._expired(entry):
+                self._remove(key)
+                continue
+            union = len(token_set | entry['tokens'])
+            score = len(token_set & entry['tokens']) / union if union else 0.0
+            if score > best_score:
+                best_key, best_score = key, score
+        if best_key is None or best_score < self.similarity_threshold:
+            return None
+        return best_key
+
+    def _open_backend(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS generated_sql (
+                fingerprint TEXT NOT NULL,
+                question TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (fingerprint, question)
+            )
+        """)
+        if self.ttl_seconds:
+            self._db.execute("DELETE FROM generated_sql WHERE created < ?", (time.time() - self.ttl_seconds,))
+        # Rows beyond max_entries (e.g. from a run with a larger limit) would never be loaded again
+        self._db.execute(
+            "DELETE FROM generated_sql WHERE rowid NOT IN "
+            "(SELECT rowid FROM generated_sql ORDER BY created DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT fingerprint, question, sql, created FROM generated_sql ORDER BY created DESC LIMIT ?",
+            (self.max_entries,)
+        ).fetchall()
+        for fingerprint, question, sql, created in reversed(rows):
+            self._store(fingerprint, question, sql, created)
+
+
+class QueryResultCache:
+    """
+    Memory-bounded LRU cache of query results keyed on the normalized final SQL.
+
+    Each entry remembers the tables it reads so it can be dropped with
+    invalidate_table, and expires after the shortest TTL configured for
+    those tables (table_ttls, falling back to default_ttl). Summaries are
+    stored alongside the result they describe, per question, so a full
+    hit skips both HANA and the summarization LLM call.
+    """
+    def __init__(self, max_bytes=DEFAULT_RESULT_CACHE_BYTES,
+                 default_ttl=DEFAULT_RESULT_TTL_SECONDS, table_ttls=None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.table_ttls = {table.upper(): ttl for table, ttl in (table_ttls or {}).items()}
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.stats = {'hits': 0, 'misses': 0, 'summary_hits': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, sql):
+        """
+        Returns the cached result for a statement, or None
+        """
+        with self._lock:
+            entry = self._live_entry(normalize_sql(sql))
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            return entry['result']
+
+    def put(self, sql, result):
+        """
+        Caches a statement's result. Results larger than the whole budget are not cached.
+        """
+        key = normalize_sql(sql)
+        tables = referenced_tables(key)
+        size = estimate_result_bytes(result) + sys.getsizeof(key)
+        if size > self.max_bytes:
+            return
+        ttls = [self.table_ttls.get(table, self.default_ttl) for table in tables] or [self.default_ttl]
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                'result': result,
+                'summaries': {},
+                'tables': tables,
+                'size': size,
+                'expires': time.time() + min(ttls),
+            }
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            self._bytes += size
+            self._evict()
+
+    def get_summary(self, sql, question):
+        """
+        Returns a cached summary of this statement's result for the question, or None
+        """
+        with self._lock:
+            entry = self._live_entry(normalize_sql(sql))
+            if entry is None:
+                return None
+            summary = entry['summaries'].get(normalize_question(question))
+            if summary is not None:
+                self.stats['summary_hits'] += 1
+            return summary
+
+    def put_summary(self, sql, question, summary):
+        """
+        Stores a summary next to the cached result it was generated from
+        """
+        with self._lock:
+            entry = self._live_entry(normalize_sql(sql))
+            if entry is None:
+                return
+            size = sys.getsizeof(summary)
+            entry['summaries'][normalize_question(question)] = summary
+            entry['size'] += size
+            self._bytes += size
+            self._evict()
+
+    def invalidate_table(self, table_name):
+        """
+        Drops every cached result that reads the given table; returns how many were dropped
+        """
+        with self._lock:
+            keys = list(self._by_table.get(table_name.upper(), ()))
+            for key in keys:
+                self._remove(key)
+            self.stats['invalidations'] += len(keys)
+            return len(keys)
+
+    def invalidate(self, sql):
+        with self._lock:
+            key = normalize_sql(sql)
+            if key in self._entries:
+                self._remove(key)
+                self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _live_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() > entry['expires']:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry['size']
+        for table in entry['tables']:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.stats['evictions'] += 1
+
+
+class QueryRepairCache:
+    """
+    LRU cache of repaired SQL: the fix that worked for a failing statement,
+    keyed on the schema, the error signature and the normalized failing SQL,
+    so the same failure is corrected without another LLM call. Entries
+    expire after ttl_seconds; a fix that stops working should be dropped
+    with invalidate().
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @staticmethod
+    def _key(schema_name, sql, error):
+        return schema_name, error_signature(error), normalize_sql(sql)
+
+    def get(self, schema_name, sql, error):
+        """
+        Returns the SQL that fixed this failure before, or None
+        """
+        key = self._key(schema_name, sql, error)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and time.time() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def put(self, schema_name, sql, error, fixed_sql):
+        key = self._key(schema_name, sql, error)
+        with self._lock:
+            self._entries[key] = (fixed_sql, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, schema_name, sql, error):
+        with self._lock:
+            if self._entries.pop(self._key(schema_name, sql, error), None) is not None:
+                self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
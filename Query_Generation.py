@@ -1,13 +1,97 @@
+import contextvars
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
+import math
+import os
 import re
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain_openai import AzureChatOpenAI
-from dotenv import load_dotenv
+import sys
 from config import Config
-from Hana_Db_Operations import HanaDbConnector
+from Schema_Metadata_Cache import SchemaMetadataCache
+from Column_Metadata import TableColumns, alias_table, as_table_columns
+from Result_Compaction import RunningStatistics, compact_results
+from Query_Cache import (
+    GeneratedQueryCache, QueryRepairCache, QueryResultCache, estimate_result_bytes, referenced_tables,
+    schema_fingerprint
+)
+from Sql_Guard import DEFAULT_ROW_LIMIT, ExplainPlanError, SqlGuard, parameterize_literals
+from Columnar_Results import COLUMNAR_FORMATS, RESULT_FORMATS
+import Pipeline_Metrics as metrics
+from Hana_Db_Operations import (
+    HanaDbConnector, DEFAULT_POOL_SIZE, DEFAULT_FETCH_BATCH_SIZE, DEFAULT_MAX_RESULT_ROWS, DEFAULT_MAX_RESULT_BYTES
+)
+
+# The module itself, so lazily resolved attributes (see __getattr__) can be read internally
+_module = sys.modules[__name__]
+
+# Settings read from the environment, with .env loaded on first use rather
+# than at import: name -> (variable, default, conversion). Assigning the
+# module attribute (e.g. Query_Generation.SQL_MAX_COST = 5e6) overrides one.
+_ENV_SETTINGS = {
+    # Local file used to persist introspected table metadata between runs
+    'SCHEMA_CACHE_PATH': ('HANA_SCHEMA_CACHE_PATH', '.hana_schema_cache.json', str),
+    # Optional SQLite file backing the generated SQL cache (in-memory only when unset)
+    'SQL_CACHE_PATH': ('HANA_SQL_CACHE_PATH', None, str),
+    # Optional EXPLAIN PLAN cost ceiling for generated SQL (no cost check when unset);
+    # "reject" refuses expensive queries, "limit" first retries them with a tighter row limit
+    'SQL_MAX_COST': ('HANA_SQL_MAX_COST', None, float),
+    'SQL_COST_ACTION': ('HANA_SQL_COST_ACTION', 'reject', str),
+}
+_environment_loaded = False
+_environment_lock = threading.Lock()
+
+# Schema pruning: only the most relevant tables (plus join bridges) and
+# columns are sent to the query LLM once the schema grows past these limits
+SCHEMA_PRUNING_TOP_K_TABLES = 8
+SCHEMA_PRUNING_MAX_COLUMNS = 60
+
+# Columns shared by most SAP tables that never identify a join on their own;
+# they are only listed as part of a join that has a more specific key column
+GENERIC_JOIN_COLUMNS = {'MANDT', 'CLIENT', 'LANGU', 'SPRAS', 'ERNAM', 'AENAM', 'ERDAT', 'AEDAT', 'ERZET', 'TIMESTAMP'}
+# Column types holding SAP dates
+DATE_COLUMN_TYPES = ('DATS', 'D', 'DATE')
+# Columns found in more than this share of the tables (and more than
+# COMMON_JOIN_COLUMN_MIN_TABLES tables) are treated like GENERIC_JOIN_COLUMNS
+COMMON_JOIN_COLUMN_SHARE = 0.5
+COMMON_JOIN_COLUMN_MIN_TABLES = 8
+# Column name suffixes that usually mark identifiers / foreign keys
+KEY_COLUMN_SUFFIXES = ('ID', 'NR', 'NO', 'NUM', 'KEY', 'CODE', 'VBELN', 'KUNNR', 'MATNR', 'LIFNR', 'BUKRS', 'WERKS')
+
+# Rows shown to the user as soon as the first batch is fetched in streaming mode
+STREAM_PREVIEW_ROWS = 10
+
+# "exact" summarizes the complete result; "pipelined" starts summarizing from
+# the first PIPELINE_PREVIEW_ROWS rows plus running aggregates while the rest
+# of the result is still being fetched
+SUMMARY_MODE = "exact"
+PIPELINE_PREVIEW_ROWS = 500
+PIPELINE_FETCH_WORKERS = 8
 
-load_dotenv()
+# "rows" returns raw_results as a QueryResult of row tuples; "arrow" / "numpy"
+# fetch a ColumnarResult of typed column arrays instead (needs pyarrow / numpy)
+RESULT_FORMAT = "rows"
+
+# Token budget for the query results shown to the summarization model
+SUMMARY_TOKEN_BUDGET = 3000
+
+# Generated SQL without a TOP / LIMIT gets this row limit injected; far below
+# the fetch cap (DEFAULT_MAX_RESULT_ROWS) so runaway queries stop in HANA
+SQL_ROW_LIMIT = DEFAULT_ROW_LIMIT
+# Execute generated SQL as prepared statements with predicate literals bound
+# as parameters, so questions that only differ in values reuse HANA's plan
+BIND_QUERY_LITERALS = True
+
+# SQL that HANA rejects goes back to the LLM with the error for a targeted fix,
+# up to QUERY_REPAIR_ATTEMPTS times within QUERY_REPAIR_BUDGET_SECONDS of wall
+# clock time (0 attempts turns repairs off)
+QUERY_REPAIR_ATTEMPTS = 2
+QUERY_REPAIR_BUDGET_SECONDS = 30.0
+# Compile repaired SQL on HANA (prepare, no execution) before running it
+QUERY_REPAIR_PREPARE_CHECK = True
+# Threads running repair LLM calls, so a call can be abandoned when the budget runs out
+QUERY_REPAIR_WORKERS = 4
 
 ALLOWED_TABLES = ['your tables list']
 
@@ -17,15 +101,86 @@ COLUMN_MAPPINGS = {
     'Product Category':'prdcat'
 }
 
+# Extra aliases offered for some well-known column names
+COLUMN_ALIAS_VARIATIONS = {
+    'DESCN': ('description', 'desc'),
+    'BPROC': ('process',),
+    'LANGU': ('language',),
+    'REQTYPE': ('request type', 'request types'),
+    'REQ_CREATED': ('request created date', 'request creation date'),
+}
+
+def _terms(text):
+    """Lowercase word terms of a question, table or column name, with plural 's' stripped"""
+    terms = set()
+    for word in re.findall(r'[a-z0-9]+', text.lower()):
+        if len(word) > 3 and word.endswith('s'):
+            word = word[:-1]
+        terms.add(word)
+    return terms
+
 class TableRelationshipManager:
-    def __init__(self, hana_db):
+    def __init__(self, hana_db, cache_path=None, allowed_tables=None, column_mappings=None,
+                 metadata_store=None, cache_key=None, metadata_cache=None):
+        """
+        allowed_tables / column_mappings default to the module-level
+        ALLOWED_TABLES / COLUMN_MAPPINGS. metadata_store (a
+        Tenant_Registry.SharedTableMetadata) lets managers over the same
+        tables share one copy of their metadata; cache_key names this
+        manager's entry in the metadata cache file (default: the schema).
+        Pass metadata_cache instead of cache_path to share one
+        SchemaMetadataCache between managers.
+        """
         self.hana_db = hana_db
+        self.allowed_tables = ALLOWED_TABLES if allowed_tables is None else list(allowed_tables)
+        self.column_mappings = COLUMN_MAPPINGS if column_mappings is None else dict(column_mappings)
+        self.metadata_store = metadata_store
+        self.cache_key = cache_key
+        self._shared_tables = []
         self.table_columns = {}
         self.common_columns = {}
         self.column_aliases = {}
         self.date_columns = {}
+        self.key_columns = {}
+        self.join_graph = {}
+        self.join_weights = {}
+        if metadata_cache is None and cache_path:
+            metadata_cache = SchemaMetadataCache(cache_path)
+        self.metadata_cache = metadata_cache
+        # Bumped whenever metadata is rebuilt so derived prompt fragments can be versioned
+        self.metadata_version = 0
+        self._initialize_table_info()
+
+    def refresh(self):
+        """Re-read table metadata and rebuild every derived index and prompt fragment"""
         self._initialize_table_info()
 
+    def _share_table_metadata(self):
+        """Replace this manager's per-table metadata with the metadata store's shared copies"""
+        previous = self._shared_tables
+        self._shared_tables = []
+        for table in list(self.table_columns):
+            key, (columns, date_columns, column_aliases, key_columns) = self.metadata_store.intern(
+                table,
+                self.table_columns[table],
+                self.date_columns.get(table, {}),
+                self.column_aliases.get(table, {}),
+                self.key_columns.get(table, frozenset()),
+            )
+            self._shared_tables.append(key)
+            self.table_columns[table] = columns
+            self.date_columns[table] = date_columns
+            self.column_aliases[table] = column_aliases
+            self.key_columns[table] = key_columns
+        # Released after interning so a refresh keeps unchanged tables shared
+        self.metadata_store.release(previous)
+
+    def release_shared_metadata(self):
+        """Drop this manager's references in the metadata store (e.g. when it is evicted)"""
+        if self.metadata_store is not None:
+            self.metadata_store.release(self._shared_tables)
+        self._shared_tables = []
+
     def _initialize_table_info(self):
         """Initialize table column information and find common columns"""
         print("\nInitializing table information...")
@@ -33,39 +188,182 @@ class TableRelationshipManager:
         # Clear existing data
         self.table_columns.clear()
         self.common_columns.clear()
-        
-        for table in ALLOWED_TABLES:
-            print(f"Fetching columns for table: {table}")
-            columns, error = self.hana_db.list_columns(table)
+        self.column_aliases.clear()
+        self.date_columns.clear()
+        self.key_columns.clear()
+        self.join_weights.clear()
+
+        schema_name = self.hana_db.current_schema
+        cached = None
+        markers = None
+        fresh = {}
+        if self.metadata_cache:
+            cached = self.metadata_cache.load(self.cache_key or schema_name)
+            markers, error = self.hana_db.list_table_markers(self.allowed_tables)
+            if error:
+                print(f"Error reading catalog change markers, ignoring metadata cache: {error}")
+                markers = None
+            else:
+                fresh = self.metadata_cache.fresh_tables(cached, markers)
+                print(f"Loaded {len(fresh)} of {len(self.allowed_tables)} tables from metadata cache")
+
+        for table, entry in fresh.items():
+            columns = TableColumns.from_rows(entry['columns'])
+            self.table_columns[table] = columns
+            self._identify_date_columns(table, columns)
+            self._create_column_aliases(table, columns)
+            self.key_columns[table] = frozenset(entry.get('key_columns', ()))
+
+        # One catalog round trip (per chunk of tables) instead of one per table
+        stale_tables = [table for table in self.allowed_tables if table not in fresh]
+        if markers is not None:
+            # Tables without a marker do not exist, so there is nothing to fetch
+            stale_tables = [table for table in stale_tables if table in markers]
+        columns_by_table = {}
+        if stale_tables:
+            print(f"Fetching columns for {len(stale_tables)} tables")
+            columns_by_table, error = self.hana_db.list_columns_bulk(stale_tables)
+            if error:
+                print(f"Error fetching columns: {error}")
+                columns_by_table = {}
+            key_columns, error = self.hana_db.list_key_columns_bulk(stale_tables)
             if error:
-                print(f"Error fetching columns for {table}: {error}")
+                print(f"Error fetching key constraints, falling back to column name heuristics: {error}")
+                key_columns = {}
+            for table in stale_tables:
+                self.key_columns[table] = frozenset(key_columns.get(table, ()))
+
+        for table in self.allowed_tables:
+            if table in fresh:
                 continue
-                
+            columns = columns_by_table.get(table)
             if columns:
                 print(f"Found {len(columns)} columns for {table}")
+                columns = as_table_columns(columns)
                 self.table_columns[table] = columns
                 self._identify_date_columns(table, columns)
                 self._create_column_aliases(table, columns)
             else:
                 print(f"No columns found for {table}")
 
-        # Find relationships between tables
+        if self.metadata_store is not None:
+            self._share_table_metadata()
+
+        # Relationships only need recomputing when some table changed
+        table_set = sorted(self.table_columns)
+        unchanged = (cached and not columns_by_table and cached['common_columns'] is not None
+                     and cached['table_set'] == table_set)
+        if unchanged:
+            for table1, table2, columns, weight in cached['common_columns']:
+                self.common_columns[(table1, table2)] = columns
+                self.join_weights[(table1, table2)] = weight
+            print(f"\nLoaded {len(self.common_columns)} table relationships from metadata cache")
+        else:
+            self._find_relationships()
+
+        self._build_relevance_index()
+        self._build_prompt_fragments()
+        max_cost = _module.SQL_MAX_COST
+        self.sql_guard = SqlGuard(
+            self.allowed_tables,
+            schema_name=schema_name,
+            row_limit=SQL_ROW_LIMIT,
+            hana_db=self.hana_db if max_cost else None,
+            max_cost=max_cost,
+            cost_action=_module.SQL_COST_ACTION,
+        )
+
+        if self.metadata_cache and markers is not None and not unchanged:
+            tables = {
+                table: fresh.get(table) or SchemaMetadataCache.table_entry(
+                    markers.get(table),
+                    self.table_columns[table],
+                    sorted(self.key_columns.get(table, ())),
+                )
+                for table in self.table_columns
+            }
+            try:
+                relationships = [
+                    [table1, table2, columns, self.join_weights[(table1, table2)]]
+                    for (table1, table2), columns in self.common_columns.items()
+                ]
+                self.metadata_cache.save(self.cache_key or schema_name, tables, relationships, table_set)
+            except OSError as e:
+                print(f"Error writing metadata cache: {e}")
+
+    def _find_relationships(self):
+        """
+        Find relationships between tables in one pass over an inverted
+        index of column name -> tables, instead of comparing every pair.
+        Only specific columns produce candidate pairs; generic and very
+        common columns (which would pair up nearly every table) are only
+        added to pairs that already share a specific column.
+        """
         print("\nFinding table relationships...")
-        for i, table1 in enumerate(ALLOWED_TABLES):
-            for table2 in ALLOWED_TABLES[i+1:]:
-                if table1 in self.table_columns and table2 in self.table_columns:
-                    common = self._find_common_columns(table1, table2)
-                    if common:
-                        key = f"{table1}_{table2}"
-                        self.common_columns[key] = common
-                        print(f"Found relationship between {table1} and {table2}")
+        tables_by_column = {}
+        for table in self.allowed_tables:
+            for col in self.table_columns.get(table, ()):
+                tables_by_column.setdefault(col.name, []).append(table)
+
+        common_limit = max(COMMON_JOIN_COLUMN_MIN_TABLES, COMMON_JOIN_COLUMN_SHARE * len(self.table_columns))
+        common_columns = {
+            column for column, tables in tables_by_column.items()
+            if column in GENERIC_JOIN_COLUMNS or len(tables) > common_limit
+        }
+
+        shared = {}
+        for column, tables in tables_by_column.items():
+            if column in common_columns:
+                continue
+            for i, table1 in enumerate(tables):
+                for table2 in tables[i+1:]:
+                    shared.setdefault((table1, table2), []).append(column)
+
+        common_by_table = {}
+        for table in self.allowed_tables:
+            columns = self.table_columns.get(table)
+            if columns:
+                common_by_table[table] = {name for name in columns.names if name in common_columns}
+        for (table1, table2), columns in shared.items():
+            columns.extend(sorted(common_by_table[table1] & common_by_table[table2]))
+
+        for (table1, table2), columns in shared.items():
+            # Client/language style columns alone do not make a join
+            weight = min(
+                (self._join_column_weight(table1, table2, column, len(tables_by_column[column]))
+                 for column in columns if column not in GENERIC_JOIN_COLUMNS),
+                default=None
+            )
+            if weight is None:
+                continue
+            self.common_columns[(table1, table2)] = columns
+            self.join_weights[(table1, table2)] = weight
+            print(f"Found relationship between {table1} and {table2}")
+
+    def _join_column_weight(self, table1, table2, column, table_count):
+        """
+        Cost of joining two tables on a column: primary key columns are the
+        cheapest, identifier-like names next, anything else is expensive.
+        Columns shared by many tables are penalized as less specific.
+        """
+        keys1 = self.key_columns.get(table1, ())
+        keys2 = self.key_columns.get(table2, ())
+        if column in keys1 and column in keys2:
+            weight = 1.0
+        elif column in keys1 or column in keys2:
+            weight = 1.5
+        elif column.upper().endswith(KEY_COLUMN_SUFFIXES):
+            weight = 3.0
+        else:
+            weight = 6.0
+        return weight * (1 + math.log(table_count - 1))
 
     def _identify_date_columns(self, table, columns):
         """Identify columns that use DATS format"""
         date_cols = {}
         for col in columns:
-            if col['type'].upper() in ['DATS', 'D', 'DATE']:
-                date_cols[col['name']] = 'DATS'
+            if col.type.upper() in DATE_COLUMN_TYPES:
+                date_cols[col.name] = 'DATS'
         self.date_columns[table] = date_cols
 
     def get_date_columns(self, table=None):
@@ -75,26 +373,8 @@ class TableRelationshipManager:
         return self.date_columns
 
     def _create_column_aliases(self, table, columns):
-        """Create aliases for columns to handle common variations"""
-        aliases = {}
-        for col in columns:
-            col_name = col['name']
-            aliases[col_name.lower()] = col_name
-            # Add common variations
-            if col_name in ['DESCN']:
-                aliases['description'] = col_name
-                aliases['desc'] = col_name
-            elif col_name in ['BPROC']:
-                aliases['process'] = col_name
-            elif col_name in ['LANGU']:
-                aliases['language'] = col_name
-            elif col_name in ['REQTYPE']:
-                aliases['request type'] = col_name
-                aliases['request types'] = col_name
-            elif col_name in ['REQ_CREATED']:
-                aliases['request created date'] = col_name
-                aliases['request creation date'] = col_name
-        self.column_aliases[table] = aliases
+        """Create aliases for columns to handle common variations (shared by tables with the same columns)"""
+        self.column_aliases[table] = alias_table(columns.names, COLUMN_ALIAS_VARIATIONS)
 
     def get_actual_column_name(self, table, column_alias):
         """Get the actual column name from an alias"""
@@ -102,59 +382,261 @@ class TableRelationshipManager:
             return self.column_aliases[table].get(column_alias.lower())
         return None
 
-    def _find_common_columns(self, table1, table2):
-        """Find common columns between two tables"""
-        if table1 not in self.table_columns or table2 not in self.table_columns:
-            return []
-        
-        cols1 = {col['name'] for col in self.table_columns[table1]}
-        cols2 = {col['name'] for col in self.table_columns[table2]}
-        return list(cols1.intersection(cols2))
-
-    def get_table_relationships(self):
-        """Get a formatted string of table relationships"""
-        relationships = []
-        seen_pairs = set()
-        
-        for key, columns in self.common_columns.items():
-            table1, table2 = key.split('_')
-            if (table1, table2) not in seen_pairs:
-                relationships.append(f"Tables {table1} and {table2} share columns: {', '.join(columns)}")
-                seen_pairs.add((table1, table2))
-        
+    def _build_relevance_index(self):
+        """Build an in-memory lexical index of table/column terms used to prune the prompt"""
+        self._term_tables = {}
+        self._term_columns = {}
+
+        mapped_terms = {}
+        for common_name, actual_name in self.column_mappings.items():
+            mapped_terms.setdefault(actual_name.lower(), set()).update(_terms(common_name))
+
+        for table, columns in self.table_columns.items():
+            for term in _terms(table):
+                self._add_term(term, table, None, 3.0)
+            aliases_by_column = {}
+            for alias, actual in self.column_aliases.get(table, {}).items():
+                aliases_by_column.setdefault(actual, set()).update(_terms(alias))
+            for name in columns.names:
+                terms = _terms(name) | aliases_by_column.get(name, set()) | mapped_terms.get(name.lower(), set())
+                for term in terms:
+                    self._add_term(term, table, name, 1.0)
+
+        self.join_graph = {table: {} for table in self.table_columns}
+        for (table1, table2), weight in self.join_weights.items():
+            self.join_graph[table1][table2] = weight
+            self.join_graph[table2][table1] = weight
+        self._join_path_cache = {}
+
+    def _add_term(self, term, table, column, weight):
+        tables = self._term_tables.setdefault(term, {})
+        tables[table] = max(tables.get(table, 0.0), weight)
+        if column is not None:
+            self._term_columns.setdefault(term, {}).setdefault(table, set()).add(column)
+
+    def rank_tables(self, question):
+        """
+        Score tables and columns by lexical relevance to the question.
+        Returns (table scores, column scores per table), highest first.
+        """
+        table_count = max(len(self.table_columns), 1)
+        table_scores = {}
+        column_scores = {}
+        for term in _terms(question):
+            tables = self._term_tables.get(term)
+            if not tables:
+                continue
+            # Rare terms say more about which tables are meant than common ones
+            idf = math.log(1 + table_count / len(tables))
+            for table, weight in tables.items():
+                table_scores[table] = table_scores.get(table, 0.0) + weight * idf
+            for table, columns in self._term_columns.get(term, {}).items():
+                scores = column_scores.setdefault(table, {})
+                for column in columns:
+                    scores[column] = scores.get(column, 0.0) + idf
+        ranked = dict(sorted(table_scores.items(), key=lambda item: -item[1]))
+        return ranked, column_scores
+
+    def select_relevant_schema(self, question, top_k=SCHEMA_PRUNING_TOP_K_TABLES,
+                               max_columns=SCHEMA_PRUNING_MAX_COLUMNS):
+        """
+        Pick the tables and columns to describe in the query prompt.
+
+        Returns (tables, columns per table). The top_k most relevant tables
+        are kept together with any bridge tables needed to join them; wide
+        tables are cut down to max_columns, keeping matched, join and date
+        columns first. Small schemas and questions that match nothing are
+        not pruned.
+        """
+        all_tables = [table for table in self.allowed_tables if table in self.table_columns]
+        table_scores, column_scores = self.rank_tables(question)
+        if len(all_tables) <= top_k or not table_scores:
+            selected = all_tables
+        else:
+            selected = list(table_scores)[:top_k]
+            for table1, table2, _ in self.find_join_path(selected):
+                for table in (table1, table2):
+                    if table not in selected:
+                        selected.append(table)
+            selected = [table for table in all_tables if table in selected]
+
+        selected_set = set(selected)
+        columns = {}
+        for table in selected:
+            names = list(self.table_columns[table].names)
+            if not max_columns or len(names) <= max_columns:
+                columns[table] = names
+                continue
+            join_columns = set()
+            for other in self.join_graph.get(table, ()):
+                if other in selected_set:
+                    join_columns.update(self._common_columns_between(table, other))
+            scores = column_scores.get(table, {})
+            date_columns = self.date_columns.get(table, {})
+            priority = sorted(
+                names,
+                key=lambda name: (-scores.get(name, 0.0), name not in join_columns, name not in date_columns)
+            )
+            keep = set(priority[:max_columns])
+            columns[table] = [name for name in names if name in keep]
+        return selected, columns
+
+    def find_join_path(self, tables):
+        """
+        Cheapest set of joins connecting the given tables, as a list of
+        (table1, table2, shared columns). Bridge tables are pulled in as
+        needed; tables that cannot be reached are left unconnected.
+        Results are memoized per metadata version.
+        """
+        terminals = [table for table in dict.fromkeys(tables) if table in self.join_graph]
+        cache_key = frozenset(terminals)
+        cached = self._join_path_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        edges = []
+        if terminals:
+            # Grow a tree from the first table, repeatedly attaching the
+            # nearest remaining table by its shortest path (Steiner approximation)
+            tree = {terminals[0]}
+            remaining = set(terminals[1:])
+            while remaining:
+                path = self._shortest_path_to(tree, remaining)
+                if path is None:
+                    break
+                for table1, table2 in zip(path, path[1:]):
+                    edges.append((table1, table2, self._common_columns_between(table1, table2)))
+                tree.update(path)
+                remaining -= tree
+
+        if len(self._join_path_cache) >= 1024:
+            self._join_path_cache.clear()
+        self._join_path_cache[cache_key] = edges
+        return edges
+
+    def _shortest_path_to(self, sources, targets):
+        """Dijkstra from a set of source tables to the nearest target table"""
+        distances = {table: 0.0 for table in sources}
+        parents = {}
+        heap = [(0.0, table) for table in sources]
+        heapq.heapify(heap)
+        while heap:
+            distance, table = heapq.heappop(heap)
+            if distance > distances.get(table, math.inf):
+                continue
+            if table in targets:
+                path = [table]
+                while path[-1] in parents:
+                    path.append(parents[path[-1]])
+                return path[::-1]
+            for neighbor, weight in self.join_graph.get(table, {}).items():
+                candidate = distance + weight
+                if candidate < distances.get(neighbor, math.inf):
+                    distances[neighbor] = candidate
+                    parents[neighbor] = table
+                    heapq.heappush(heap, (candidate, neighbor))
+        return None
+
+    def _common_columns_between(self, table1, table2):
+        return (self.common_columns.get((table1, table2))
+                or self.common_columns.get((table2, table1))
+                or [])
+
+    def _build_prompt_fragments(self):
+        """
+        Precompute the prompt text for every table, column and relationship.
+        Per-request prompt assembly only joins these cached fragments.
+        """
+        self.metadata_version += 1
+
+        # Reverse alias index: column -> aliases other than its own lowercase name
+        # (built once per shared alias table)
+        self._aliases_by_column = {}
+        by_alias_table = {}
+        for table, aliases in self.column_aliases.items():
+            by_column = by_alias_table.get(id(aliases))
+            if by_column is None:
+                by_column = {}
+                for alias, actual in aliases.items():
+                    if alias != actual.lower():
+                        by_column.setdefault(actual, []).append(alias)
+                by_alias_table[id(aliases)] = by_column
+            self._aliases_by_column[table] = by_column
+
+        self._column_lines = {}
+        self._table_blocks = {}
+        for table, columns in self.table_columns.items():
+            lines = [
+                (col.name, f"{col.name} ({col.type}) - Aliases: {self._get_column_aliases(table, col.name)}")
+                for col in columns
+            ]
+            self._column_lines[table] = lines
+            self._table_blocks[table] = f"{table} columns:\n  " + "\n  ".join(line for _, line in lines)
+
+        self._relationship_lines = [
+            (table1, table2, f"Tables {table1} and {table2} share columns: {', '.join(columns)}")
+            for (table1, table2), columns in self.common_columns.items()
+        ]
+        self._all_columns_info = None
+        self._all_relationships = None
+
+        date_column_names = set()
+        for date_cols in self.date_columns.values():
+            date_column_names.update(date_cols)
+        self.date_rewriter = DateConditionRewriter(date_column_names)
+
+    def get_table_relationships(self, tables=None):
+        """Get a formatted string of table relationships, optionally limited to some tables"""
+        if tables is None:
+            if self._all_relationships is None:
+                self._all_relationships = self._format_relationships(self._relationship_lines)
+            return self._all_relationships
+        selected = set(tables)
+        return self._format_relationships(
+            (table1, table2, line) for table1, table2, line in self._relationship_lines
+            if table1 in selected and table2 in selected
+        )
+
+    @staticmethod
+    def _format_relationships(relationship_lines):
+        relationships = [line for _, _, line in relationship_lines]
         return "\n".join(relationships) if relationships else "No relationships found between tables."
 
-    def get_all_columns_info(self):
-        """Get formatted information about all columns in all tables"""
+    def get_all_columns_info(self, tables=None, columns=None):
+        """
+        Get formatted information about all columns in all tables, optionally
+        limited to some tables and, per table, to some columns
+        """
+        if tables is None and columns is None:
+            if self._all_columns_info is None:
+                self._all_columns_info = self._format_columns_info(self.allowed_tables, None)
+            return self._all_columns_info
+        return self._format_columns_info(self.allowed_tables if tables is None else tables, columns)
+
+    def _format_columns_info(self, tables, columns):
         info = []
-        for table in ALLOWED_TABLES:
-            if table in self.table_columns:
-                cols = [f"{col['name']} ({col['type']}) - Aliases: {self._get_column_aliases(table, col['name'])}" 
-                       for col in self.table_columns[table]]
-                info.append(f"{table} columns:\n  " + "\n  ".join(cols))
+        for table in tables:
+            block = self._table_blocks.get(table)
+            if block is None:
+                continue
+            wanted = columns.get(table) if columns else None
+            if wanted is not None and len(wanted) < len(self._column_lines[table]):
+                wanted = set(wanted)
+                lines = [line for name, line in self._column_lines[table] if name in wanted]
+                block = f"{table} columns:\n  " + "\n  ".join(lines)
+            info.append(block)
         return "\n".join(info)
 
     def _get_column_aliases(self, table, column_name):
         """Get all aliases for a column"""
-        aliases = []
-        for alias, actual in self.column_aliases[table].items():
-            if actual == column_name and alias != column_name.lower():
-                aliases.append(alias)
+        aliases = self._aliases_by_column.get(table, {}).get(column_name)
         return ", ".join(aliases) if aliases else "no aliases"
 
     def get_table_info(self, table_name):
         """Get column information for a specific table"""
         if table_name in self.table_columns:
-            return ", ".join([f"{col['name']} ({col['type']})" for col in self.table_columns[table_name]])
+            return ", ".join([f"{col.name} ({col.type})" for col in self.table_columns[table_name]])
         return None
-llm = AzureChatOpenAI(
-    deployment_name="gpt-4",
-    model_name="gpt-4",
-    temperature=0,
-    openai_api_key=Config.OPENAI_API_KEY,
-    openai_api_version="2023-03-15-preview",
-    azure_endpoint=Config.OPENAI_API_KEY_ENDPOINT,
-)
 def format_date_for_dats(date_str):
     """Convert a date string to SAP DATS format (YYYYMMDD)"""
     try:
@@ -192,36 +674,92 @@ def get_relative_date(period):
         return today - timedelta(days=days)
     return today
 
+# Days per unit for relative date references, matching get_relative_date
+RELATIVE_DATE_UNIT_DAYS = {'day': 1, 'week': 7, 'month': 30, 'year': 365}
+
+# "last 7 days", "past 2 weeks", "last month", ... in one pattern
+RELATIVE_DATE_PATTERN = re.compile(
+    r"\b(?:last|past)\s+(?:(?P<count>\d+)\s+(?P<unit>day|week|month|year)s?|(?P<period>year|month|week))\b",
+    re.IGNORECASE
+)
+
+# Date comparisons on (optionally table-qualified or quoted) columns, plus
+# string literals and comments so text inside them is skipped rather than
+# rewritten (and a quote inside a comment does not open a literal)
+_IDENTIFIER = r'(?:"[^"]+"|[A-Za-z_][\w$#]*)'
+_DATE_FORMATS = r"\d{4}-\d{2}-\d{2}|\d{4}/\d{2}/\d{2}|\d{2}/\d{2}/\d{4}|\d{2}-\d{2}-\d{4}"
+DATE_CONDITION_PATTERN = re.compile(
+    rf"(?P<column>(?:{_IDENTIFIER}\s*\.\s*)?{_IDENTIFIER})\s*"
+    rf"(?:(?P<operator><>|!=|[<>]=?|=)\s*'(?P<date>{_DATE_FORMATS})'"
+    rf"|(?P<between>BETWEEN)\s*'(?P<low>{_DATE_FORMATS})'\s*AND\s*'(?P<high>{_DATE_FORMATS})')"
+    r"|(?P<skip>'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/)",
+    re.IGNORECASE | re.DOTALL
+)
+
+class DateConditionRewriter:
+    """
+    Precompiled, single-pass rewriter for date references.
+
+    Built once per schema metadata version from the set of DATS column
+    names. rewrite_question turns relative dates into concrete DATS dates;
+    rewrite_query converts date literals compared against DATS columns to
+    YYYYMMDD in one left-to-right pass, leaving everything else untouched.
+    """
+    def __init__(self, date_columns):
+        self.date_columns = frozenset(date_columns)
+
+    def rewrite_question(self, question, today=None):
+        """Replace relative date references with 'since YYYYMMDD'"""
+        today = today or datetime.now()
+
+        def replace(match):
+            if match.group('period'):
+                days = RELATIVE_DATE_UNIT_DAYS[match.group('period').lower()]
+            else:
+                days = RELATIVE_DATE_UNIT_DAYS[match.group('unit').lower()] * int(match.group('count'))
+            return f"since {format_date_for_dats(today - timedelta(days=days))}"
+
+        return RELATIVE_DATE_PATTERN.sub(replace, question)
+
+    def rewrite_query(self, query):
+        """Convert date literals compared against DATS columns to YYYYMMDD"""
+        return DATE_CONDITION_PATTERN.sub(self._replace_condition, query)
+
+    def rewrite_queries(self, queries):
+        """Batch variant of rewrite_query"""
+        replace = self._replace_condition
+        sub = DATE_CONDITION_PATTERN.sub
+        return [sub(replace, query) for query in queries]
+
+    def _replace_condition(self, match):
+        if match.group('skip') is not None:
+            return match.group(0)
+        column = match.group('column')
+        if self._column_name(column) not in self.date_columns:
+            return match.group(0)
+        try:
+            if match.group('between'):
+                low = format_date_for_dats(match.group('low'))
+                high = format_date_for_dats(match.group('high'))
+                return f"{column} BETWEEN '{low}' AND '{high}'"
+            return f"{column} {match.group('operator')} '{format_date_for_dats(match.group('date'))}'"
+        except ValueError:
+            return match.group(0)
+
+    @staticmethod
+    def _column_name(column):
+        name = column.split('.')[-1].strip()
+        # Quoted identifiers are case sensitive, unquoted ones are upper-cased by HANA
+        return name[1:-1] if name.startswith('"') else name.upper()
+
 def process_date_conditions(query, relationship_manager):
     """Process and format all date conditions in the query"""
-    # Get all date columns across all tables
-    all_date_columns = []
-    for table in ALLOWED_TABLES:
-        date_cols = relationship_manager.get_date_columns(table)
-        all_date_columns.extend(date_cols.keys())
-
-    # Regular expressions for finding date conditions
-    date_patterns = [
-        r"(\w+)\s*([><=]+)\s*'(\d{4}-\d{2}-\d{2})'",  # ISO format
-        r"(\w+)\s*([><=]+)\s*'(\d{2}/\d{2}/\d{4})'",  # DD/MM/YYYY
-        r"(\w+)\s*([><=]+)\s*'(\d{2}-\d{2}-\d{4})'",  # DD-MM-YYYY
-    ]
-
-    processed_query = query
-    for pattern in date_patterns:
-        matches = re.finditer(pattern, processed_query)
-        for match in matches:
-            column, operator, date_str = match.groups()
-            if column in all_date_columns:
-                try:
-                    dats_date = format_date_for_dats(date_str)
-                    old_condition = match.group(0)
-                    new_condition = f"{column} {operator} '{dats_date}'"
-                    processed_query = processed_query.replace(old_condition, new_condition)
-                except ValueError:
-                    continue
+    return relationship_manager.date_rewriter.rewrite_query(query)
+
+def process_date_conditions_batch(queries, relationship_manager):
+    """Process and format the date conditions of many queries at once"""
+    return relationship_manager.date_rewriter.rewrite_queries(queries)
 
-    return processed_query
 query_prompt_template = """
 You are an AI assistant designed to generate SAP HANA SQL queries based on user questions.
 Context:
@@ -277,91 +815,811 @@ Please provide a summary that:
 Summary:
 """
 
-query_prompt = PromptTemplate(
-    input_variables=["schema_name", "table_columns", "table_relationships", "question", "allowed_tables"],
-    template=query_prompt_template
-)
+repair_prompt_template = """
+You are an AI assistant fixing an SAP HANA SQL query that the database rejected.
+Context:
+- Database: SAP HANA
+- Schema: {schema_name}
+- Available Tables and Their Columns:
+{table_columns}
 
-summarization_prompt = PromptTemplate(
-    input_variables=["question", "query", "results"],
-    template=summarization_prompt_template
-)
+Table Relationships:
+{table_relationships}
+
+User Question: {question}
 
-query_chain = LLMChain(llm=llm, prompt=query_prompt)
-summary_chain = LLMChain(llm=llm, prompt=summarization_prompt)
+Query that failed:
+{query}
 
-def generate_hana_query(question, schema_name, relationship_manager):
-    """Generate a HANA SQL query based on the question and available table information"""
-    processed_question = question
+Error returned by SAP HANA:
+{error}
 
-    # Handle relative date references
-    date_patterns = [
-        (r'last (\d+) days', 'days'),
-        (r'past (\d+) days', 'days'),
-        (r'last year', 'year'),
-        (r'past year', 'year'),
-        (r'last month', 'month'),
-        (r'past month', 'month'),
-        (r'last week', 'week'),
-        (r'past week', 'week')
-    ]
-
-    for pattern, period in date_patterns:
-        if re.search(pattern, processed_question, re.IGNORECASE):
-            relative_date = get_relative_date(period)
-            processed_question = re.sub(
-                pattern,
-                f"since {format_date_for_dats(relative_date)}",
-                processed_question,
-                flags=re.IGNORECASE
+Guidelines:
+1. Fix the cause of the error with the smallest possible change to the query.
+2. Use EXACT column and table names as shown above.
+3. All date columns use DATS format (YYYYMMDD strings); compare them as strings.
+4. Do not use any DML statements (INSERT, UPDATE, DELETE, DROP, etc.).
+5. Only use tables from: {allowed_tables}
+6. Return only the corrected SQL query, without explanations.
+
+Corrected SAP HANA SQL query:
+"""
+
+class QueryPipeline:
+    """
+    The LLM client, prompts and chains used to generate and summarize queries.
+
+    Everything is built on first use, including the langchain imports, so
+    importing this module stays cheap. Pass llm / query_chain /
+    summary_chain / repair_chain to inject ready-made (or fake) objects, or a different
+    deployment and prompt templates to run several configurations side by
+    side in one process. Pipelines over different schemas should each get
+    their own result_cache, since cached results are keyed on the SQL only.
+    """
+    def __init__(self, deployment_name="gpt-4", model_name="gpt-4", temperature=0,
+                 api_version="2023-03-15-preview", query_template=None, summary_template=None,
+                 llm=None, query_chain=None, summary_chain=None, result_cache=None,
+                 repair_template=None, repair_chain=None):
+        self.deployment_name = deployment_name
+        self.model_name = model_name
+        self.temperature = temperature
+        self.api_version = api_version
+        self.query_template = query_template or query_prompt_template
+        self.summary_template = summary_template or summarization_prompt_template
+        self.repair_template = repair_template or repair_prompt_template
+        self._llm = llm
+        self._query_chain = query_chain
+        self._summary_chain = summary_chain
+        self._repair_chain = repair_chain
+        self._result_cache = result_cache
+        self._query_prompt = None
+        self._summarization_prompt = None
+        self._repair_prompt = None
+        self._lock = threading.RLock()
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    load_environment()
+                    from langchain_openai import AzureChatOpenAI
+                    self._llm = AzureChatOpenAI(
+                        deployment_name=self.deployment_name,
+                        model_name=self.model_name,
+                        temperature=self.temperature,
+                        openai_api_key=Config.OPENAI_API_KEY,
+                        openai_api_version=self.api_version,
+                        azure_endpoint=Config.OPENAI_API_KEY_ENDPOINT,
+                    )
+        return self._llm
+
+    @property
+    def query_prompt(self):
+        if self._query_prompt is None:
+            from langchain.prompts import PromptTemplate
+            self._query_prompt = PromptTemplate(
+                input_variables=["schema_name", "table_columns", "table_relationships", "question", "allowed_tables"],
+                template=self.query_template
             )
+        return self._query_prompt
+
+    @property
+    def summarization_prompt(self):
+        if self._summarization_prompt is None:
+            from langchain.prompts import PromptTemplate
+            self._summarization_prompt = PromptTemplate(
+                input_variables=["question", "query", "results"],
+                template=self.summary_template
+            )
+        return self._summarization_prompt
+
+    @property
+    def repair_prompt(self):
+        if self._repair_prompt is None:
+            from langchain.prompts import PromptTemplate
+            self._repair_prompt = PromptTemplate(
+                input_variables=["schema_name", "table_columns", "table_relationships", "question",
+                                 "allowed_tables", "query", "error"],
+                template=self.repair_template
+            )
+        return self._repair_prompt
+
+    @property
+    def query_chain(self):
+        if self._query_chain is None:
+            with self._lock:
+                if self._query_chain is None:
+                    from langchain.chains import LLMChain
+                    self._query_chain = LLMChain(llm=self.llm, prompt=self.query_prompt)
+        return self._query_chain
+
+    @property
+    def summary_chain(self):
+        if self._summary_chain is None:
+            with self._lock:
+                if self._summary_chain is None:
+                    from langchain.chains import LLMChain
+                    self._summary_chain = LLMChain(llm=self.llm, prompt=self.summarization_prompt)
+        return self._summary_chain
+
+    @property
+    def repair_chain(self):
+        if self._repair_chain is None:
+            with self._lock:
+                if self._repair_chain is None:
+                    from langchain.chains import LLMChain
+                    self._repair_chain = LLMChain(llm=self.llm, prompt=self.repair_prompt)
+        return self._repair_chain
+
+    @property
+    def result_cache(self):
+        """Result and summary cache of this pipeline; the module's query_result_cache unless one was given"""
+        return self._result_cache if self._result_cache is not None else query_result_cache
+
+    def cache_key_parts(self):
+        """Parts of the generated SQL cache fingerprint that depend on this pipeline"""
+        return (self.query_template, self.deployment_name)
+
+class ScopedPipeline:
+    """
+    Uses the LLM client, prompts and chains of a base pipeline (the default
+    pipeline when base is None) with its own result cache, so pipelines over
+    different schemas can share one LLM client without sharing cached results
+    """
+    def __init__(self, result_cache, base=None):
+        self.result_cache = result_cache
+        self.base = base
+
+    def __getattr__(self, name):
+        return getattr(get_pipeline(self.base), name)
+
+# Attributes the module used to create at import time, now served by the default pipeline
+_PIPELINE_ATTRIBUTES = ("llm", "query_chain", "summary_chain", "query_prompt", "summarization_prompt")
+_default_pipeline = None
+_default_pipeline_lock = threading.Lock()
+
+def get_pipeline(pipeline=None):
+    """Returns pipeline, or the process-wide default pipeline when None"""
+    global _default_pipeline
+    if pipeline is not None:
+        return pipeline
+    if _default_pipeline is None:
+        with _default_pipeline_lock:
+            if _default_pipeline is None:
+                load_environment()
+                _default_pipeline = QueryPipeline()
+    return _default_pipeline
+
+def set_pipeline(pipeline):
+    """Replace the default pipeline used when no pipeline is passed"""
+    global _default_pipeline
+    with _default_pipeline_lock:
+        _default_pipeline = pipeline
+
+def load_environment():
+    """Load .env into the environment, once, on first use of the settings or the LLM"""
+    global _environment_loaded
+    if _environment_loaded:
+        return
+    with _environment_lock:
+        if not _environment_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _environment_loaded = True
+
+def __getattr__(name):
+    # Module attributes resolved on first use, so importing stays cheap:
+    # llm / query_chain / ... always come from the current default pipeline
+    if name in _PIPELINE_ATTRIBUTES:
+        return getattr(get_pipeline(), name)
+    if name in _ENV_SETTINGS:
+        load_environment()
+        variable, default, convert = _ENV_SETTINGS[name]
+        value = os.getenv(variable)
+        return convert(value) if value else default
+    if name == "generated_query_cache":
+        return _create_generated_query_cache()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+_generated_query_cache_lock = threading.Lock()
+
+def _create_generated_query_cache():
+    """
+    generated_query_cache is built (opening its SQLite file when
+    SQL_CACHE_PATH is set) on first use; set it to None to always call the LLM
+    """
+    with _generated_query_cache_lock:
+        if "generated_query_cache" not in vars(_module):
+            _module.generated_query_cache = GeneratedQueryCache(persist_path=_module.SQL_CACHE_PATH)
+        return vars(_module)["generated_query_cache"]
+
+# Set to None to always hit HANA and re-summarize
+query_result_cache = QueryResultCache()
+# Set to None to always ask the LLM to repair failing SQL
+query_repair_cache = QueryRepairCache()
+
+def preprocess_question(question, relationship_manager):
+    """
+    Rewrite relative dates and business column names in the question
+    """
+    # Handle relative date references
+    processed_question = relationship_manager.date_rewriter.rewrite_question(question)
 
     # Handle column mappings
-    for common_name, actual_name in COLUMN_MAPPINGS.items():
+    for common_name, actual_name in relationship_manager.column_mappings.items():
         processed_question = processed_question.replace(common_name, actual_name)
+    return processed_question
 
-    # Generate initial query
-    result = query_chain.run({
+def build_query_inputs(question, schema_name, relationship_manager):
+    """
+    Rewrite relative dates and business column names in the question and
+    assemble the inputs for query_prompt
+    """
+    processed_question = preprocess_question(question, relationship_manager)
+
+    # Only describe the tables and columns relevant to this question
+    tables, columns = relationship_manager.select_relevant_schema(processed_question)
+    return {
+        "schema_name": schema_name,
+        "table_columns": relationship_manager.get_all_columns_info(tables, columns),
+        "table_relationships": relationship_manager.get_table_relationships(tables),
+        "question": processed_question,
+        "allowed_tables": ", ".join(tables)
+    }
+
+def build_shared_query_inputs(schema_name, relationship_manager):
+    """
+    The question-independent query_prompt inputs describing the full schema.
+    Built once, they give every question the same prompt prefix; add the
+    preprocessed "question" to complete them.
+    """
+    return {
         "schema_name": schema_name,
         "table_columns": relationship_manager.get_all_columns_info(),
         "table_relationships": relationship_manager.get_table_relationships(),
-        "question": processed_question,
-        "allowed_tables": ", ".join(ALLOWED_TABLES)
-    })
+        "allowed_tables": ", ".join(
+            table for table in relationship_manager.allowed_tables if table in relationship_manager.table_columns
+        )
+    }
 
+def lookup_generated_query(prompt_inputs, query_cache=None, pipeline=None):
+    """
+    Identical (or near-identical) questions against the same schema prompt
+    and pipeline configuration reuse the SQL generated earlier instead of
+    calling the LLM again.
+    Returns (cache, fingerprint, cached_query); cache is None when caching is off.
+    """
+    if query_cache is None:
+        query_cache = _module.generated_query_cache
+    if query_cache is None:
+        return None, None, None
+    fingerprint = _query_fingerprint(prompt_inputs, pipeline)
+    return query_cache, fingerprint, query_cache.get(prompt_inputs["question"], fingerprint)
+
+def _query_fingerprint(prompt_inputs, pipeline=None):
+    schema_parts = [value for key, value in prompt_inputs.items() if key != "question"]
+    return schema_fingerprint(*get_pipeline(pipeline).cache_key_parts(), *schema_parts)
+
+def finalize_generated_query(result, prompt_inputs, relationship_manager, query_cache, fingerprint):
+    """
+    Post-process raw LLM output into the final query and cache it
+    """
     # Post-process the query to ensure proper date formatting
-    final_query = process_date_conditions(result.strip(), relationship_manager)
-    
+    with metrics.stage("date_rewrite"):
+        final_query = process_date_conditions(result.strip(), relationship_manager)
+    with metrics.stage("sql_validation"):
+        final_query = validate_generated_query(final_query, relationship_manager)
+
+    if query_cache is not None:
+        query_cache.put(prompt_inputs["question"], fingerprint, final_query)
     return final_query
 
-def execute_hana_query(query, hana_db):
+def validate_generated_query(query, relationship_manager):
+    """
+    Check generated SQL locally before it reaches HANA: a single SELECT on
+    allowed tables, with a row limit injected when missing and, if
+    configured, an EXPLAIN PLAN cost check. Raises ValueError on rejection,
+    or a repairable QueryExecutionError when HANA rejected the EXPLAIN PLAN.
+    """
+    try:
+        safe_query, error = relationship_manager.sql_guard.validate(query)
+    except ExplainPlanError as e:
+        raise QueryExecutionError(e.query, e.error, message=f"Generated query rejected: {e}\nQuery: {query}")
+    if error:
+        raise ValueError(f"Generated query rejected: {error}\nQuery: {query}")
+    return safe_query
+
+def generate_hana_query(question, schema_name, relationship_manager, query_cache=None, pipeline=None):
+    """
+    Generate a HANA SQL query based on the question and available table information.
+    Uses query_cache (default: the module-level generated_query_cache) to skip the LLM call on repeats
+    and pipeline (default: get_pipeline()) for the LLM.
+    """
+    pipeline = get_pipeline(pipeline)
+    with metrics.stage("prompt_build"):
+        prompt_inputs = build_query_inputs(question, schema_name, relationship_manager)
+    query_cache, fingerprint, cached_query = lookup_generated_query(prompt_inputs, query_cache, pipeline)
+    if cached_query is not None:
+        metrics.count("sql_cache_hits")
+        with metrics.stage("sql_validation"):
+            return validate_generated_query(cached_query, relationship_manager)
+
+    # Generate initial query
+    with metrics.llm_stage("query_llm"):
+        result = pipeline.query_chain.run(prompt_inputs)
+    return finalize_generated_query(result, prompt_inputs, relationship_manager, query_cache, fingerprint)
+
+def generate_hana_query_for_repair(question, schema_name, relationship_manager, query_cache=None, pipeline=None):
+    """
+    generate_hana_query for callers that repair failed queries. Returns
+    (query, failure): failure is the QueryExecutionError raised when HANA
+    rejected the query's EXPLAIN PLAN, to be passed to execute_with_repair.
+    """
+    try:
+        return generate_hana_query(question, schema_name, relationship_manager, query_cache, pipeline), None
+    except QueryExecutionError as e:
+        return e.query, e
+
+class QueryExecutionError(ValueError):
+    """
+    A query failed in HANA (or a repaired query failed the local checks).
+    error is the database's error text; repairable is False for failures
+    such as an exhausted connection pool that a different query cannot fix.
+    """
+    def __init__(self, query, error, repairable=True, message=None):
+        super().__init__(message or f"Error executing query: {error}")
+        self.query = query
+        self.error = str(error)
+        self.repairable = repairable
+
+def execute_hana_query(query, hana_db, max_rows=DEFAULT_MAX_RESULT_ROWS, max_bytes=DEFAULT_MAX_RESULT_BYTES,
+                       result_cache=None):
+    """
+    Execute the generated query, streaming the results into a compact
+    QueryResult capped at max_rows rows / max_bytes bytes.
+    Results are served from result_cache (default: query_result_cache) when possible.
+    """
+    results = None
+    for results in iter_hana_query(query, hana_db, max_rows, max_bytes, result_cache):
+        pass
+    return results
+
+def iter_hana_query(query, hana_db, max_rows=DEFAULT_MAX_RESULT_ROWS, max_bytes=DEFAULT_MAX_RESULT_BYTES,
+                    result_cache=None, batch_size=DEFAULT_FETCH_BATCH_SIZE):
+    """
+    Incremental variant of execute_hana_query. Yields the accumulated
+    QueryResult after every fetched batch, so callers can show the first
+    rows while the rest is still streaming from HANA. Once exhausted, the
+    last QueryResult yielded holds the complete (capped) result.
+    """
+    if result_cache is None:
+        result_cache = query_result_cache
+    if result_cache is not None:
+        cached_results = result_cache.get(query)
+        if cached_results is not None:
+            metrics.count("result_cache_hits")
+            yield cached_results
+            return
+
+    results = None
+    statement, params = _bind_literals(query)
+    try:
+        batches = hana_db.stream_query(statement, batch_size, max_rows, max_bytes, params)
+        while True:
+            # Time to the first batch is execution, the rest is row fetching
+            with metrics.stage("hana_execute" if results is None else "fetch_rows"):
+                batch = next(batches, None)
+            if batch is None:
+                break
+            if results is None:
+                results = batch
+            else:
+                results.rows.extend(batch.rows)
+                results.truncated = batch.truncated
+            yield results
+    except Exception as e:
+        raise QueryExecutionError(query, e, repairable=not isinstance(e, (TimeoutError, ConnectionError, RuntimeError)))
+
+    if results is not None:
+        metrics.count("rows_fetched", len(results))
+        metrics.count("result_bytes", estimate_result_bytes(results))
+    _cache_query_result(query, results, result_cache)
+
+def execute_hana_query_columnar(query, hana_db, result_format="arrow", date_columns=(),
+                                max_rows=DEFAULT_MAX_RESULT_ROWS, max_bytes=DEFAULT_MAX_RESULT_BYTES):
     """
-    Execute the generated query
+    Execute the generated query into a ColumnarResult of typed column
+    arrays built straight from the fetched batches, with DATS columns
+    named in date_columns decoded to dates. Columnar results are not
+    kept in the query result cache.
     """
-    results, error = hana_db.execute_query(query)
+    statement, params = _bind_literals(query)
+    try:
+        with metrics.stage("hana_execute"):
+            results, error = hana_db.fetch_columnar(statement, result_format, date_columns,
+                                                    max_rows=max_rows, max_bytes=max_bytes, params=params)
+    except ValueError as e:
+        # A bad format cannot be fixed by rewriting the query. A missing
+        # numpy / pyarrow escapes as ImportError so callers can fall back.
+        raise QueryExecutionError(query, e, repairable=False, message=str(e))
     if error:
-        raise ValueError(f"Error executing query: {error}")
+        raise QueryExecutionError(query, error)
+    metrics.count("rows_fetched", len(results))
+    metrics.count("result_bytes", results.nbytes)
     return results
 
-def summarize_results(question, query, results):
+def fetch_results(query, hana_db, relationship_manager, result_format=None, result_cache=None):
     """
-    Generate a natural language summary of the query results
+    Results of the generated query in result_format (default RESULT_FORMAT)
+    """
+    result_format = result_format or RESULT_FORMAT
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(f"Unknown result format: {result_format}")
+    if result_format in COLUMNAR_FORMATS:
+        return execute_hana_query_columnar(query, hana_db, result_format,
+                                           relationship_manager.date_rewriter.date_columns)
+    return execute_hana_query(query, hana_db, result_cache=result_cache)
+
+def _bind_literals(query):
+    """Returns (statement, params) to execute; params is None for plain execution"""
+    if not BIND_QUERY_LITERALS:
+        return query, None
+    return parameterize_literals(query)
+
+def _cache_query_result(query, results, result_cache):
+    if result_cache is None or results is None:
+        return
+    if results.affected_rows is not None:
+        # A write makes every cached read of the touched tables stale
+        for table in referenced_tables(query):
+            result_cache.invalidate_table(table)
+    else:
+        result_cache.put(query, results)
+
+def execute_with_repair(question, schema_name, query, execute, relationship_manager, hana_db, pipeline=None,
+                        attempts=None, budget_seconds=None, prompt_inputs=None, call_llm=None, failure=None):
+    """
+    Runs execute(query), repairing the query if HANA rejects it (see
+    repair_failed_query). execute raises QueryExecutionError on failure.
+    Pass failure when HANA already rejected the query while it was
+    generated (see generate_hana_query_for_repair) to go straight to the
+    repair. Returns (query, value) with the query that finally ran and
+    what execute returned for it.
+    """
+    started = time.monotonic()
+    if failure is None:
+        try:
+            return query, execute(query)
+        except QueryExecutionError as e:
+            failure = e
+    return repair_failed_query(question, schema_name, failure, execute, relationship_manager, hana_db,
+                               pipeline, attempts, budget_seconds, prompt_inputs, started, call_llm)
+
+def repair_failed_query(question, schema_name, failure, execute, relationship_manager, hana_db, pipeline=None,
+                        attempts=None, budget_seconds=None, prompt_inputs=None, started=None, call_llm=None):
+    """
+    Self-healing for SQL that HANA rejected (failure, a QueryExecutionError).
+
+    A fix that worked for the same failure before (query_repair_cache) is
+    tried first, once it passed the same checks as a new fix. Otherwise the failing SQL and HANA's error go back to the
+    LLM for a targeted fix, at most attempts times (default
+    QUERY_REPAIR_ATTEMPTS) and within budget_seconds (default
+    QUERY_REPAIR_BUDGET_SECONDS) of started. Each candidate passes the SQL
+    guard and, with QUERY_REPAIR_PREPARE_CHECK, a HANA prepare before
+    execute(candidate) runs it; a candidate that fails feeds its own error
+    into the next attempt. A working fix is cached for the failure and for
+    the question. call_llm(func, *args), when given, makes the repair LLM
+    call (e.g. Batch_Runner's rate limit backoff). Returns (query, value);
+    raises the last failure when nothing worked.
     """
-    summary = summary_chain.run({
+    attempts = QUERY_REPAIR_ATTEMPTS if attempts is None else attempts
+    budget_seconds = QUERY_REPAIR_BUDGET_SECONDS if budget_seconds is None else budget_seconds
+    if not attempts or not failure.repairable:
+        raise failure
+    deadline = (started or time.monotonic()) + budget_seconds if budget_seconds else None
+    pipeline = get_pipeline(pipeline)
+    original_query, original_error = failure.query, failure.error
+
+    repair_cache = query_repair_cache
+    if repair_cache is not None:
+        fixed_query = repair_cache.get(schema_name, original_query, original_error)
+        if fixed_query is not None:
+            # The fix may come from a caller with other allowed tables, so it is checked like a new one
+            with metrics.stage("repair_check"):
+                fixed_query, error = check_repaired_query(fixed_query, relationship_manager, hana_db)
+            if error is None:
+                metrics.count("repair_cache_hits")
+                try:
+                    return fixed_query, execute(fixed_query)
+                except QueryExecutionError as e:
+                    repair_cache.invalidate(schema_name, original_query, original_error)
+                    if not e.repairable:
+                        raise
+
+    if prompt_inputs is None:
+        with metrics.stage("prompt_build"):
+            prompt_inputs = build_query_inputs(question, schema_name, relationship_manager)
+    for _ in range(attempts):
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            break
+        metrics.count("repair_attempts")
+        try:
+            with metrics.llm_stage("repair_llm"):
+                result = _run_repair_chain(pipeline, dict(prompt_inputs, query=failure.query, error=failure.error),
+                                           remaining, call_llm)
+        except Exception as e:
+            # The user is better served by HANA's error than by the repair LLM's
+            print(f"Error repairing query: {e}")
+            break
+        if result is None:
+            break
+        with metrics.stage("repair_check"):
+            candidate, error = check_repaired_query(result, relationship_manager, hana_db)
+        if error:
+            failure = QueryExecutionError(candidate, error, message=f"Repaired query rejected: {error}")
+            continue
+        try:
+            value = execute(candidate)
+        except QueryExecutionError as e:
+            if not e.repairable:
+                raise
+            failure = e
+            continue
+
+        metrics.count("queries_repaired")
+        print(f"Repaired query after HANA error: {original_error}")
+        if repair_cache is not None:
+            repair_cache.put(schema_name, original_query, original_error, candidate)
+        query_cache = _module.generated_query_cache
+        if query_cache is not None:
+            query_cache.put(prompt_inputs["question"], _query_fingerprint(prompt_inputs, pipeline), candidate)
+        return candidate, value
+    raise failure
+
+def check_repaired_query(result, relationship_manager, hana_db=None):
+    """
+    Local checks of a repair candidate, cheapest first: date rewriting and
+    the SQL guard, then (with QUERY_REPAIR_PREPARE_CHECK) compiling it on
+    HANA without running it. Returns (query, error).
+    """
+    query = process_date_conditions(result.strip(), relationship_manager)
+    try:
+        safe_query, error = relationship_manager.sql_guard.validate(query)
+    except ExplainPlanError as e:
+        return e.query, e.error
+    if error:
+        return query, error
+    if QUERY_REPAIR_PREPARE_CHECK and hana_db is not None:
+        statement, _ = _bind_literals(safe_query)
+        _, error = hana_db.prepare_query(statement)
+        if error:
+            return safe_query, error
+    return safe_query, None
+
+def _run_repair_chain(pipeline, inputs, timeout, call_llm=None):
+    """The repair LLM's answer, or None when it takes longer than timeout seconds"""
+    if call_llm is None:
+        call_llm = _call
+    if timeout is None:
+        return call_llm(pipeline.repair_chain.run, inputs)
+    # The copied context keeps the call in this request's trace
+    context = contextvars.copy_context()
+    future = _get_repair_executor().submit(context.run, call_llm, pipeline.repair_chain.run, inputs)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        metrics.count("repair_timeouts")
+        return None
+
+def _call(func, *args):
+    return func(*args)
+
+def _get_repair_executor():
+    global _repair_executor
+    with _repair_executor_lock:
+        if _repair_executor is None:
+            _repair_executor = ThreadPoolExecutor(max_workers=QUERY_REPAIR_WORKERS, thread_name_prefix="query-repair")
+        return _repair_executor
+
+_repair_executor = None
+_repair_executor_lock = threading.Lock()
+
+def build_summary_inputs(question, query, results):
+    """
+    Assemble the inputs for summarization_prompt
+    """
+    return {
         "question": question,
         "query": query,
-        "results": str(results)
-    })
+        "results": compact_results(results, token_budget=SUMMARY_TOKEN_BUDGET)
+    }
+
+def summarize_results(question, query, results, pipeline=None):
+    """
+    Generate a natural language summary of the query results
+    """
+    with metrics.stage("summary_prompt"):
+        summary_inputs = build_summary_inputs(question, query, results)
+    with metrics.llm_stage("summary_llm"):
+        summary = get_pipeline(pipeline).summary_chain.run(summary_inputs)
     return summary.strip()
 
-def process_query_with_summary(question, schema_name, hana_db, relationship_manager):
+def summarize_results_stream(question, query, results, pipeline=None):
+    """
+    Generate the summary of the query results, yielding text chunks as the LLM produces them
+    """
+    pipeline = get_pipeline(pipeline)
+    with metrics.stage("summary_prompt"):
+        prompt_text = pipeline.summarization_prompt.format(**build_summary_inputs(question, query, results))
+    with metrics.llm_stage("summary_llm"):
+        for chunk in pipeline.llm.stream(prompt_text):
+            if chunk.content:
+                yield chunk.content
+
+def get_cached_summary(question, query, result_cache=None):
+    """
+    A full cache hit skips both HANA and the summarization LLM call
+    """
+    if result_cache is None:
+        result_cache = query_result_cache
+    if result_cache is None:
+        return None
+    summary = result_cache.get_summary(query, question)
+    if summary is not None:
+        metrics.count("summary_cache_hits")
+    return summary
+
+def cache_summary(question, query, summary, result_cache=None):
+    if result_cache is None:
+        result_cache = query_result_cache
+    if result_cache is not None:
+        result_cache.put_summary(query, question, summary)
+
+def _get_prefetch_executor():
+    global _prefetch_executor
+    with _prefetch_executor_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(
+                max_workers=PIPELINE_FETCH_WORKERS, thread_name_prefix="hana-prefetch"
+            )
+        return _prefetch_executor
+
+_prefetch_executor = None
+_prefetch_executor_lock = threading.Lock()
+
+def start_pipelined_fetch(query, hana_db, preview_rows=PIPELINE_PREVIEW_ROWS, result_cache=None):
     """
-    Complete process to generate query, execute it, and summarize results
+    Start fetching a query on a background thread.
+
+    Returns (basis, future). basis() blocks until preview_rows rows have been
+    fetched (or the fetch finished) and returns a dict with a preview
+    QueryResult, a snapshot of running column statistics, the number of
+    rows fetched so far and whether the fetch is complete. future resolves
+    to the full QueryResult.
     """
+    ready = threading.Event()
+    state = {}
+
+    def capture(results, statistics, complete):
+        if ready.is_set():
+            return
+        state.update(
+            preview=results if complete else results[:preview_rows],
+            statistics=statistics.snapshot(),
+            rows_fetched=len(results),
+            complete=complete,
+        )
+        ready.set()
+
+    def fetch():
+        results = None
+        statistics = None
+        try:
+            for results in iter_hana_query(query, hana_db, result_cache=result_cache):
+                if statistics is None:
+                    statistics = RunningStatistics(results.columns)
+                statistics.update(results.rows[statistics.row_count:])
+                if len(results) >= preview_rows:
+                    capture(results, statistics, complete=False)
+            capture(results, statistics, complete=True)
+            return results
+        except Exception as e:
+            state['error'] = e
+            ready.set()
+            raise
+
+    # The copied context keeps the fetch in this request's trace
+    context = contextvars.copy_context()
+    future = _get_prefetch_executor().submit(context.run, fetch)
+
+    def basis():
+        ready.wait()
+        if 'error' in state:
+            raise state['error']
+        return state
+
+    return basis, future
+
+def summarize_partial_results(question, query, basis, pipeline=None):
+    """
+    Summarize from a preview of the rows plus running aggregates of
+    everything fetched so far
+    """
+    if basis['complete']:
+        return summarize_results(question, query, basis['preview'], pipeline)
+    with metrics.stage("summary_prompt"):
+        results_text = compact_results(
+            basis['preview'],
+            token_budget=SUMMARY_TOKEN_BUDGET,
+            statistics=basis['statistics'],
+            total_note=f"Rows fetched so far: {basis['rows_fetched']} (more rows are still being fetched; "
+                       f"statistics cover the rows fetched so far)"
+        )
+    with metrics.llm_stage("summary_llm"):
+        summary = get_pipeline(pipeline).summary_chain.run(
+            {"question": question, "query": query, "results": results_text}
+        )
+    return summary.strip()
+
+def process_query_with_summary(question, schema_name, hana_db, relationship_manager, summary_mode=None,
+                               pipeline=None, result_format=None, repair_attempts=None, repair_budget=None):
+    """
+    Complete process to generate query, execute it, and summarize results.
+
+    With summary_mode="pipelined" the summary is generated from the first
+    rows and running aggregates while the rest of the result is fetched in
+    the background: "raw_results" is then a Future resolving to the full
+    QueryResult and "summary_basis" says how many rows the summary saw.
+
+    result_format "arrow" or "numpy" (default RESULT_FORMAT) returns
+    raw_results as a ColumnarResult ready for to_pandas / write_parquet;
+    it is only supported in "exact" mode.
+
+    SQL that HANA rejects is repaired by the LLM, up to repair_attempts
+    times within repair_budget seconds (defaults QUERY_REPAIR_ATTEMPTS /
+    QUERY_REPAIR_BUDGET_SECONDS); "query" is then the repaired SQL.
+
+    "metrics" holds the per-stage timings and counters of the request
+    (see Pipeline_Metrics); in pipelined mode they end with the summary.
+    """
+    with metrics.trace() as pipeline_trace:
+        result = _process_query_with_summary(question, schema_name, hana_db, relationship_manager, summary_mode,
+                                             pipeline, result_format, repair_attempts, repair_budget)
+    result["metrics"] = pipeline_trace.as_dict()
+    return result
+
+def _process_query_with_summary(question, schema_name, hana_db, relationship_manager, summary_mode, pipeline,
+                                result_format=None, repair_attempts=None, repair_budget=None):
+    summary_mode = summary_mode or SUMMARY_MODE
+    result_format = result_format or RESULT_FORMAT
     try:
-        generated_query = generate_hana_query(question, schema_name, relationship_manager)
-        results = execute_hana_query(generated_query, hana_db)
-        summary = summarize_results(question, generated_query, results)
+        if result_format not in RESULT_FORMATS:
+            raise ValueError(f"Unknown result format: {result_format}")
+        if summary_mode == "pipelined" and result_format != "rows":
+            raise ValueError("Pipelined summaries only support the rows result format")
+        generated_query, failure = generate_hana_query_for_repair(question, schema_name, relationship_manager,
+                                                                  pipeline=pipeline)
+        if summary_mode == "pipelined":
+            # The summary starts once the first rows arrived, so a rejected query is repaired before it
+            _, result = execute_with_repair(
+                question, schema_name, generated_query,
+                lambda query: _process_pipelined(question, query, hana_db, pipeline),
+                relationship_manager, hana_db, pipeline, repair_attempts, repair_budget, failure=failure
+            )
+            return result
+        result_cache = get_pipeline(pipeline).result_cache
+        generated_query, results = execute_with_repair(
+            question, schema_name, generated_query,
+            lambda query: fetch_results(query, hana_db, relationship_manager, result_format, result_cache),
+            relationship_manager, hana_db, pipeline, repair_attempts, repair_budget, failure=failure
+        )
+
+        summary = get_cached_summary(question, generated_query, result_cache)
+        if summary is None:
+            summary = summarize_results(question, generated_query, results, pipeline)
+            cache_summary(question, generated_query, summary, result_cache)
         
         return {
             "query": generated_query,
@@ -373,12 +1631,101 @@ def process_query_with_summary(question, schema_name, hana_db, relationship_mana
             "error": str(e)
         }
 
+def _process_pipelined(question, generated_query, hana_db, pipeline=None):
+    result_cache = get_pipeline(pipeline).result_cache
+    basis, future = start_pipelined_fetch(generated_query, hana_db, result_cache=result_cache)
+    # The background fetch records hana_execute itself; this is only the wait for its first rows
+    with metrics.stage("prefetch_wait"):
+        state = basis()
+
+    summary = None
+    if state['complete']:
+        summary = get_cached_summary(question, generated_query, result_cache)
+    if summary is None:
+        summary = summarize_partial_results(question, generated_query, state, pipeline)
+        # Only summaries of the complete result may be served to exact-mode callers
+        if state['complete']:
+            cache_summary(question, generated_query, summary, result_cache)
+
+    return {
+        "query": generated_query,
+        "raw_results": future,
+        "summary": summary,
+        "summary_basis": {
+            "rows": state['rows_fetched'],
+            "complete": state['complete']
+        }
+    }
+
+def process_query_with_summary_stream(question, schema_name, hana_db, relationship_manager,
+                                     preview_rows=STREAM_PREVIEW_ROWS, pipeline=None, repair_attempts=None,
+                                     repair_budget=None):
+    """
+    Streaming variant of process_query_with_summary. Yields (event, payload) pairs:
+      ("query", sql)       as soon as the query is generated, and again with the
+                           repaired SQL if HANA rejected it
+      ("rows", results)    with the first preview_rows rows, once the first batch is fetched
+      ("summary", text)    for every chunk of the summary as it arrives from the LLM
+      ("result", result)   last, the same dict process_query_with_summary returns
+    """
+    with metrics.trace() as pipeline_trace:
+        try:
+            generated_query, failure = generate_hana_query_for_repair(question, schema_name, relationship_manager,
+                                                                      pipeline=pipeline)
+            yield "query", generated_query
+
+            result_cache = get_pipeline(pipeline).result_cache
+            results = None
+            started = time.monotonic()
+            try:
+                if failure is not None:
+                    raise failure
+                for results in iter_hana_query(generated_query, hana_db, result_cache=result_cache):
+                    if preview_rows is not None:
+                        yield "rows", results[:preview_rows]
+                        preview_rows = None
+            except QueryExecutionError as failure:
+                if results is not None:
+                    # Rows were already shown, so the query cannot be swapped
+                    raise
+                generated_query, results = repair_failed_query(
+                    question, schema_name, failure,
+                    lambda query: execute_hana_query(query, hana_db, result_cache=result_cache),
+                    relationship_manager, hana_db, pipeline, repair_attempts, repair_budget, started=started
+                )
+                yield "query", generated_query
+                if preview_rows is not None:
+                    yield "rows", results[:preview_rows]
+
+            summary = get_cached_summary(question, generated_query, result_cache)
+            if summary is not None:
+                yield "summary", summary
+            else:
+                chunks = []
+                for chunk in summarize_results_stream(question, generated_query, results, pipeline):
+                    chunks.append(chunk)
+                    yield "summary", chunk
+                summary = "".join(chunks).strip()
+                cache_summary(question, generated_query, summary, result_cache)
+
+            result = {
+                "query": generated_query,
+                "raw_results": results,
+                "summary": summary
+            }
+        except Exception as e:
+            result = {
+                "error": str(e)
+            }
+    result["metrics"] = pipeline_trace.as_dict()
+    yield "result", result
+
 def print_system_info(schema_name, relationship_manager):
     """Print system information with verification"""
     print(f"\nUsing schema: {schema_name}")
     
     # Verify and print available tables
-    actual_tables = sorted(list(set(ALLOWED_TABLES)))  # Remove any duplicates
+    actual_tables = sorted(list(set(relationship_manager.allowed_tables)))  # Remove any duplicates
     print(f"Available tables ({len(actual_tables)}):", ", ".join(actual_tables))
     
     # Print table columns for verification
@@ -400,17 +1747,52 @@ def print_result(result):
     print("\nGenerated SAP HANA SQL Query:")
     print(result["query"])
     
+    raw_results = result["raw_results"]
+    if hasattr(raw_results, 'result'):
+        # Pipelined mode: wait for the background fetch to finish
+        raw_results = raw_results.result()
     print("\nRaw Query Results:")
-    print(result["raw_results"])
+    print(raw_results)
     
     print("\nSummary:")
     print(result["summary"])
     print("\n" + "="*80 + "\n")
 
+def print_result_stream(events):
+    """
+    Render the events of process_query_with_summary_stream as they arrive.
+    Returns the final result dict.
+    """
+    result = {}
+    summary_started = False
+    query_shown = False
+    for event, payload in events:
+        if event == "query":
+            print("\nRepaired SAP HANA SQL Query:" if query_shown else "\nGenerated SAP HANA SQL Query:")
+            print(payload, flush=True)
+            query_shown = True
+        elif event == "rows":
+            print("\nFirst Query Results:")
+            print(payload, flush=True)
+        elif event == "summary":
+            if not summary_started:
+                print("\nSummary:")
+                summary_started = True
+            print(payload, end="", flush=True)
+        elif event == "result":
+            result = payload
+    if "error" in result:
+        print("\nError:", result["error"])
+        return result
+    if result["raw_results"] is not None and len(result["raw_results"]) > STREAM_PREVIEW_ROWS:
+        print(f"\n\n({len(result['raw_results'])} rows in total)", end="")
+    print("\n\n" + "="*80 + "\n")
+    return result
+
 def main():
     
-    # Initialize database connection and relationship manager
-    hana_db = HanaDbConnector()
+    # Initialize database connection pool and relationship manager
+    hana_db = HanaDbConnector(pool_size=DEFAULT_POOL_SIZE)
     schema_name = "your schema"
     success, error = hana_db.select_schema(schema_name)
     
@@ -418,7 +1800,7 @@ def main():
         print(f"Error selecting schema: {error}")
         return
         
-    relationship_manager = TableRelationshipManager(hana_db)
+    relationship_manager = TableRelationshipManager(hana_db, cache_path=_module.SCHEMA_CACHE_PATH)
     print_system_info(schema_name, relationship_manager)
     
     while True:
@@ -429,11 +1811,12 @@ def main():
             break
             
         try:
-            result = process_query_with_summary(question, schema_name, hana_db, relationship_manager)
-            print_result(result)
+            print_result_stream(
+                process_query_with_summary_stream(question, schema_name, hana_db, relationship_manager)
+            )
             
             view_details = input("\nWould you like to see detailed information about any table? (table name/n): ").strip()
-            if view_details.upper() in ALLOWED_TABLES:
+            if view_details.upper() in relationship_manager.allowed_tables:
                 table_info = relationship_manager.get_table_info(view_details.upper())
                 print(f"\nDetailed columns for {view_details.upper()}:")
                 print(table_info)
@@ -0,0 +1,232 @@
+from collections import Counter
+from decimal import Decimal
+
+DEFAULT_TOKEN_BUDGET = 3000
+# Rough size of an LLM token in characters, good enough for budgeting prompts
+CHARS_PER_TOKEN = 4
+DEFAULT_TOP_K = 5
+# Longest value rendered in the column statistics
+MAX_VALUE_CHARS = 40
+# Leading rows always preferred when sampling, since results are often ordered
+HEAD_ROWS = 20
+# Share of the budget the column statistics may use before rows are added
+STATS_BUDGET_SHARE = 0.4
+
+
+def estimate_tokens(text):
+    """Cheap token estimate for budgeting, without a tokenizer dependency"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _columns_and_rows(results):
+    """Accepts a QueryResult, a list of row dicts or a list of tuples"""
+    if hasattr(results, 'columns') and hasattr(results, 'rows'):
+        return list(results.columns), results.rows, getattr(results, 'truncated', False)
+    if isinstance(results, list) and results and isinstance(results[0], dict):
+        columns = list(results[0].keys())
+        return columns, [tuple(row.get(column) for column in columns) for row in results], False
+    if isinstance(results, list):
+        width = len(results[0]) if results else 0
+        return [f"col{i + 1}" for i in range(width)], results, False
+    return None, None, False
+
+
+def _format_value(value):
+    text = '' if value is None else str(value)
+    if len(text) > MAX_VALUE_CHARS:
+        text = text[:MAX_VALUE_CHARS - 3] + '...'
+    return text
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+
+def column_statistics(columns, rows, top_k=DEFAULT_TOP_K):
+    """
+    Per-column aggregates computed column-wise over the transposed rows:
+    count, nulls, distinct values, min/max, the top_k most frequent values
+    and, for numeric columns, sum and mean.
+    """
+    statistics = []
+    if not rows:
+        return statistics
+    for column, values in zip(columns, zip(*rows)):
+        present = [value for value in values if value is not None]
+        stats = {'column': column, 'count': len(present), 'nulls': len(values) - len(present)}
+        if present:
+            try:
+                counts = Counter(present)
+                stats['distinct'] = len(counts)
+                stats['top'] = counts.most_common(top_k)
+            except TypeError:
+                # Unhashable values (LOBs, arrays) only get counts
+                pass
+            try:
+                stats['min'] = min(present)
+                stats['max'] = max(present)
+            except TypeError:
+                pass
+            if all(_is_number(value) for value in present):
+                total = sum(present)
+                stats['sum'] = total
+                stats['mean'] = total / len(present)
+        statistics.append(stats)
+    return statistics
+
+
+class RunningStatistics:
+    """
+    Per-column count, nulls, min/max and numeric sum/mean maintained
+    incrementally as batches of rows arrive, so aggregates over a result
+    that is still being fetched are available at any time
+    """
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.row_count = 0
+        self._stats = [
+            {'count': 0, 'nulls': 0, 'min': None, 'max': None, 'sum': 0, 'comparable': True, 'numeric': True}
+            for _ in self.columns
+        ]
+
+    def update(self, rows):
+        if not rows:
+            return
+        self.row_count += len(rows)
+        for stats, values in zip(self._stats, zip(*rows)):
+            present = [value for value in values if value is not None]
+            stats['nulls'] += len(values) - len(present)
+            if not present:
+                continue
+            stats['count'] += len(present)
+            if stats['comparable']:
+                try:
+                    low, high = min(present), max(present)
+                    stats['min'] = low if stats['min'] is None else min(stats['min'], low)
+                    stats['max'] = high if stats['max'] is None else max(stats['max'], high)
+                except TypeError:
+                    stats['comparable'] = False
+            if stats['numeric']:
+                if all(_is_number(value) for value in present):
+                    stats['sum'] += sum(present)
+                else:
+                    stats['numeric'] = False
+
+    def snapshot(self):
+        """Current aggregates in the column_statistics format"""
+        snapshot = []
+        for column, stats in zip(self.columns, self._stats):
+            entry = {'column': column, 'count': stats['count'], 'nulls': stats['nulls']}
+            if stats['count'] and stats['comparable']:
+                entry['min'] = stats['min']
+                entry['max'] = stats['max']
+            if stats['count'] and stats['numeric']:
+                entry['sum'] = stats['sum']
+                entry['mean'] = stats['sum'] / stats['count']
+            snapshot.append(entry)
+        return snapshot
+
+
+def _format_statistics(stats):
+    parts = [f"count={stats['count']}", f"nulls={stats['nulls']}"]
+    if 'distinct' in stats:
+        parts.append(f"distinct={stats['distinct']}")
+    if 'min' in stats:
+        parts.append(f"min={_format_value(stats['min'])}")
+        parts.append(f"max={_format_value(stats['max'])}")
+    if 'mean' in stats:
+        parts.append(f"sum={_format_value(stats['sum'])}")
+        parts.append(f"mean={stats['mean']:.4g}")
+    # Only worth listing when values actually repeat
+    if stats.get('top') and stats.get('distinct', 0) < stats['count']:
+        top = ", ".join(f"{_format_value(value)} ({count})" for value, count in stats['top'])
+        parts.append(f"top=[{top}]")
+    return f"{stats['column']}: " + ", ".join(parts)
+
+
+def _row_order(row_count, head):
+    """Yields the first `head` rows, then the rest in an order where any prefix is evenly spread"""
+    head = min(head, row_count)
+    yield from range(head)
+    rest = range(head, row_count)
+    seen = set()
+    stride = len(rest)
+    # Halving strides: every pass fills in the midpoints of the previous one
+    while stride >= 1 and len(seen) < len(rest):
+        for offset in range(0, len(rest), stride):
+            if offset not in seen:
+                seen.add(offset)
+                yield rest[offset]
+        stride //= 2
+
+
+def _format_row(row, delimiter):
+    return delimiter.join(_format_value(value) for value in row)
+
+
+def compact_results(results, token_budget=DEFAULT_TOKEN_BUDGET, delimiter='|', top_k=DEFAULT_TOP_K,
+                    statistics=None, total_note=None):
+    """
+    Render query results for the summarization prompt within token_budget.
+
+    Columns are listed once as a header and rows as delimited lines. For
+    results that do not fit, column statistics are included and rows are
+    sampled (leading rows first, then evenly spread) until the budget is
+    used up, with a note saying how many rows are shown.
+
+    Passing precomputed statistics (e.g. a RunningStatistics snapshot) and
+    a total_note renders a partial result: the statistics are always
+    included and describe more rows than the ones passed in.
+    """
+    columns, rows, truncated = _columns_and_rows(results)
+    if columns is None:
+        return str(results)
+    header = f"Columns: {delimiter.join(columns)}"
+    if not rows:
+        return f"{header}\nNo rows returned."
+
+    if total_note is None:
+        total_note = f"Total rows: {len(rows)}" + (" (result truncated at fetch limit)" if truncated else "")
+    sections = [header, total_note]
+    budget = token_budget - estimate_tokens("\n".join(sections))
+
+    # Small results go in whole; stop formatting as soon as they cannot fit
+    if not truncated and statistics is None:
+        lines = []
+        remaining = budget
+        for row in rows:
+            line = _format_row(row, delimiter)
+            remaining -= estimate_tokens(line)
+            if remaining < 0:
+                break
+            lines.append(line)
+        if len(lines) == len(rows):
+            return "\n".join(sections + lines)
+
+    stats_lines = ["Column statistics:"]
+    stats_budget = int(token_budget * STATS_BUDGET_SHARE)
+    if statistics is None:
+        statistics = column_statistics(columns, rows, top_k)
+    for stats in statistics:
+        line = _format_statistics(stats)
+        cost = estimate_tokens(line)
+        if cost > stats_budget:
+            break
+        stats_lines.append(line)
+        stats_budget -= cost
+        budget -= cost
+    if len(stats_lines) > 1:
+        sections.extend(stats_lines)
+
+    shown = {}
+    budget -= estimate_tokens(f"Rows (showing {len(rows)} of {len(rows)}):")
+    for index in _row_order(len(rows), HEAD_ROWS):
+        line = _format_row(rows[index], delimiter)
+        cost = estimate_tokens(line)
+        if cost > budget:
+            break
+        shown[index] = line
+        budget -= cost
+    sections.append(f"Rows (showing {len(shown)} of {len(rows)}):")
+    sections.extend(shown[index] for index in sorted(shown))
+    return "\n".join(sections)
@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+CACHE_FORMAT_VERSION = 4
+# Force a full re-fetch of a table after this many seconds even when its
+# catalog markers are unchanged (catches in-place column renames)
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 3600
+
+
+class SchemaMetadataCache:
+    """
+    Persists introspected table metadata to a local JSON file, keyed by schema.
+
+    Every table entry stores the catalog change marker it was fetched
+    with, so a warm start only has to compare markers and re-fetch the
+    tables whose marker changed.
+    """
+    def __init__(self, path, max_age_seconds=DEFAULT_MAX_AGE_SECONDS):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+
+    def load(self, schema_name):
+        """
+        Returns the cached metadata for a schema, or an empty entry when the
+        file is missing, unreadable or written by another format version
+        """
+        empty = {'tables': {}, 'common_columns': None, 'table_set': None}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return empty
+        if data.get('version') != CACHE_FORMAT_VERSION:
+            return empty
+        entry = data.get('schemas', {}).get(schema_name)
+        if not entry:
+            return empty
+        return {
+            'tables': entry.get('tables', {}),
+            'common_columns': entry.get('common_columns'),
+            'table_set': entry.get('table_set'),
+        }
+
+    def fresh_tables(self, cached, markers):
+        """
+        Returns the cached tables whose marker still matches the catalog
+        and which are younger than max_age_seconds
+        """
+        now = time.time()
+        fresh = {}
+        for table, entry in cached['tables'].items():
+            if table not in markers or entry.get('marker') != markers[table]:
+                continue
+            if self.max_age_seconds and now - entry.get('fetched_at', 0) > self.max_age_seconds:
+                continue
+            fresh[table] = entry
+        return fresh
+
+    def save(self, schema_name, tables, common_columns, table_set):
+        """
+        Writes the metadata for one schema, leaving other schemas untouched.
+        common_columns is a list of [table1, table2, columns, join weight]
+        entries. The
+        file is replaced atomically so readers never see a partial write.
+        """
+        with self._lock:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') != CACHE_FORMAT_VERSION:
+                    data = {}
+            except (OSError, ValueError):
+                data = {}
+            data['version'] = CACHE_FORMAT_VERSION
+            data.setdefault('schemas', {})[schema_name] = {
+                'tables': tables,
+                'common_columns': common_columns,
+                'table_set': sorted(table_set),
+            }
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix='.schema_cache_', dir=directory)
+            try:
+                # Serializing in one go is much faster than json.dump's chunked writes
+                payload = json.dumps(data, default=str)
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    @staticmethod
+    def table_entry(marker, columns, key_columns):
+        """
+        Build the persisted record for a single table. Columns are stored as
+        [name, type, length, nullable] rows; date columns and aliases are
+        derived from them on load.
+        """
+        return {
+            'marker': marker,
+            'fetched_at': time.time(),
+            'columns': [[col['name'], col['type'], col['length'], col['nullable']] for col in columns],
+            'key_columns': key_columns,
+        }
@@ -0,0 +1,354 @@
+import re
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from Query_Cache import normalize_sql
+
+DEFAULT_ROW_LIMIT = 1000
+# Row limit used when a query is rewritten because its estimated cost is too high
+COST_FALLBACK_ROW_LIMIT = 100
+DEFAULT_VERDICT_CACHE_SIZE = 2048
+
+# Statements that change data, schema, session or privileges. Only rejected
+# where a statement can start, so columns named e.g. COMMENT stay usable
+FORBIDDEN_KEYWORDS = {
+    'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'UPSERT', 'REPLACE', 'TRUNCATE',
+    'DROP', 'CREATE', 'ALTER', 'RENAME', 'COMMENT', 'GRANT', 'REVOKE',
+    'CALL', 'EXEC', 'EXECUTE', 'DO', 'SET', 'COMMIT', 'ROLLBACK', 'SAVEPOINT',
+    'LOCK', 'IMPORT', 'EXPORT', 'LOAD', 'UNLOAD', 'CONNECT', 'DISCONNECT',
+}
+# Forbidden keywords that are harmless when used as scalar functions, e.g. REPLACE(...)
+FUNCTION_KEYWORDS = {'REPLACE'}
+SET_OPERATORS = {'UNION', 'INTERSECT', 'EXCEPT', 'MINUS'}
+# Keywords that end a FROM list
+CLAUSE_KEYWORDS = {
+    'WHERE', 'GROUP', 'ORDER', 'HAVING', 'LIMIT', 'OFFSET', 'JOIN', 'INNER', 'LEFT',
+    'RIGHT', 'FULL', 'CROSS', 'ON', 'USING', 'WITH', 'FOR', 'WINDOW',
+} | SET_OPERATORS
+# Pseudo tables every query may read
+BUILTIN_TABLES = {'DUMMY'}
+# Literals right after these tokens are predicate values that can be bound as parameters
+COMPARISON_TOKENS = {'=', '<>', '!=', '<', '>', '<=', '>=', 'LIKE', 'BETWEEN'}
+
+_TOKEN_PATTERN = re.compile(
+    r"""(?P<space>\s+)
+      |(?P<comment>--[^\n]*|/\*.*?\*/)
+      |(?P<string>'(?:[^']|'')*')
+      |(?P<quoted>"(?:[^"]|"")*")
+      |(?P<word>[A-Za-z_][\w$#]*)
+      |(?P<number>\d+(?:\.\d+)?)
+      |(?P<symbol><>|!=|<=|>=|\|\||.)""",
+    re.VERBOSE | re.DOTALL
+)
+_CODE_FENCE_PATTERN = re.compile(r"^\s*```(?:sql)?\s*|\s*```\s*$", re.IGNORECASE)
+
+
+def strip_code_fences(sql):
+    """LLMs sometimes wrap the query in a markdown code block"""
+    return _CODE_FENCE_PATTERN.sub('', sql).strip()
+
+
+def tokenize(sql):
+    """
+    Split SQL into (kind, text, start) tokens, dropping whitespace and
+    comments. Raises ValueError on unterminated literals or comments.
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(sql):
+        kind = match.lastgroup
+        text = match.group(0)
+        if kind in ('space', 'comment'):
+            continue
+        if kind == 'symbol' and text in ("'", '"'):
+            raise ValueError("Unterminated quoted literal or identifier")
+        if kind == 'symbol' and text == '/' and sql.startswith('/*', match.start()):
+            raise ValueError("Unterminated comment")
+        if kind == 'word':
+            text = text.upper()
+        tokens.append((kind, text, match.start()))
+    return tokens
+
+
+def parameterize_literals(sql):
+    """
+    Replace the literal values compared in predicates (=, <, LIKE, BETWEEN,
+    IN lists) with "?" placeholders, so queries that only differ in those
+    values share one statement text and HANA plan. Literals elsewhere (TOP,
+    DATE '...', function arguments) are left alone.
+    Returns (sql, params); params is None when the SQL cannot be tokenized.
+    """
+    try:
+        tokens = tokenize(sql)
+    except ValueError:
+        return sql, None
+
+    replaced = []
+    in_list = False
+    between = False
+    previous = None
+    for kind, text, start in tokens:
+        if between and previous == 'AND' and kind not in ('string', 'number'):
+            # The upper bound is an expression, so a later AND starts a new predicate
+            between = False
+        if kind in ('string', 'number') and previous is not None:
+            bindable = (
+                previous in COMPARISON_TOKENS
+                or (previous == 'AND' and between)
+                or (in_list and previous in ('(', ','))
+            )
+            if bindable:
+                replaced.append((start, len(text), _literal_value(kind, text)))
+                if previous == 'AND':
+                    between = False
+        elif text == '(':
+            in_list = previous == 'IN'
+        elif text == ')':
+            in_list = False
+        elif text == 'BETWEEN':
+            between = True
+        if in_list and kind not in ('string', 'number') and text not in ('(', ','):
+            # Only plain value lists are bound, not subqueries or expressions
+            in_list = False
+        previous = text
+
+    parts = []
+    params = []
+    position = 0
+    for start, length, value in replaced:
+        parts.append(sql[position:start])
+        parts.append('?')
+        params.append(value)
+        position = start + length
+    parts.append(sql[position:])
+    return "".join(parts), params
+
+
+class ExplainPlanError(ValueError):
+    """
+    HANA could not explain the query (e.g. an unknown column), so its cost
+    is unknown. error is the database's error text and query the SQL that
+    was explained.
+    """
+    def __init__(self, query, error):
+        super().__init__(f"Unable to estimate query cost: {error}")
+        self.query = query
+        self.error = str(error)
+
+
+def _literal_value(kind, text):
+    if kind == 'string':
+        return text[1:-1].replace("''", "'")
+    if '.' in text:
+        return Decimal(text)
+    return int(text)
+
+
+def _identifier_name(token):
+    kind, text, _ = token
+    if kind == 'quoted':
+        return text[1:-1].replace('""', '"')
+    return text
+
+
+class SqlGuard:
+    """
+    Lightweight validation of generated SQL before it reaches HANA.
+
+    validate() only lets through a single SELECT (optionally with CTEs)
+    reading allowed tables, rejects anything that writes data or changes
+    the schema/session, and injects a TOP / LIMIT row limit when the query
+    has none. With hana_db and max_cost set, the query's EXPLAIN PLAN cost
+    is checked too: expensive queries are rejected, or with
+    cost_action="limit" retried with a tighter row limit. Verdicts are
+    cached per normalized SQL.
+    """
+    def __init__(self, allowed_tables, schema_name=None, row_limit=DEFAULT_ROW_LIMIT,
+                 hana_db=None, max_cost=None, cost_action="reject",
+                 cache_size=DEFAULT_VERDICT_CACHE_SIZE):
+        self.allowed_tables = {table.upper() for table in allowed_tables} | BUILTIN_TABLES
+        self.schema_name = schema_name
+        self.row_limit = row_limit
+        self.hana_db = hana_db
+        self.max_cost = max_cost
+        self.cost_action = cost_action
+        self.cache_size = cache_size
+        self._verdicts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def validate(self, sql):
+        """
+        Returns (safe_sql, error). safe_sql is the query to execute, with a
+        row limit injected where needed; error explains a rejection.
+        Raises ExplainPlanError when HANA rejects the query during the cost
+        check; those failures are not cached.
+        """
+        key = normalize_sql(sql)
+        with self._lock:
+            verdict = self._verdicts.get(key)
+            if verdict is not None:
+                self._verdicts.move_to_end(key)
+                return verdict
+
+        verdict = self._validate(sql)
+
+        with self._lock:
+            self._verdicts[key] = verdict
+            while len(self._verdicts) > self.cache_size:
+                self._verdicts.popitem(last=False)
+        return verdict
+
+    def _validate(self, sql):
+        try:
+            sql = strip_code_fences(sql).rstrip().rstrip(';').rstrip()
+            tokens = tokenize(sql)
+            self._check_statement(tokens)
+            safe_sql = self._apply_row_limit(sql, tokens, self.row_limit)
+            if self.hana_db is not None and self.max_cost:
+                safe_sql = self._check_cost(sql, tokens, safe_sql)
+            return safe_sql, None
+        except ExplainPlanError:
+            raise
+        except ValueError as e:
+            return None, str(e)
+
+    def _check_statement(self, tokens):
+        if not tokens:
+            raise ValueError("Empty query")
+        if tokens[0][1] not in ('SELECT', 'WITH'):
+            raise ValueError(f"Only SELECT queries are allowed, got {tokens[0][1]}")
+
+        depth = 0
+        for index, (kind, text, _) in enumerate(tokens):
+            if kind == 'symbol':
+                if text == '(':
+                    depth += 1
+                elif text == ')':
+                    depth -= 1
+                    if depth < 0:
+                        raise ValueError("Unbalanced parentheses")
+                elif text == ';':
+                    raise ValueError("Multiple statements are not allowed")
+            elif kind == 'word' and text in FORBIDDEN_KEYWORDS:
+                next_token = tokens[index + 1] if index + 1 < len(tokens) else None
+                if text in FUNCTION_KEYWORDS and next_token is not None and next_token[1] == '(':
+                    continue
+                if self._starts_statement(tokens, index, depth):
+                    raise ValueError(f"{text} statements are not allowed")
+                if text == 'UPDATE' and tokens[index - 1][1] == 'FOR':
+                    raise ValueError("SELECT ... FOR UPDATE is not allowed")
+        if depth != 0:
+            raise ValueError("Unbalanced parentheses")
+
+        disallowed = sorted(self._referenced_tables(tokens) - self.allowed_tables)
+        if disallowed:
+            raise ValueError(f"Query uses tables that are not allowed: {', '.join(disallowed)}")
+
+    @staticmethod
+    def _starts_statement(tokens, index, depth):
+        """
+        Whether tokens[index] is where a statement can begin: the start of
+        the query, a subquery / CTE body, or the main statement after a
+        top-level CTE list
+        """
+        if index == 0:
+            return True
+        previous = tokens[index - 1][1]
+        return previous in ('(', ';') or (previous == ')' and depth == 0)
+
+    def _referenced_tables(self, tokens):
+        """Names of the tables in FROM / JOIN clauses, excluding CTE names"""
+        cte_names = set()
+        for index, token in enumerate(tokens[:-2]):
+            # "<name> AS (" at the start of the query or after a comma is a CTE definition
+            if (token[0] in ('word', 'quoted') and tokens[index + 1][1] == 'AS'
+                    and tokens[index + 2][1] == '(' and index > 0 and tokens[index - 1][1] in ('WITH', ',', 'RECURSIVE')):
+                cte_names.add(_identifier_name(token).upper())
+
+        tables = set()
+        index = 0
+        while index < len(tokens):
+            kind, text, _ = tokens[index]
+            if kind == 'word' and text in ('FROM', 'JOIN'):
+                index += 1
+                while index < len(tokens):
+                    name, schema, index = self._read_table_reference(tokens, index)
+                    if name is not None:
+                        if self.schema_name and schema and schema != self.schema_name:
+                            raise ValueError(f"Query reads from another schema: {schema}")
+                        if name.upper() not in cte_names:
+                            tables.add(name.upper() if tokens[index - 1][0] != 'quoted' else name)
+                    # Skip an optional alias, then continue a comma separated FROM list
+                    if index < len(tokens) and tokens[index][1] == 'AS':
+                        index += 1
+                    if (index < len(tokens) and tokens[index][0] in ('word', 'quoted')
+                            and tokens[index][1] not in CLAUSE_KEYWORDS):
+                        index += 1
+                    if text == 'FROM' and index < len(tokens) and tokens[index][1] == ',':
+                        index += 1
+                        continue
+                    break
+                continue
+            index += 1
+        return tables
+
+    @staticmethod
+    def _read_table_reference(tokens, index):
+        """Returns (table name, schema name, next index); name is None for subqueries"""
+        if index >= len(tokens) or tokens[index][1] == '(' or tokens[index][0] not in ('word', 'quoted'):
+            return None, None, index
+        name = _identifier_name(tokens[index])
+        schema = None
+        index += 1
+        if index + 1 < len(tokens) and tokens[index][1] == '.' and tokens[index + 1][0] in ('word', 'quoted'):
+            schema = name
+            name = _identifier_name(tokens[index + 1])
+            index += 2
+        return name, schema, index
+
+    @staticmethod
+    def _apply_row_limit(sql, tokens, row_limit):
+        """Inject TOP n into the outermost SELECT (or LIMIT n after a set operation) if missing"""
+        if not row_limit:
+            return sql
+        depth = 0
+        main_select = None
+        has_set_operator = False
+        for index, (kind, text, start) in enumerate(tokens):
+            if text == '(':
+                depth += 1
+            elif text == ')':
+                depth -= 1
+            elif depth == 0 and kind == 'word':
+                if text == 'LIMIT':
+                    return sql
+                if text in SET_OPERATORS:
+                    has_set_operator = True
+                if text == 'SELECT' and main_select is None:
+                    main_select = index
+        if main_select is None:
+            return sql
+        if has_set_operator:
+            # On a new line so a trailing line comment cannot swallow it
+            return f"{sql}\nLIMIT {row_limit}"
+
+        insert_at = main_select + 1
+        if insert_at < len(tokens) and tokens[insert_at][1] in ('DISTINCT', 'ALL'):
+            insert_at += 1
+        if insert_at < len(tokens) and tokens[insert_at][1] == 'TOP':
+            return sql
+        position = tokens[insert_at][2] if insert_at < len(tokens) else len(sql)
+        return f"{sql[:position]}TOP {row_limit} {sql[position:]}"
+
+    def _check_cost(self, sql, tokens, safe_sql):
+        cost, error = self.hana_db.explain_cost(safe_sql)
+        if error:
+            raise ExplainPlanError(safe_sql, error)
+        if cost is None or cost <= self.max_cost:
+            return safe_sql
+        if self.cost_action == "limit":
+            limited_sql = self._apply_row_limit(sql, tokens, COST_FALLBACK_ROW_LIMIT)
+            if limited_sql != safe_sql:
+                cost, error = self.hana_db.explain_cost(limited_sql)
+                if not error and cost is not None and cost <= self.max_cost:
+                    return limited_sql
+        raise ValueError(f"Estimated query cost {cost:.0f} exceeds the limit of {self.max_cost:.0f}")
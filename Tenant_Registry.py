@@ -0,0 +1,299 @@
+"""
+Serves many schemas / business units from one process.
+
+Each tenant has its own schema, allowed tables and column mappings, and gets
+its own HanaDbConnector and TableRelationshipManager on first use. All
+tenants share one HANA connection pool, one LLM client and one copy of any
+table metadata that is identical across tenants. Idle tenants, and the least
+recently used ones once the metadata exceeds a memory budget, are unloaded
+and reloaded (from the metadata cache file) when they are used again.
+
+    registry = TenantRegistry(pool_size=16)
+    registry.register(TenantConfig("sales_emea", "SALES_EMEA", ["VBAK", "VBAP"]))
+    result = registry.process_query("sales_emea", "Show me sales from last week")
+"""
+import hashlib
+import sys
+import threading
+import time
+import Query_Generation as qg
+from Hana_Db_Operations import HanaConnectionPool, HanaDbConnector, DEFAULT_POOL_SIZE
+from Query_Cache import QueryResultCache
+from Schema_Metadata_Cache import SchemaMetadataCache
+
+# Tenants unused for this long are unloaded
+DEFAULT_IDLE_SECONDS = 1800
+# Least recently used tenants are unloaded while their metadata exceeds this
+DEFAULT_MEMORY_BUDGET_BYTES = 512 * 1024 * 1024
+
+
+def _deep_size(obj, seen):
+    """
+    Approximate bytes held by obj and the containers, strings and slotted
+    records it references; objects already in seen are not counted again
+    """
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += _deep_size(key, seen) + _deep_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += _deep_size(item, seen)
+    elif hasattr(type(obj), '__slots__'):
+        for slot in type(obj).__slots__:
+            if hasattr(obj, slot):
+                size += _deep_size(getattr(obj, slot), seen)
+    return size
+
+
+def _metadata_digest(columns, key_columns):
+    """Digest of a table's column definitions and key columns"""
+    signature = (
+        [sorted(dict(col).items()) for col in columns],
+        sorted(key_columns),
+    )
+    return hashlib.sha1(repr(signature).encode('utf-8')).hexdigest()
+
+
+class SharedTableMetadata:
+    """
+    Reference-counted store of per-table metadata. Managers that see a
+    table with exactly the same columns and key columns (in any schema)
+    share one copy of its column list, date columns, aliases and keys.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def intern(self, table, columns, date_columns, column_aliases, key_columns):
+        """Returns (key, (columns, date_columns, column_aliases, key_columns)) to use instead of the given ones"""
+        key = (table, _metadata_digest(columns, key_columns))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [(columns, date_columns, column_aliases, key_columns), 0]
+            entry[1] += 1
+            return key, entry[0]
+
+    def release(self, keys):
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self._entries[key]
+
+    def references(self):
+        """Total references held by managers; compare with len() to see how much is shared"""
+        with self._lock:
+            return sum(count for _, count in self._entries.values())
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TenantConfig:
+    """Schema, allowed tables and business column mappings of one tenant"""
+    def __init__(self, tenant_id, schema_name, allowed_tables, column_mappings=None):
+        self.tenant_id = tenant_id
+        self.schema_name = schema_name
+        self.allowed_tables = list(allowed_tables)
+        self.column_mappings = dict(column_mappings or {})
+
+
+class Tenant:
+    """A loaded tenant: its connector, relationship manager and pipeline"""
+    def __init__(self, config, hana_db, relationship_manager, pipeline):
+        self.config = config
+        self.hana_db = hana_db
+        self.relationship_manager = relationship_manager
+        self.pipeline = pipeline
+        self.last_used = time.monotonic()
+
+    def process_query(self, question, **kwargs):
+        return qg.process_query_with_summary(
+            question, self.config.schema_name, self.hana_db, self.relationship_manager,
+            pipeline=self.pipeline, **kwargs
+        )
+
+    def process_query_stream(self, question, **kwargs):
+        return qg.process_query_with_summary_stream(
+            question, self.config.schema_name, self.hana_db, self.relationship_manager,
+            pipeline=self.pipeline, **kwargs
+        )
+
+
+class TenantRegistry:
+    """
+    Registered tenants are loaded lazily by get(); see the module docstring.
+
+    pipeline is the base QueryPipeline whose LLM client and chains every
+    tenant uses (the default pipeline when None). Result caches are kept
+    per schema, since cached results are keyed on the SQL text only.
+    """
+    def __init__(self, pool=None, pool_size=DEFAULT_POOL_SIZE, pipeline=None, cache_path=qg.SCHEMA_CACHE_PATH,
+                 idle_seconds=DEFAULT_IDLE_SECONDS, max_bytes=DEFAULT_MEMORY_BUDGET_BYTES,
+                 result_cache_factory=QueryResultCache):
+        self.pool = pool if pool is not None else HanaConnectionPool(max_size=pool_size)
+        self.pipeline = pipeline
+        # One instance so concurrent tenant loads serialize their writes to the file
+        self.metadata_cache = SchemaMetadataCache(cache_path) if cache_path else None
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self.result_cache_factory = result_cache_factory
+        self.metadata = SharedTableMetadata()
+        self._configs = {}
+        self._tenants = {}
+        self._result_caches = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self.metadata_bytes = 0
+        self.stats = {'loads': 0, 'idle_evictions': 0, 'memory_evictions': 0}
+
+    def register(self, config):
+        """Add or replace a tenant; a replaced tenant is reloaded on next use"""
+        with self._lock:
+            self._configs[config.tenant_id] = config
+            tenant = self._tenants.pop(config.tenant_id, None)
+        if tenant is not None:
+            self._unload(tenant)
+
+    def unregister(self, tenant_id):
+        with self._lock:
+            self._configs.pop(tenant_id, None)
+            tenant = self._tenants.pop(tenant_id, None)
+        if tenant is not None:
+            self._unload(tenant)
+
+    def tenant_ids(self):
+        with self._lock:
+            return list(self._configs)
+
+    def loaded_tenant_ids(self):
+        with self._lock:
+            return list(self._tenants)
+
+    def get(self, tenant_id):
+        """Returns the loaded Tenant, loading it first if needed. Raises KeyError for unknown tenants."""
+        self.evict_idle()
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is not None:
+                tenant.last_used = time.monotonic()
+                return tenant
+            if tenant_id not in self._configs:
+                raise KeyError(f"Unknown tenant: {tenant_id}")
+            load_lock = self._load_locks.setdefault(tenant_id, threading.Lock())
+
+        # Loading talks to HANA, so only callers of this tenant wait for it
+        with load_lock:
+            with self._lock:
+                tenant = self._tenants.get(tenant_id)
+                config = self._configs.get(tenant_id)
+            if tenant is None:
+                if config is None:
+                    raise KeyError(f"Unknown tenant: {tenant_id}")
+                tenant = self._load(config)
+                with self._lock:
+                    self._tenants[tenant_id] = tenant
+                self._enforce_memory_budget(keep=tenant_id)
+            tenant.last_used = time.monotonic()
+            return tenant
+
+    def process_query(self, tenant_id, question, **kwargs):
+        """process_query_with_summary for one tenant"""
+        return self.get(tenant_id).process_query(question, **kwargs)
+
+    def evict_idle(self):
+        """Unloads tenants unused for idle_seconds; returns how many were unloaded"""
+        if not self.idle_seconds:
+            return 0
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            idle = [tenant for tenant in self._tenants.values() if tenant.last_used < cutoff]
+            for tenant in idle:
+                del self._tenants[tenant.config.tenant_id]
+        for tenant in idle:
+            self._unload(tenant)
+        self.stats['idle_evictions'] += len(idle)
+        return len(idle)
+
+    def close(self):
+        """Unloads every tenant and closes the shared connection pool"""
+        with self._lock:
+            tenants = list(self._tenants.values())
+            self._tenants.clear()
+        for tenant in tenants:
+            self._unload(tenant)
+        self.pool.close()
+
+    def _load(self, config):
+        print(f"\nLoading tenant {config.tenant_id} (schema {config.schema_name})")
+        hana_db = HanaDbConnector(pool=self.pool)
+        success, error = hana_db.select_schema(config.schema_name)
+        if error:
+            raise ValueError(f"Error selecting schema {config.schema_name} for tenant {config.tenant_id}: {error}")
+        relationship_manager = qg.TableRelationshipManager(
+            hana_db,
+            metadata_cache=self.metadata_cache,
+            allowed_tables=config.allowed_tables,
+            column_mappings=config.column_mappings,
+            metadata_store=self.metadata,
+            # Tenants on one schema may allow different tables, so each keeps its own cache entry
+            cache_key=f"{config.schema_name}/{config.tenant_id}",
+        )
+        with self._lock:
+            result_cache = self._result_caches.get(config.schema_name)
+            if result_cache is None:
+                result_cache = self._result_caches[config.schema_name] = self.result_cache_factory()
+        self.stats['loads'] += 1
+        return Tenant(config, hana_db, relationship_manager, qg.ScopedPipeline(result_cache, self.pipeline))
+
+    def _unload(self, tenant):
+        tenant.relationship_manager.release_shared_metadata()
+        schema_name = tenant.config.schema_name
+        with self._lock:
+            if not any(other.config.schema_name == schema_name for other in self._tenants.values()):
+                self._result_caches.pop(schema_name, None)
+        print(f"Unloaded tenant {tenant.config.tenant_id}")
+
+    def _measure(self, tenants):
+        """Metadata bytes of the given tenants, counting shared tables once"""
+        seen = set()
+        sizes = {}
+        for tenant in tenants:
+            sizes[tenant.config.tenant_id] = _deep_size(vars(tenant.relationship_manager), seen)
+        return sizes
+
+    def _enforce_memory_budget(self, keep):
+        """Unloads least recently used tenants (never `keep`) while the metadata exceeds max_bytes"""
+        with self._lock:
+            tenants = sorted(self._tenants.values(), key=lambda tenant: tenant.last_used)
+        sizes = self._measure(tenants)
+        total = sum(sizes.values())
+        evicted = []
+        if self.max_bytes:
+            for tenant in tenants:
+                if total <= self.max_bytes:
+                    break
+                if tenant.config.tenant_id == keep:
+                    continue
+                # Shared tables still used by other tenants are not freed, so this overestimates
+                total -= sizes[tenant.config.tenant_id]
+                evicted.append(tenant)
+        with self._lock:
+            for tenant in evicted:
+                self._tenants.pop(tenant.config.tenant_id, None)
+        for tenant in evicted:
+            self._unload(tenant)
+        self.stats['memory_evictions'] += len(evicted)
+        if evicted:
+            with self._lock:
+                tenants = list(self._tenants.values())
+            total = sum(self._measure(tenants).values())
+        self.metadata_bytes = total
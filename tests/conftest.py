@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Query_Generation as qg
+from Benchmark_Suite import HanaStandIn
+
+
+class ScriptedChain:
+    """Chain stand-in answering run() with the given answers in turn (the last one repeats)"""
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = []
+
+    def run(self, inputs):
+        self.calls.append(inputs)
+        return self.answers[min(len(self.calls), len(self.answers)) - 1]
+
+
+@pytest.fixture
+def standin():
+    standin = HanaStandIn(tables=3, columns=6, date_columns=2, rows=20, small_table_rows=5)
+    yield standin
+    standin.close()
+
+
+@pytest.fixture
+def hana_db(standin):
+    return standin.connector(pool_size=2)
+
+
+@pytest.fixture(autouse=True)
+def clear_module_caches():
+    for cache in (qg.generated_query_cache, qg.query_result_cache, qg.query_repair_cache):
+        if cache is not None:
+            cache.clear()
+    yield
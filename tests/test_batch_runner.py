@@ -0,0 +1,88 @@
+import contextlib
+import io
+import json
+
+import Batch_Runner as br
+import Pipeline_Metrics as metrics
+import Query_Generation as qg
+from Query_Cache import QueryResultCache
+from conftest import ScriptedChain
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class ThrottledChain(ScriptedChain):
+    """Rate limited on its first call, then answers like ScriptedChain"""
+    def run(self, inputs):
+        if not self.calls:
+            self.calls.append(inputs)
+            raise RateLimitError("429 Too Many Requests")
+        return super().run(inputs)
+
+
+def make_manager(hana_db):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return qg.TableRelationshipManager(hana_db, cache_path=None, allowed_tables=["T0000"])
+
+
+def make_pipeline(query_chain, repair_chain):
+    return qg.QueryPipeline(
+        llm=object(),
+        query_chain=query_chain,
+        summary_chain=ScriptedChain("summary"),
+        repair_chain=repair_chain,
+        result_cache=QueryResultCache(),
+    )
+
+
+def test_repair_llm_calls_go_through_the_backoff(hana_db):
+    manager = make_manager(hana_db)
+    pipeline = make_pipeline(ScriptedChain("SELECT NOPE FROM T0000"), ThrottledChain("SELECT ID0000 FROM T0000"))
+    backoff = br.RateLimitBackoff(base_seconds=0)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        record = br.run_question("list ids", "BENCH", None, hana_db, manager, backoff,
+                                 summarize=False, pipeline=pipeline)
+
+    assert "error" not in record
+    assert "ID0000" in record["query"]
+    assert backoff.throttled == 1
+    assert len(pipeline.repair_chain.calls) == 2
+
+
+def test_stage_latency_covers_only_the_batch(hana_db, tmp_path):
+    with metrics.trace("earlier"):
+        with metrics.stage("earlier_stage"):
+            pass
+    manager = make_manager(hana_db)
+    pipeline = make_pipeline(ScriptedChain("SELECT ID0000 FROM T0000"), ScriptedChain("unused"))
+    output_path = tmp_path / "results.jsonl"
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = br.run_batch(["list ids", "count ids"], "BENCH", hana_db, manager, str(output_path),
+                             concurrency=2, summarize=False, pipeline=pipeline)
+
+    assert stats["errors"] == 0
+    assert "earlier_stage" not in stats["stage_latency"]
+    assert stats["stage_latency"]["total"]["count"] == 2
+    assert len(output_path.read_text().splitlines()) == 2
+    assert all("metrics" in json.loads(line) for line in output_path.read_text().splitlines())
+
+
+def test_query_rejected_by_explain_plan_is_repaired(hana_db, monkeypatch):
+    monkeypatch.setattr(hana_db, "explain_cost",
+                        lambda query: (None, "invalid column name: NOPE") if "NOPE" in query else (1.0, None))
+    manager = make_manager(hana_db)
+    manager.sql_guard.hana_db = hana_db
+    manager.sql_guard.max_cost = 1000.0
+    pipeline = make_pipeline(ScriptedChain("SELECT NOPE FROM T0000"), ScriptedChain("SELECT ID0000 FROM T0000"))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        record = br.run_question("list ids", "BENCH", None, hana_db, manager, br.RateLimitBackoff(),
+                                 summarize=False, pipeline=pipeline)
+
+    assert "error" not in record
+    assert "ID0000" in record["query"]
+    assert pipeline.repair_chain.calls[0]["error"] == "invalid column name: NOPE"
@@ -0,0 +1,16 @@
+import sys
+
+import pytest
+
+import Benchmark_Suite
+
+
+def test_large_fetch_skips_columnar_formats_without_pyarrow(standin, hana_db, monkeypatch):
+    pytest.importorskip("numpy")
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+
+    scenario = Benchmark_Suite.bench_large_fetch(standin, hana_db, repeat=1)
+
+    assert scenario["rows"] == 20
+    assert "arrow_fetch_seconds" not in scenario
+    assert "numpy_fetch_seconds" in scenario
@@ -0,0 +1,62 @@
+import pytest
+
+import Columnar_Results
+from Columnar_Results import ColumnarBuilder
+
+np = pytest.importorskip("numpy")
+
+
+def build(rows, batches=1, date_columns=()):
+    builder = ColumnarBuilder(("ID", "NAME", "ERDAT"), "numpy", date_columns)
+    size = max(1, len(rows) // batches)
+    for start in range(0, len(rows), size):
+        builder.append(rows[start:start + size])
+    return builder.finish()
+
+
+def test_nullable_integers_keep_their_values():
+    result = build([(1, "a", "20240101"), (None, "b", "20240102"), (3, "c", "20240103")])
+
+    assert result.rows[:2] == [(1, "a", "20240101"), (None, "b", "20240102")]
+    assert all(type(value) is int for value in result.column("ID") if value is not None)
+
+
+def test_nullable_integers_across_batches():
+    result = build([(1, "a", None), (2, "b", None), (None, "c", None), (4, "d", None)], batches=2)
+
+    assert [row[0] for row in result.rows] == [1, 2, None, 4]
+
+
+def test_integers_without_nulls_are_int64():
+    result = build([(1, "a", "20240101"), (2, "b", "20240102")])
+
+    assert result.column("ID").dtype == np.int64
+
+
+def test_dats_columns_are_decoded():
+    result = build([(1, "a", "20240131"), (2, "b", "00000000")], date_columns=("ERDAT",))
+
+    dates = result.column("ERDAT")
+    assert str(dates[0]) == "2024-01-31"
+    assert np.isnat(dates[1])
+
+
+def test_fetch_columnar_raises_for_missing_packages(standin, hana_db, monkeypatch):
+    def missing():
+        raise ImportError("The arrow result format requires the pyarrow package")
+    monkeypatch.setattr(Columnar_Results, "_require_pyarrow", missing)
+
+    with pytest.raises(ImportError):
+        hana_db.fetch_columnar("SELECT ID0000 FROM T0000", "arrow")
+
+
+def test_fetch_columnar_raises_for_unknown_format(hana_db):
+    with pytest.raises(ValueError):
+        hana_db.fetch_columnar("SELECT ID0000 FROM T0000", "csv")
+
+
+def test_fetch_columnar_returns_database_errors(hana_db):
+    result, error = hana_db.fetch_columnar("SELECT NOPE FROM T0000", "numpy")
+
+    assert result is None
+    assert "NOPE" in error
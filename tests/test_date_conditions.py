@@ -0,0 +1,30 @@
+from Query_Generation import DateConditionRewriter
+
+
+REWRITER = DateConditionRewriter({"ERDAT", "AEDAT"})
+
+
+def test_date_comparisons_are_rewritten():
+    query = "SELECT * FROM T WHERE ERDAT >= '2023-01-31' AND t.AEDAT BETWEEN '01/02/2023' AND '2023/12/31'"
+    assert REWRITER.rewrite_query(query) == (
+        "SELECT * FROM T WHERE ERDAT >= '20230131' AND t.AEDAT BETWEEN '20230201' AND '20231231'"
+    )
+
+
+def test_literals_are_left_alone():
+    query = "SELECT * FROM T WHERE C = 'ERDAT = ''2023-01-01''' AND ERDAT = '2023-01-01'"
+    assert REWRITER.rewrite_query(query) == (
+        "SELECT * FROM T WHERE C = 'ERDAT = ''2023-01-01''' AND ERDAT = '20230101'"
+    )
+
+
+def test_comments_pass_through_unchanged():
+    query = (
+        "SELECT * FROM T -- don't touch ERDAT = '2023-01-01'\n"
+        "/* it's ERDAT = '2023-02-01'\n still a comment */ WHERE ERDAT = '2023-03-01'"
+    )
+    assert REWRITER.rewrite_query(query) == (
+        "SELECT * FROM T -- don't touch ERDAT = '2023-01-01'\n"
+        "/* it's ERDAT = '2023-02-01'\n still a comment */ WHERE ERDAT = '20230301'"
+    )
+    assert REWRITER.rewrite_queries([query]) == [REWRITER.rewrite_query(query)]
@@ -0,0 +1,95 @@
+import pytest
+from hdbcli import dbapi
+
+from Hana_Db_Operations import HanaConnectionPool, HanaDbConnector
+
+
+class FakeConnection:
+    """Connection whose prepared statements read the rows of the schema that was current when they were prepared"""
+    def __init__(self, rows_by_schema, broken=False):
+        self.rows_by_schema = rows_by_schema
+        self.schema = None
+        self.prepared = 0
+        self.broken = broken
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def isconnected(self):
+        return not self.broken
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self._rows = []
+        self._prepared_rows = None
+
+    def execute(self, sql, params=None):
+        if self.connection.broken:
+            raise dbapi.Error("Connection reset by peer")
+        if sql.startswith("SET SCHEMA"):
+            self.connection.schema = sql.split()[-1].strip('"')
+            return
+        self.description = (("X",),)
+        self._rows = [(1,)]
+
+    def prepare(self, sql):
+        self.connection.prepared += 1
+        self._prepared_rows = self.connection.rows_by_schema[self.connection.schema]
+
+    def executeprepared(self, params):
+        self.description = (("NAME",),)
+        self._rows = list(self._prepared_rows)
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+def test_statements_prepared_for_one_tenant_are_not_reused_for_another():
+    connection = FakeConnection({"TENANT_A": [("alice",)], "TENANT_B": [("bob",)]})
+    pool = HanaConnectionPool(max_size=1, connect=lambda: connection)
+    tenant_a = HanaDbConnector(pool=pool)
+    tenant_b = HanaDbConnector(pool=pool)
+    assert tenant_a.select_schema("TENANT_A") == (True, None)
+    assert tenant_b.select_schema("TENANT_B") == (True, None)
+    sql = "SELECT NAME FROM CUSTOMERS"
+
+    assert tenant_a.execute_prepared(sql) == ([{"NAME": "alice"}], None)
+    assert tenant_b.execute_prepared(sql) == ([{"NAME": "bob"}], None)
+    assert tenant_a.execute_prepared(sql) == ([{"NAME": "alice"}], None)
+    # Both statements stay prepared on the one connection
+    assert connection.prepared == 2
+
+
+def test_select_schema_retries_once_on_a_broken_connection():
+    connections = [FakeConnection({}, broken=True), FakeConnection({})]
+    pool = HanaConnectionPool(max_size=1, connect=lambda: connections.pop(0))
+    connector = HanaDbConnector(pool=pool)
+
+    assert connector.select_schema("TENANT_A") == (True, None)
+    assert connector.current_schema == "TENANT_A"
+    assert pool.stats()["discarded"] == 1
+
+
+def test_checkout_timeouts_count_their_wait():
+    pool = HanaConnectionPool(max_size=1, connect=lambda: FakeConnection({}))
+    held = pool.checkout()
+
+    with pytest.raises(TimeoutError):
+        pool.checkout(timeout=0.05)
+    pool.checkin(held)
+
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["waits"] == 1
+    assert stats["wait_time"] >= 0.05
+    assert stats["max_wait_time"] == stats["wait_time"]
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+import Query_Generation as qg
+from conftest import ScriptedChain
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_loads_neither_dotenv_nor_the_sql_cache(tmp_path):
+    cache_path = tmp_path / "sql_cache.sqlite"
+    script = (
+        "import os, sys\n"
+        "import Query_Generation as qg\n"
+        "assert 'dotenv' not in sys.modules\n"
+        "assert not os.path.exists(os.environ['HANA_SQL_CACHE_PATH'])\n"
+        "assert qg.generated_query_cache is qg.generated_query_cache\n"
+        "assert os.path.exists(os.environ['HANA_SQL_CACHE_PATH'])\n"
+        "assert 'dotenv' in sys.modules\n"
+    )
+    env = dict(os.environ, HANA_SQL_CACHE_PATH=str(cache_path),
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    completed = subprocess.run([sys.executable, "-c", script], cwd=str(tmp_path), env=env,
+                               capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+
+
+def test_settings_come_from_the_environment_unless_assigned(monkeypatch):
+    monkeypatch.setenv("HANA_SQL_MAX_COST", "2500")
+    assert qg.SQL_MAX_COST == 2500.0
+
+    qg.SQL_MAX_COST = None
+    try:
+        assert qg.SQL_MAX_COST is None
+    finally:
+        del qg.SQL_MAX_COST
+    assert qg.SQL_MAX_COST == 2500.0
+
+
+def test_pipeline_attributes_follow_the_default_pipeline():
+    previous = qg.get_pipeline()
+    try:
+        first = qg.QueryPipeline(llm=object(), query_chain=ScriptedChain("a"), summary_chain=ScriptedChain("b"))
+        qg.set_pipeline(first)
+        assert qg.query_chain is first.query_chain
+
+        second = qg.QueryPipeline(llm=object(), query_chain=ScriptedChain("c"), summary_chain=ScriptedChain("d"))
+        qg.set_pipeline(second)
+        assert qg.query_chain is second.query_chain
+        assert qg.summary_chain is second.summary_chain
+    finally:
+        qg.set_pipeline(previous)
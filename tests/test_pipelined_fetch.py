@@ -0,0 +1,36 @@
+import Pipeline_Metrics as metrics
+import Query_Generation as qg
+from test_query_repair import make_manager, make_pipeline, run
+
+
+def test_background_fetch_records_into_callers_trace(hana_db):
+    with metrics.trace("pipelined") as pipeline_trace:
+        basis, future = qg.start_pipelined_fetch("SELECT * FROM T0000", hana_db, preview_rows=5)
+        state = basis()
+        results = future.result()
+
+    assert state["rows_fetched"] >= 5
+    assert len(results) == 20
+    assert "hana_execute" in pipeline_trace.stages
+
+
+
+def test_pipelined_summary_counts_hana_time_once(hana_db):
+    manager = make_manager(hana_db, ["T0000"])
+    pipeline = make_pipeline("SELECT ID0000 FROM T0000", "unused")
+    traces = []
+
+    class Collect:
+        def emit(self, pipeline_trace):
+            traces.append(pipeline_trace)
+
+    sink = Collect()
+    metrics.add_sink(sink)
+    try:
+        result = run("list ids", hana_db, manager, pipeline, summary_mode="pipelined")
+    finally:
+        metrics.remove_sink(sink)
+    result["raw_results"].result()
+
+    assert "prefetch_wait" in result["metrics"]["stages"]
+    assert [span[0] for span in traces[0].spans].count("hana_execute") == 1
@@ -0,0 +1,110 @@
+import pytest
+
+from Query_Cache import GeneratedQueryCache, QueryRepairCache, error_signature, normalize_sql
+
+FINGERPRINT = "schema"
+
+
+def cache_with(question, sql="SELECT 1 FROM DUMMY", **kwargs):
+    cache = GeneratedQueryCache(**kwargs)
+    cache.put(question, FINGERPRINT, sql)
+    return cache
+
+
+def test_exact_match():
+    cache = cache_with("Sales in Germany?")
+
+    assert cache.get("sales in  germany", FINGERPRINT) == "SELECT 1 FROM DUMMY"
+    assert cache.get("sales in germany", "other schema") is None
+
+
+def test_similar_questions_are_not_served_by_default():
+    cache = cache_with("show me sales in germany")
+
+    assert cache.get("sales in germany please", FINGERPRINT) is None
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("sales in germany", "sales in france"),
+    ("total revenue in the north region", "total revenue in the south region"),
+    ("orders of customer 42", "orders of customer 43"),
+    ("top 10 customers by revenue", "bottom 10 customers by revenue"),
+    ("orders created before 20240101", "orders created after 20240101"),
+])
+@pytest.mark.parametrize("threshold", [None, 0.5, 0.9])
+def test_questions_differing_in_an_entity_never_match(cached, asked, threshold):
+    cache = cache_with(cached, similarity_threshold=threshold)
+
+    assert cache.get(asked, FINGERPRINT) is None
+
+
+def test_filler_words_and_word_order_may_differ_when_enabled():
+    cache = cache_with("show orders of customer 42", similarity_threshold=0.5)
+
+    assert cache.get("customer 42 orders please", FINGERPRINT) == "SELECT 1 FROM DUMMY"
+    assert cache.stats["similar_hits"] == 1
+
+
+def test_error_signature_ignores_positions():
+    first = "(260, 'invalid column name: NETWRX: line 1 col 8 (at pos 7)')"
+    second = "(260, 'invalid column name: NETWRX: line 3 col 12 (at pos 40)')"
+
+    assert error_signature(first) == error_signature(second) == "(260, 'invalid column name: netwrx')"
+
+
+def test_repair_cache_is_keyed_on_schema_error_and_sql():
+    cache = QueryRepairCache()
+    cache.put("A", "SELECT X  FROM T;", "invalid column name: X: line 1 col 8", "SELECT Y FROM T")
+
+    assert cache.get("A", "SELECT X FROM T", "invalid column name: X: line 2 col 1") == "SELECT Y FROM T"
+    assert cache.get("B", "SELECT X FROM T", "invalid column name: X") is None
+    cache.invalidate("A", "SELECT X FROM T", "invalid column name: X")
+    assert cache.get("A", "SELECT X FROM T", "invalid column name: X") is None
+
+
+def test_normalize_sql_collapses_whitespace_outside_literals():
+    assert normalize_sql("SELECT  a,\n\t'x  y'\n FROM t ;") == "SELECT a, 'x  y' FROM t"
+
+
+def test_normalize_sql_keeps_the_line_break_after_a_line_comment():
+    assert normalize_sql("SELECT a -- x\n   FROM t") == "SELECT a -- x\nFROM t"
+    assert normalize_sql("SELECT a -- x\nFROM t") != normalize_sql("SELECT a -- x FROM t")
+    assert normalize_sql("SELECT a /* it's */  FROM t") == "SELECT a /* it's */ FROM t"
+
+
+def _persisted_questions(path):
+    import sqlite3
+    with sqlite3.connect(str(path)) as db:
+        return sorted(row[0] for row in db.execute("SELECT question FROM generated_sql"))
+
+
+def test_evicted_entries_are_deleted_from_disk(tmp_path):
+    path = tmp_path / "sql_cache.sqlite"
+    cache = GeneratedQueryCache(max_entries=2, persist_path=str(path))
+    for number in range(5):
+        cache.put(f"show order {number}", "fp", f"SELECT {number} FROM DUMMY")
+
+    assert len(cache) == 2
+    assert _persisted_questions(path) == ["show order 3", "show order 4"]
+
+
+def test_expired_entries_are_deleted_from_disk(tmp_path, monkeypatch):
+    path = tmp_path / "sql_cache.sqlite"
+    cache = GeneratedQueryCache(ttl_seconds=60, persist_path=str(path))
+    cache.put("show order 1", "fp", "SELECT 1 FROM DUMMY")
+    monkeypatch.setattr("Query_Cache.time.time", lambda: 10 ** 12)
+
+    assert cache.get("show order 1", "fp") is None
+    assert _persisted_questions(path) == []
+
+
+def test_startup_prunes_rows_beyond_max_entries(tmp_path):
+    path = tmp_path / "sql_cache.sqlite"
+    cache = GeneratedQueryCache(max_entries=10, persist_path=str(path))
+    for number in range(5):
+        cache.put(f"show order {number}", "fp", f"SELECT {number} FROM DUMMY")
+
+    reopened = GeneratedQueryCache(max_entries=2, persist_path=str(path))
+
+    assert len(reopened) == 2
+    assert _persisted_questions(path) == ["show order 3", "show order 4"]
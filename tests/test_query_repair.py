@@ -0,0 +1,114 @@
+import contextlib
+import io
+
+import Query_Generation as qg
+from Query_Cache import QueryResultCache
+from conftest import ScriptedChain
+
+BAD_QUERY = "SELECT NOPE FROM T0000"
+
+
+def make_manager(hana_db, allowed_tables):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return qg.TableRelationshipManager(hana_db, cache_path=None, allowed_tables=allowed_tables)
+
+
+def make_pipeline(query_answer, *repair_answers):
+    return qg.QueryPipeline(
+        llm=object(),
+        query_chain=ScriptedChain(query_answer),
+        summary_chain=ScriptedChain("summary"),
+        repair_chain=ScriptedChain(*repair_answers),
+        result_cache=QueryResultCache(),
+    )
+
+
+def run(question, hana_db, manager, pipeline, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return qg.process_query_with_summary(question, "BENCH", hana_db, manager, pipeline=pipeline, **kwargs)
+
+
+def test_rejected_query_is_repaired_with_the_error_fed_back(hana_db):
+    manager = make_manager(hana_db, ["T0000"])
+    pipeline = make_pipeline(BAD_QUERY, "SELECT MISSING FROM T0000", "SELECT ID0000 FROM T0000")
+
+    result = run("list ids", hana_db, manager, pipeline)
+
+    assert "error" not in result
+    assert "ID0000" in result["query"]
+    calls = pipeline.repair_chain.calls
+    assert len(calls) == 2
+    assert "NOPE" in calls[0]["error"]
+    assert "MISSING" in calls[1]["query"] and "MISSING" in calls[1]["error"]
+    assert result["metrics"]["counters"]["queries_repaired"] == 1
+
+
+def test_repair_attempts_zero_returns_the_original_error(hana_db):
+    manager = make_manager(hana_db, ["T0000"])
+    pipeline = make_pipeline(BAD_QUERY, "SELECT ID0000 FROM T0000")
+
+    result = run("list ids", hana_db, manager, pipeline, repair_attempts=0)
+
+    assert "NOPE" in result["error"]
+    assert pipeline.repair_chain.calls == []
+
+
+def test_cached_fix_is_reused_without_the_llm(hana_db):
+    manager = make_manager(hana_db, ["T0000"])
+    run("list ids", hana_db, manager, make_pipeline(BAD_QUERY, "SELECT ID0000 FROM T0000"))
+
+    pipeline = make_pipeline(BAD_QUERY, "SELECT MANDT FROM T0000")
+    result = run("show the ids", hana_db, manager, pipeline)
+
+    assert "ID0000" in result["query"]
+    assert pipeline.repair_chain.calls == []
+    assert result["metrics"]["counters"]["repair_cache_hits"] == 1
+
+
+def test_cached_fix_is_checked_against_the_callers_allowed_tables(hana_db):
+    wide = make_manager(hana_db, ["T0000", "T0001"])
+    narrow = make_manager(hana_db, ["T0000"])
+    result = run("list ids", hana_db, wide, make_pipeline(BAD_QUERY, "SELECT ID0001 FROM T0001"))
+    assert "T0001" in result["query"]
+
+    pipeline = make_pipeline(BAD_QUERY, "SELECT ID0000 FROM T0000")
+    result = run("list ids", hana_db, narrow, pipeline)
+
+    assert "error" not in result
+    assert "T0001" not in result["query"]
+    assert len(pipeline.repair_chain.calls) == 1
+
+
+def test_missing_columnar_package_never_reaches_the_repair_chain(hana_db, monkeypatch):
+    import Columnar_Results
+
+    def missing():
+        raise ImportError("The arrow result format requires the pyarrow package")
+    monkeypatch.setattr(Columnar_Results, "_require_pyarrow", missing)
+    manager = make_manager(hana_db, ["T0000"])
+    pipeline = make_pipeline("SELECT ID0000 FROM T0000", "SELECT MANDT FROM T0000")
+
+    result = run("list ids", hana_db, manager, pipeline, result_format="arrow")
+
+    assert "pyarrow" in result["error"]
+    assert pipeline.repair_chain.calls == []
+
+
+def test_query_rejected_by_explain_plan_is_repaired(hana_db, monkeypatch):
+    def explain_cost(query):
+        if "NOPE" in query:
+            return None, "invalid column name: NOPE"
+        return 1.0, None
+    monkeypatch.setattr(hana_db, "explain_cost", explain_cost)
+    manager = make_manager(hana_db, ["T0000"])
+    manager.sql_guard.hana_db = hana_db
+    manager.sql_guard.max_cost = 1000.0
+    pipeline = make_pipeline(BAD_QUERY, "SELECT ID0000 FROM T0000")
+
+    result = run("list ids", hana_db, manager, pipeline)
+
+    assert "error" not in result
+    assert "ID0000" in result["query"]
+    assert pipeline.repair_chain.calls[0]["error"] == "invalid column name: NOPE"
+    # The HANA failure is not remembered as the verdict for the SQL
+    assert not any("NOPE" in key for key in manager.sql_guard._verdicts)
@@ -0,0 +1,31 @@
+import pytest
+
+from Columnar_Results import ColumnarBuilder
+from Hana_Db_Operations import QueryResult
+
+
+def test_slices_keep_columns_and_truncation():
+    result = QueryResult(["ID", "NAME"], [(1, "a"), (2, "b"), (3, "c")], truncated=True)
+
+    preview = result[:2]
+
+    assert isinstance(preview, QueryResult)
+    assert preview.columns == ("ID", "NAME")
+    assert preview.truncated is True
+    assert preview.as_dicts() == [{"ID": 1, "NAME": "a"}, {"ID": 2, "NAME": "b"}]
+    assert result[-1] == {"ID": 3, "NAME": "c"}
+    assert result[1:][:1].truncated is True
+    assert QueryResult(["ID"], [(1,)])[:1].truncated is False
+
+
+def test_columnar_slices_keep_columns_and_truncation():
+    pytest.importorskip("numpy")
+    builder = ColumnarBuilder(("ID", "NAME"), "numpy")
+    builder.append([(1, "a"), (2, "b"), (3, "c")])
+    result = builder.finish(truncated=True)
+
+    preview = result[:2]
+
+    assert preview.columns == ("ID", "NAME")
+    assert preview.truncated is True
+    assert preview.rows == [(1, "a"), (2, "b")]
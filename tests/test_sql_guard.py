@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+import pytest
+
+from Sql_Guard import SqlGuard, parameterize_literals
+
+
+@pytest.fixture
+def guard():
+    return SqlGuard(["VBAK", "VBAP"], schema_name="BENCH", row_limit=100)
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT VBELN FROM VBAK", "SELECT TOP 100 VBELN FROM VBAK"),
+    ("```sql\nSELECT DISTINCT VBELN FROM VBAK;\n```", "SELECT DISTINCT TOP 100 VBELN FROM VBAK"),
+    ("SELECT TOP 5 * FROM BENCH.VBAK", "SELECT TOP 5 * FROM BENCH.VBAK"),
+    ("WITH H AS (SELECT VBELN FROM VBAK) SELECT * FROM H JOIN VBAP ON H.VBELN = VBAP.VBELN",
+     "WITH H AS (SELECT VBELN FROM VBAK) SELECT TOP 100 * FROM H JOIN VBAP ON H.VBELN = VBAP.VBELN"),
+    ("SELECT VBELN FROM VBAK UNION SELECT VBELN FROM VBAP", "SELECT VBELN FROM VBAK UNION SELECT VBELN FROM VBAP\nLIMIT 100"),
+    ("SELECT REPLACE(NAME, 'a', 'b') FROM VBAK", "SELECT TOP 100 REPLACE(NAME, 'a', 'b') FROM VBAK"),
+])
+def test_accepted_statements(guard, sql, expected):
+    assert guard.validate(sql) == (expected, None)
+
+
+@pytest.mark.parametrize("sql, message", [
+    ("", "Empty query"),
+    ("DELETE FROM VBAK", "Only SELECT"),
+    ("SELECT * FROM VBAK; DROP TABLE VBAK", "Multiple statements"),
+    ("SELECT * FROM VBAK WHERE ID IN (DELETE FROM VBAP)", "DELETE statements"),
+    ("WITH H AS (SELECT * FROM VBAK) UPDATE VBAK SET A = 1", "UPDATE statements"),
+    ("SELECT * FROM VBAK FOR UPDATE", "FOR UPDATE"),
+    ("SELECT * FROM KNA1", "not allowed: KNA1"),
+    ("SELECT * FROM OTHER.VBAK", "another schema"),
+    ("SELECT (A FROM VBAK", "Unbalanced"),
+    ("SELECT 'open FROM VBAK", "Unterminated"),
+])
+def test_rejected_statements(guard, sql, message):
+    safe_sql, error = guard.validate(sql)
+    assert safe_sql is None
+    assert message in error
+
+
+def test_keyword_named_columns_are_allowed(guard):
+    sql = "SELECT COMMENT, V.GRANT, \"SET\" FROM VBAK V WHERE COMMENT = 'x' ORDER BY GRANT"
+    safe_sql, error = guard.validate(sql)
+    assert error is None
+    assert safe_sql.startswith("SELECT TOP 100 COMMENT")
+
+
+def test_verdicts_are_cached(guard):
+    first = guard.validate("SELECT * FROM VBAK")
+    assert guard.validate("SELECT *\n  FROM VBAK;") is first
+
+
+def test_parameterize_literals_binds_predicate_values():
+    sql, params = parameterize_literals(
+        "SELECT TOP 10 * FROM VBAK WHERE NAME = 'O''Brien' AND NETWR > 10.5 "
+        "AND ERDAT BETWEEN '20230101' AND '20231231' AND KUNNR IN ('1', '2')"
+    )
+    assert sql == (
+        "SELECT TOP 10 * FROM VBAK WHERE NAME = ? AND NETWR > ? "
+        "AND ERDAT BETWEEN ? AND ? AND KUNNR IN (?, ?)"
+    )
+    assert params == ["O'Brien", Decimal("10.5"), "20230101", "20231231", "1", "2"]
+
+
+def test_parameterize_literals_leaves_other_literals():
+    query = "SELECT SUBSTRING(NAME, 1, 3) FROM VBAK WHERE ERDAT > DATE '2023-01-01' AND ID IN (SELECT 1 FROM DUMMY)"
+    assert parameterize_literals(query) == (query, [])
+    assert parameterize_literals("SELECT 'open") == ("SELECT 'open", None)
+
+
+def test_line_comments_do_not_share_verdicts(guard):
+    assert guard.validate("SELECT ID -- x\nFROM VBAK")[1] is None
+    assert guard.validate("SELECT ID -- x FROM VBAK") == ("SELECT TOP 100 ID -- x FROM VBAK", None)
+
+
+def test_parameterize_literals_ends_between_at_a_non_literal_bound():
+    sql, params = parameterize_literals(
+        "SELECT * FROM VBAK WHERE ERDAT BETWEEN '20230101' AND AEDAT AND 5 > NETWR"
+    )
+    assert sql == "SELECT * FROM VBAK WHERE ERDAT BETWEEN ? AND AEDAT AND 5 > NETWR"
+    assert params == ["20230101"]
@@ -0,0 +1,32 @@
+import Query_Generation as qg
+from Benchmark_Suite import HanaStandIn
+
+
+def _manager(standin):
+    hana_db = standin.connector(pool_size=2)
+    return qg.TableRelationshipManager(hana_db, allowed_tables=standin.table_names)
+
+
+def test_generic_columns_alone_do_not_pair_tables():
+    standin = HanaStandIn(tables=3, columns=6, date_columns=2, rows=5, small_table_rows=2)
+    try:
+        manager = _manager(standin)
+        assert manager.common_columns[("T0000", "T0001")][0] == "ID0000"
+        assert ("T0000", "T0002") not in manager.common_columns
+        assert [(t1, t2) for t1, t2, _ in manager.find_join_path(["T0000", "T0002"])] == \
+            [("T0000", "T0001"), ("T0001", "T0002")]
+    finally:
+        standin.close()
+
+
+def test_very_common_columns_only_ride_along(monkeypatch):
+    # Without ERDAT/AEDAT in the generic set they appear in every table
+    monkeypatch.setattr(qg, "GENERIC_JOIN_COLUMNS", {"MANDT"})
+    standin = HanaStandIn(tables=12, columns=6, date_columns=2, rows=2, small_table_rows=1)
+    try:
+        manager = _manager(standin)
+        assert len(manager.common_columns) == 11
+        assert ("T0000", "T0005") not in manager.common_columns
+        assert manager.common_columns[("T0003", "T0004")] == ["ID0003", "AEDAT", "ERDAT", "MANDT"]
+    finally:
+        standin.close()